@@ -0,0 +1,527 @@
+import gc
+import numpy
+from point import Point
+from vector import Vector
+from disk import Disk, Visual
+from helpers import EPSILON
+from gravity import G, ExactGravity
+from world import World, Collision
+from stepstats import StepStats
+
+class PointView(Point):
+    '''A point whose coordinates are stored in a row of a two-column
+NumPy array. Changing the coordinates of the point changes the array
+and vice versa.
+
+    '''
+
+    __slots__ = ('array', 'index')
+
+    def __init__(self, array, index):
+        self.array = array
+        self.index = index
+
+    @property
+    def x(self):
+        return self.array[self.index, 0]
+
+    @x.setter
+    def x(self, value):
+        self.array[self.index, 0] = value
+
+    @property
+    def y(self):
+        return self.array[self.index, 1]
+
+    @y.setter
+    def y(self, value):
+        self.array[self.index, 1] = value
+
+class VectorView(Vector):
+    '''A vector whose components are stored in a row of a two-column
+NumPy array. Changing the components of the vector changes the array
+and vice versa.
+
+    '''
+
+    __slots__ = ('array', 'index')
+
+    def __init__(self, array, index):
+        self.array = array
+        self.index = index
+
+    @property
+    def x(self):
+        return self.array[self.index, 0]
+
+    @x.setter
+    def x(self, value):
+        self.array[self.index, 0] = value
+
+    @property
+    def y(self):
+        return self.array[self.index, 1]
+
+    @y.setter
+    def y(self, value):
+        self.array[self.index, 1] = value
+
+class ArrayDisk(Disk):
+    '''A disk whose state is stored in the arrays of an ArrayWorld. The
+center, velocity, acceleration and force of the disk are views into
+the world arrays, so they can be modified in place, and assigning to
+them copies the new values into the arrays.
+
+    '''
+
+    def __init__(self, world, index):
+        self.world = world
+        self.index = index
+        self.collisions = []
+        self.visuals = Visual()
+
+        # The views are created on first use, so that creating many
+        # disks at once is fast.
+        self._center = None
+
+    def bind(self):
+        '''(Re-)creates the views of this disk into the world arrays. Must be
+called whenever the world arrays are re-allocated or the index of the
+disk changes.
+
+        '''
+
+        self._center = PointView(self.world.centers, self.index)
+        self._velocity = VectorView(self.world.velocities, self.index)
+        self._acceleration = VectorView(self.world.accelerations, self.index)
+        self._force = VectorView(self.world.forces, self.index)
+
+    @property
+    def center(self):
+        if self._center is None:
+            self.bind()
+        return self._center
+
+    @center.setter
+    def center(self, value):
+        self.world.centers[self.index] = value.x, value.y
+
+    @property
+    def velocity(self):
+        if self._center is None:
+            self.bind()
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value):
+        self.world.velocities[self.index] = value.x, value.y
+
+    @property
+    def acceleration(self):
+        if self._center is None:
+            self.bind()
+        return self._acceleration
+
+    @acceleration.setter
+    def acceleration(self, value):
+        self.world.accelerations[self.index] = value.x, value.y
+
+    @property
+    def force(self):
+        if self._center is None:
+            self.bind()
+        return self._force
+
+    @force.setter
+    def force(self, value):
+        self.world.forces[self.index] = value.x, value.y
+
+    @property
+    def mass(self):
+        return self.world.masses[self.index]
+
+    @mass.setter
+    def mass(self, value):
+        self.world.masses[self.index] = value
+
+    @property
+    def radius(self):
+        return self.world.radii[self.index]
+
+    @radius.setter
+    def radius(self, value):
+        self.world.radii[self.index] = value
+
+def gravityAndContacts(centers, masses, radii, forces, gravity=True, blockSize=256):
+    '''Adds the gravitational forces between all pairs of disks to
+`forces` (unless `gravity` is False) and returns the indices (i, j) of
+the pairs of disks that are in contact, with i < j. The pair matrix is
+processed in blocks of `blockSize` rows so that memory use stays
+linear in the number of disks.
+
+    '''
+
+    n = len(masses)
+    contact_i = []
+    contact_j = []
+    for start in range(0, n, blockSize):
+        stop = min(start + blockSize, n)
+        rows = numpy.arange(start, stop)
+
+        # dr[a, j] is the vector from disk start+a to disk j
+        dr = centers[numpy.newaxis, :, :] - centers[start:stop, numpy.newaxis, :]
+        dist2 = (dr ** 2).sum(axis=2)
+        dist2[rows - start, rows] = numpy.inf
+        dist2[dist2 == 0] = numpy.inf
+        dist = numpy.sqrt(dist2)
+
+        if gravity:
+            fg = G * masses[start:stop, numpy.newaxis] * masses[numpy.newaxis, :] / dist2
+            forces[start:stop] += ((fg / dist)[:, :, numpy.newaxis] * dr).sum(axis=1)
+
+        R = radii[start:stop, numpy.newaxis] + radii[numpy.newaxis, :]
+        contact = (dist - R < EPSILON) & (numpy.arange(n)[numpy.newaxis, :] > rows[:, numpy.newaxis])
+        a, j = numpy.nonzero(contact)
+        contact_i.append(a + start)
+        contact_j.append(j)
+
+    if n == 0:
+        return numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int)
+    return numpy.concatenate(contact_i), numpy.concatenate(contact_j)
+
+def contactForces(centers, forces, ci, cj):
+    '''Applies the normal forces between the pairs of disks (ci, cj) in
+contact to `forces`. Like World.calculateContactForces, the contacts
+are applied one after the other, in order, each one to the forces left
+by the ones before it: when a disk has several contacts, the result
+depends on the order. This is a loop over the contacts, on plain
+floats, so it costs O(contacts) rather than O(n).
+
+    '''
+
+    f = forces.tolist()
+    c = centers.tolist()
+    for i, j in zip(ci.tolist(), cj.tolist()):
+        fi, fj = f[i], f[j]
+        nx = c[j][0] - c[i][0]
+        ny = c[j][1] - c[i][1]
+        k = (fi[0] * nx + fi[1] * ny) / (nx ** 2 + ny ** 2)
+        fi[0] -= k * nx
+        fi[1] -= k * ny
+        fj[0] += k * nx
+        fj[1] += k * ny
+    forces[:] = f
+
+def collisionCandidates(centers, velocities, radii, dt, blockSize=256):
+    '''Returns the indices (i, j), with i < j, of the pairs of disks that
+are moving towards each other and are close enough to touch within
+`dt`. These are the only pairs for which calculateCollision can find a
+collision.
+
+    '''
+
+    n = len(radii)
+    cand_i = []
+    cand_j = []
+    for start in range(0, n, blockSize):
+        stop = min(start + blockSize, n)
+        rows = numpy.arange(start, stop)
+
+        dr = centers[numpy.newaxis, :, :] - centers[start:stop, numpy.newaxis, :]
+        vr = velocities[numpy.newaxis, :, :] - velocities[start:stop, numpy.newaxis, :]
+        approaching = (dr * vr).sum(axis=2) < 0
+        gap = numpy.sqrt((dr ** 2).sum(axis=2)) - \
+              (radii[start:stop, numpy.newaxis] + radii[numpy.newaxis, :])
+        reach = numpy.sqrt((vr ** 2).sum(axis=2)) * dt
+        candidate = approaching & (gap - reach < EPSILON) & \
+                    (numpy.arange(n)[numpy.newaxis, :] > rows[:, numpy.newaxis])
+        a, j = numpy.nonzero(candidate)
+        cand_i.append(a + start)
+        cand_j.append(j)
+
+    if n == 0:
+        return numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int)
+    return numpy.concatenate(cand_i), numpy.concatenate(cand_j)
+
+def collisionImpulses(centers, velocities, masses, radii, i, j, dt):
+    '''Solves the collisions of the candidate pairs of disks (i, j) in one
+vectorized pass; the batch version of calculateCollision. Returns the
+indices i and j of the pairs that collide within `dt`, the time of
+impact of each, and the change in velocity of disk i and disk j (two
+n x 2 arrays) caused by the collision.
+
+    '''
+
+    dr = centers[j] - centers[i]
+    dv = velocities[j] - velocities[i]
+    dot = (dr * dv).sum(axis=1)
+    dist = numpy.sqrt((dr ** 2).sum(axis=1))
+    R = radii[i] + radii[j]
+    dv2 = (dv ** 2).sum(axis=1)
+    cross = dr[:, 0] * dv[:, 1] - dr[:, 1] * dv[:, 0]
+    delta = R ** 2 * dv2 - cross ** 2
+
+    # Pairs that are moving apart don't collide.
+    approaching = dot < 0
+    contact = dist - R < EPSILON
+    solvable = approaching & ~contact & (delta >= 0)
+
+    # The two roots of the quadratic, where the disks start and stop
+    # touching; the earliest one within the time step is the time of
+    # impact. Disks in contact collide right away.
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        root = numpy.sqrt(numpy.where(solvable, delta, 0))
+        t1 = -(dot + root) / dv2
+        t2 = -(dot - root) / dv2
+    t1 = numpy.where(solvable & (t1 >= 0) & (t1 <= dt), t1, numpy.inf)
+    t2 = numpy.where(solvable & (t2 >= 0) & (t2 <= dt), t2, numpy.inf)
+    toi = numpy.where(approaching & contact, 0.0, numpy.minimum(t1, t2))
+
+    hit = numpy.isfinite(toi)
+    i, j, toi, dr, dist = i[hit], j[hit], toi[hit], dr[hit], dist[hit]
+
+    # The velocity components along the normal are exchanged as in an
+    # elastic collision between the two masses; the tangential
+    # components are unchanged. See velocitiesAfterCollision.
+    un = dr / dist[:, numpy.newaxis]
+    v1n = (velocities[i] * un).sum(axis=1)
+    v2n = (velocities[j] * un).sum(axis=1)
+    m1 = masses[i]
+    m2 = masses[j]
+    nv1n = (v1n * (m1 - m2) + v2n * 2 * m2) / (m1 + m2)
+    nv2n = (v2n * (m2 - m1) + v1n * 2 * m1) / (m1 + m2)
+    dv1 = un * (nv1n - v1n)[:, numpy.newaxis]
+    dv2 = un * (nv2n - v2n)[:, numpy.newaxis]
+
+    return i, j, toi, dv1, dv2
+
+def firstCollisions(i, j, toi):
+    '''Returns a mask of the collisions (between disks i and j, at time
+toi) that are kept by pruneCollisions: going through the disks in
+order, the collisions of each disk after its first one (within the
+same tolerance) are dropped, since one of the disks hits another disk
+before. A collision dropped for one disk no longer counts as the first
+collision of the other disk, so the result depends on the order, and
+this is a loop over the collisions, like pruneCollisions.
+
+    '''
+
+    toi = toi.tolist()
+    keep = [True] * len(toi)
+    collisions = {}
+    for k, (a, b) in enumerate(zip(i.tolist(), j.tolist())):
+        collisions.setdefault(a, []).append(k)
+        collisions.setdefault(b, []).append(k)
+
+    for d in sorted(collisions):
+        live = [k for k in collisions[d] if keep[k]]
+        if len(live) > 1:
+            first = min(toi[k] for k in live)
+            for k in live:
+                if toi[k] - first >= 0.000001:
+                    keep[k] = False
+
+    return numpy.array(keep, dtype=bool)
+
+class ArrayWorld(World):
+    '''A world that stores the state of its disks in contiguous NumPy
+arrays (structure of arrays) and runs the integration step as
+vectorized operations over them.
+
+Exact gravity is calculated in a vectorized pass over the pair matrix.
+Gravity solvers with an arrayForces method (like ParallelGravity) are
+given the arrays directly; other solvers are run on the disk views.
+The pairs checked for contact and collision are found in the same
+vectorized passes, so the broadphase option is not used. (In the step
+stats, finding the contacts counts as gravity time.) Collisions are
+solved and applied in bulk (see collisionImpulses). The contact forces
+and the pruning of collisions follow World's sequential model, in which
+each contact or collision depends on the ones before it, so they are
+loops over the (few) contacts and collisions found (see contactForces
+and firstCollisions); the results match World's.
+The eventDriven, integrator and allowSleep options are not supported;
+collisions are always resolved once per time step, with semi-implicit
+Euler, and no disks are put to sleep.
+
+The disks in the `disks` list are ArrayDisk views into the arrays.
+Assigning a list of disks to `disks` copies their state into the
+arrays and replaces them with views, so after the assignment the views
+in `world.disks` (and not the original disks) should be used.
+
+    '''
+
+    def __init__(self, gravity=None, broadphase=None, eventDriven=False,
+                 integrator='euler', allowSleep=False):
+        if eventDriven:
+            raise ValueError('ArrayWorld does not support event-driven collisions.')
+        if integrator != 'euler':
+            raise ValueError('ArrayWorld does not support the {} integrator.'.format(integrator))
+        if allowSleep:
+            raise ValueError('ArrayWorld does not support sleeping disks.')
+        World.__init__(self, gravity=gravity, broadphase=broadphase)
+
+    @property
+    def disks(self):
+        return self._disks
+
+    @disks.setter
+    def disks(self, disks):
+        n = len(disks)
+        self.centers = numpy.zeros((n, 2))
+        self.velocities = numpy.zeros((n, 2))
+        self.accelerations = numpy.zeros((n, 2))
+        self.forces = numpy.zeros((n, 2))
+        self.masses = numpy.zeros(n)
+        self.radii = numpy.zeros(n)
+
+        views = []
+        for i, d in enumerate(disks):
+            self.centers[i] = d.center.x, d.center.y
+            self.velocities[i] = d.velocity.x, d.velocity.y
+            self.accelerations[i] = d.acceleration.x, d.acceleration.y
+            self.forces[i] = d.force.x, d.force.y
+            self.masses[i] = d.mass
+            self.radii[i] = d.radius
+
+            view = ArrayDisk(self, i)
+            view.visuals = d.visuals
+            views.append(view)
+
+        self._disks = views
+        self.colliding = set()
+
+    def setArrays(self, centers, radii, masses, velocities=None,
+                  accelerations=None, forces=None):
+        '''Replaces the disks of the world with the disks described by the
+arrays (see World.setArrays). Float NumPy arrays of the right shape
+are adopted as the world arrays without copying them, so they change
+as the world is stepped.
+
+        '''
+
+        radii = numpy.asarray(radii, dtype=float)
+        n = len(radii)
+        centers = numpy.asarray(centers, dtype=float)
+        masses = numpy.asarray(masses, dtype=float)
+        if velocities is None:
+            velocities = numpy.zeros((n, 2))
+        else:
+            velocities = numpy.asarray(velocities, dtype=float)
+        accelerations = numpy.zeros((n, 2)) if accelerations is None else \
+                        numpy.asarray(accelerations, dtype=float)
+        forces = numpy.zeros((n, 2)) if forces is None else \
+                 numpy.asarray(forces, dtype=float)
+        if n == 0:
+            centers = centers.reshape(0, 2)
+            velocities = velocities.reshape(0, 2)
+            accelerations = accelerations.reshape(0, 2)
+            forces = forces.reshape(0, 2)
+        if centers.shape != (n, 2) or masses.shape != (n,) or \
+           velocities.shape != (n, 2) or radii.shape != (n,) or \
+           accelerations.shape != (n, 2) or forces.shape != (n, 2):
+            raise ValueError('The arrays of a scene must have the same length.')
+
+        self.centers = centers
+        self.velocities = velocities
+        self.masses = masses
+        self.radii = radii
+        self.accelerations = accelerations
+        self.forces = forces
+
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._disks = [ArrayDisk(self, i) for i in range(n)]
+        finally:
+            if enabled:
+                gc.enable()
+        self.colliding = set()
+
+    def update(self, dt):
+        stats = self.stats = StepStats()
+        stats.start()
+
+        centers = self.centers
+        velocities = self.velocities
+        accelerations = self.accelerations
+        forces = self.forces
+
+        forces[:] = 0
+
+        # Calculate non-contact forces, and find the disks in contact
+        # while we're at it.
+        exact = isinstance(self.gravity, ExactGravity)
+        ci, cj = gravityAndContacts(centers, self.masses, self.radii, forces,
+                                    gravity=exact)
+        if not exact:
+            if hasattr(self.gravity, 'arrayForces'):
+                forces += self.gravity.arrayForces(centers, self.masses)
+            else:
+                for i, f in enumerate(self.gravity.forces(self._disks)):
+                    forces[i] += f.x, f.y
+        stats.lap('gravity')
+
+        # Calculate contact forces (normal force).
+        if len(ci) > 0:
+            contactForces(centers, forces, ci, cj)
+        stats.contacts = len(ci)
+        stats.lap('contact')
+
+        # Calculate accelerations and velocities
+        accelerations[:] = forces / self.masses[:, numpy.newaxis]
+        velocities += accelerations * dt
+        stats.lap('integrate')
+
+        # Calculate collisions. The candidate pairs found in a
+        # vectorized pass are solved all at once, and only the first
+        # collision of each disk is kept.
+        for d in self.colliding:
+            d.collisions = []
+
+        ci, cj = collisionCandidates(centers, velocities, self.radii, dt)
+        stats.pairs = len(ci)
+        stats.lap('broadphase')
+        ci, cj, toi, dv1, dv2 = collisionImpulses(centers, velocities, self.masses,
+                                                  self.radii, ci, cj, dt)
+        stats.collisions = len(toi)
+        stats.lap('collision')
+
+        keep = firstCollisions(ci, cj, toi)
+        stats.pruned = len(keep) - int(keep.sum())
+        ci, cj, toi, dv1, dv2 = ci[keep], cj[keep], toi[keep], dv1[keep], dv2[keep]
+        stats.lap('prune')
+
+        # The collisions are also recorded on the disks, the same way
+        # World does.
+        colliding = set()
+        for i, j, t, (x1, y1), (x2, y2) in zip(ci.tolist(), cj.tolist(), toi.tolist(),
+                                               dv1.tolist(), dv2.tolist()):
+            d1, d2 = self._disks[i], self._disks[j]
+            c1, c2 = Collision(d1, d2), Collision(d2, d1)
+            c1.toi = c2.toi = t
+            c1.dv = Vector(x1, y1)
+            c2.dv = Vector(x2, y2)
+            d1.collisions.append(c1)
+            d2.collisions.append(c2)
+            colliding.add(d1)
+            colliding.add(d2)
+
+        # Move the disks. The ones without collisions move for the
+        # whole time step; the rest up to their first collision, after
+        # which the impulses are applied and the velocity is updated
+        # for the rest of the time step (see World.moveDisks).
+        first = numpy.full(len(self.radii), numpy.inf)
+        numpy.minimum.at(first, ci, toi)
+        numpy.minimum.at(first, cj, toi)
+        hit = numpy.isfinite(first)
+        free = ~hit
+        centers[free] += velocities[free] * dt
+        centers[hit] += velocities[hit] * first[hit, numpy.newaxis]
+        numpy.add.at(velocities, ci, dv1)
+        numpy.add.at(velocities, cj, dv2)
+        velocities[hit] += accelerations[hit] * (dt - first[hit, numpy.newaxis])
+        stats.lap('move')
+
+        self.colliding = colliding
+        self.time += dt
+        stats.stop()
@@ -0,0 +1,98 @@
+'''Counts the Vector and Point objects allocated per time step.
+
+Compares a step written with the arithmetic operators, the way
+World.update used to be written, with World.update itself, which uses
+the in-place vector operations. Usage:
+
+    python bench/allocations.py [n ...]
+
+'''
+
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import itertools
+from vector import Vector
+from point import Point
+from disk import Disk
+from world import World
+from gravity import G
+
+allocations = [0]
+
+def counting(init):
+    def wrapper(self, *args, **kwargs):
+        allocations[0] += 1
+        init(self, *args, **kwargs)
+    return wrapper
+
+def operatorStep(disks, dt):
+    '''A time step (without collisions) written with the arithmetic
+operators of Vector and Point.
+
+    '''
+
+    for d in disks:
+        d.force = Vector(0, 0)
+
+    for d1, d2 in itertools.combinations(disks, 2):
+        fg = (G * d1.mass * d2.mass) / (d2.center - d1.center).magnitude ** 2
+        d1.force += (d2.center - d1.center) / abs(d2.center - d1.center) * fg
+        d2.force += (d1.center - d2.center) / abs(d1.center - d2.center) * fg
+
+    for d1, d2 in itertools.combinations(disks, 2):
+        if d1.isInContact(d2):
+            fy = d1.force.project(d2.center - d1.center)
+            d1.force -= fy
+            d2.force += fy
+
+    for d in disks:
+        d.acceleration = d.force * (1.0 / d.mass)
+        d.velocity += d.acceleration * dt
+        d.center += d.velocity * dt
+
+def scene(n):
+    rnd = random.Random(n)
+    return [Disk(Point(rnd.uniform(0, 100), rnd.uniform(0, 100)), 1, 1e6,
+                 Vector(rnd.uniform(-5, 5), rnd.uniform(-5, 5)))
+            for i in range(n)]
+
+def operators(disks):
+    return lambda dt: operatorStep(disks, dt)
+
+def world(disks):
+    w = World()
+    w.disks = disks
+    return w.update
+
+def measure(make_step, n, dt=0.033):
+    '''Returns the number of allocations and the time taken by the second
+time step of a scene with n disks; the first step is a warm-up.
+
+    '''
+
+    step = make_step(scene(n))
+    step(dt)
+    allocations[0] = 0
+    start = timeit.default_timer()
+    step(dt)
+    return allocations[0], timeit.default_timer() - start
+
+def main(sizes):
+    Vector.__init__ = counting(Vector.__init__)
+    Point.__init__ = counting(Point.__init__)
+
+    print('bytes per Vector: {}'.format(sys.getsizeof(Vector(0, 0))))
+    print('{:>6} {:>14} {:>12} {:>14} {:>12}'.format(
+        'n', 'operators', 'time (s)', 'World.update', 'time (s)'))
+    for n in sizes:
+        a1, t1 = measure(operators, n)
+        a2, t2 = measure(world, n)
+        print('{:>6} {:>14} {:>12.4f} {:>14} {:>12.4f}'.format(n, a1, t1, a2, t2))
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [10, 100, 300])
@@ -0,0 +1,125 @@
+'''Measures how World.update scales with the number of disks.
+
+Runs the standard generated scenes (see scenes.py) for increasing
+numbers of disks, under a few world configurations, and reports the
+time of each phase of the time step (gravity, broad phase, contact
+forces, integration of accelerations and velocities, collision
+detection, pruning and moving the disks) and the pair and collision
+counters, as collected by the world in its step stats. The results are
+written as JSON. Usage:
+
+    python bench/scaling.py [--scenes gas,lattice] [--sizes 10,100,1000]
+                            [--configs exact,fast,array,parallel] [--steps 3]
+                            [--budget 10] [--output results.json]
+
+Once a step of a scene takes longer than the budget (in seconds) under
+a configuration, larger sizes are skipped for that scene and
+configuration.
+
+'''
+
+import os
+import sys
+import json
+import argparse
+import platform
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from world import World
+from gravity import ExactGravity, BarnesHutGravity
+from broadphase import AllPairs, SpatialHash
+from scenes import GENERATORS, loadScene
+from stepstats import StepStats
+
+SIZES = [10, 30, 100, 300, 1000, 3000, 10000]
+
+def exactWorld():
+    return World(gravity=ExactGravity(), broadphase=AllPairs())
+
+def fastWorld():
+    return World(gravity=BarnesHutGravity(0.5), broadphase=SpatialHash())
+
+def arrayWorld():
+    from arrayworld import ArrayWorld
+    return ArrayWorld()
+
+def parallelWorld():
+    from arrayworld import ArrayWorld
+    from parallelgravity import ParallelGravity
+    return ArrayWorld(gravity=ParallelGravity())
+
+CONFIGS = {
+    'parallel': parallelWorld,
+    'exact': exactWorld,
+    'fast': fastWorld,
+    'array': arrayWorld,
+}
+
+def measure(config, scene, n, steps, dt):
+    world = CONFIGS[config]()
+    world.disks = loadScene(scene, n)
+
+    # warm-up
+    world.update(dt)
+
+    totals = StepStats()
+    for i in range(steps):
+        world.update(dt)
+        totals.add(world.stats)
+    if hasattr(world.gravity, 'close'):
+        world.gravity.close()
+
+    total = totals.total / steps
+    phases = dict((phase, t / steps) for phase, t in totals.times.items())
+    phases['other'] = max(0.0, total - sum(phases.values()))
+    return {
+        'scene': scene,
+        'config': config,
+        'n': n,
+        'steps': steps,
+        'dt': dt,
+        'step_time': total,
+        'phases': phases,
+        'pairs': totals.pairs // steps,
+        'contacts': totals.contacts // steps,
+        'collisions': totals.collisions // steps,
+        'pruned': totals.pruned // steps,
+    }
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmarks World.update.')
+    parser.add_argument('--scenes', default=','.join(sorted(GENERATORS)))
+    parser.add_argument('--sizes', default=','.join(str(n) for n in SIZES))
+    parser.add_argument('--configs', default='exact,fast,array')
+    parser.add_argument('--steps', type=int, default=3)
+    parser.add_argument('--dt', type=float, default=0.033)
+    parser.add_argument('--budget', type=float, default=10.0)
+    parser.add_argument('--output')
+    options = parser.parse_args(args)
+
+    results = []
+    for scene in options.scenes.split(','):
+        for config in options.configs.split(','):
+            for n in [int(s) for s in options.sizes.split(',')]:
+                r = measure(config, scene, n, options.steps, options.dt)
+                results.append(r)
+                sys.stderr.write('{:>8} {:>6} {:>6} {:10.4f}s\n'.format(
+                    scene, config, n, r['step_time']))
+                if r['step_time'] > options.budget:
+                    break
+
+    output = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+    else:
+        json.dump(output, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import itertools
+from collections import defaultdict
+from math import floor
+
+def reachOverlap(d1, d2, r1, r2):
+    '''Returns True if the circles with radius r1 and r2 around the centers
+of the two disks overlap.
+
+    '''
+
+    r = r1 + r2
+    ex = d2.center.x - d1.center.x
+    ey = d2.center.y - d1.center.y
+    return ex * ex + ey * ey <= r * r * (1 + 1e-9)
+
+class AllPairs(object):
+    '''A broad phase that simply passes on all pairs of disks.'''
+
+    def pairs(self, disks, reach):
+        return list(itertools.combinations(disks, 2))
+
+class SpatialHash(object):
+    '''A broad phase that hashes the disks into a uniform grid and only
+passes on the pairs of disks that are close enough to touch. The cells
+are sized from the largest reach of the disks, so a disk can only
+touch the disks in its own cell and the eight neighboring cells.
+
+    '''
+
+    # The neighboring cells checked for each cell. Only half of the
+    # neighbors are needed, since the other half check this cell.
+    neighbors = [(0, 0), (1, 0), (1, 1), (0, 1), (-1, 1)]
+
+    def pairs(self, disks, reach):
+        '''Returns the pairs of disks whose reach circles (a circle around
+the disk center with the radius given for each disk in the `reach`
+list) overlap, in the same order as itertools.combinations(disks, 2)
+would return them.
+
+        '''
+
+        if len(disks) < 2:
+            return []
+
+        size = 2.0 * max(reach)
+        if size <= 0:
+            return []
+
+        cells = defaultdict(list)
+        for i, d in enumerate(disks):
+            cells[int(floor(d.center.x / size)),
+                  int(floor(d.center.y / size))].append(i)
+
+        candidates = []
+        for (cx, cy), members in cells.items():
+            for dx, dy in self.neighbors:
+                if dx == 0 and dy == 0:
+                    others = members
+                else:
+                    others = cells.get((cx + dx, cy + dy))
+                    if others is None:
+                        continue
+
+                for i in members:
+                    for j in others:
+                        if others is members and j <= i:
+                            continue
+                        if reachOverlap(disks[i], disks[j], reach[i], reach[j]):
+                            candidates.append((i, j) if i < j else (j, i))
+
+        candidates.sort()
+        return [(disks[i], disks[j]) for i, j in candidates]
+
+class SweepAndPrune(object):
+    '''A broad phase that sorts the start and end points of the intervals
+covered by the reach of each disk along the x axis, and sweeps over
+them to find the overlapping intervals. The sorted list of end points
+is kept between calls, and is re-sorted using insertion sort. When the
+disks move little from one step to the next the list is already almost
+sorted, so sorting costs close to O(n).
+
+    '''
+
+    def __init__(self):
+        self.disks = []
+        self.endpoints = []
+
+    def pairs(self, disks, reach):
+        '''Returns the pairs of disks whose reach circles (a circle around
+the disk center with the radius given for each disk in the `reach`
+list) overlap, in the same order as itertools.combinations(disks, 2)
+would return them.
+
+        '''
+
+        if len(disks) != len(self.disks) or \
+           any(d1 is not d2 for d1, d2 in zip(disks, self.disks)):
+            # The disks have changed; start over.
+            self.disks = list(disks)
+            self.endpoints = [[0.0, kind, i]
+                              for i in range(len(disks))
+                              for kind in (0, 1)]
+
+        # Each end point is a list of the form [value, kind, index]
+        # where kind is 0 for the start of an interval and 1 for its
+        # end. Starts are sorted before ends with the same value, so
+        # that touching intervals are considered overlapping.
+        for e in self.endpoints:
+            i = e[2]
+            if e[1] == 0:
+                e[0] = disks[i].center.x - reach[i]
+            else:
+                e[0] = disks[i].center.x + reach[i]
+
+        insertionSort(self.endpoints)
+
+        candidates = []
+        active = set()
+        for value, kind, i in self.endpoints:
+            if kind == 0:
+                for j in active:
+                    if reachOverlap(disks[i], disks[j], reach[i], reach[j]):
+                        candidates.append((i, j) if i < j else (j, i))
+                active.add(i)
+            else:
+                active.remove(i)
+
+        candidates.sort()
+        return [(disks[i], disks[j]) for i, j in candidates]
+
+def insertionSort(items):
+    '''Sorts the given list in place using insertion sort. This is O(n)
+for lists that are already (almost) sorted.
+
+    '''
+
+    for k in range(1, len(items)):
+        item = items[k]
+        j = k - 1
+        while j >= 0 and items[j] > item:
+            items[j + 1] = items[j]
+            j -= 1
+        items[j + 1] = item
+
+class GridIndex(object):
+    '''A spatial index of the disks of a world at one point in time, for
+queries about regions of space (see World.castCircle). The disk
+centers are hashed into a uniform grid whose cells are sized from the
+largest disk radius, so a disk can only cover points in its own cell
+and the eight neighboring cells.
+
+The index holds the disk positions at the time it was built; it has to
+be rebuilt when the disks move. If `radii` is given, it's used instead
+of the disk radii, e.g. for the reach of the disks in a time step.
+
+    '''
+
+    def __init__(self, disks, radii=None):
+        if radii is None:
+            radii = [d.radius for d in disks]
+        self.disks = disks
+        self.maxRadius = max(radii) if disks else 0.0
+        self.size = 2.0 * self.maxRadius if self.maxRadius > 0 else 1.0
+
+        self.cells = defaultdict(list)
+        size = self.size
+        for i, d in enumerate(disks):
+            self.cells[int(floor(d.center.x / size)),
+                       int(floor(d.center.y / size))].append(i)
+
+        # The box around the disk centers, or None if there are no disks.
+        self.bounds = None
+        if disks:
+            xs = [d.center.x for d in disks]
+            ys = [d.center.y for d in disks]
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+
+    def cellRange(self, x0, y0, x1, y1):
+        '''Returns the cells covering the box from (x0, y0) to (x1, y1),
+with x0 <= x1 and y0 <= y1, that contain disks. Only the disk centers
+are hashed, so the box has to be grown by maxRadius to find all the
+disks overlapping a region.
+
+        '''
+
+        size = self.size
+        cx0 = int(floor(x0 / size))
+        cx1 = int(floor(x1 / size))
+        cy0 = int(floor(y0 / size))
+        cy1 = int(floor(y1 / size))
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            # Fewer occupied cells than cells in the box.
+            return [c for c in self.cells
+                    if cx0 <= c[0] <= cx1 and cy0 <= c[1] <= cy1]
+
+        cells = self.cells
+        return [(cx, cy) for cx in range(cx0, cx1 + 1)
+                for cy in range(cy0, cy1 + 1) if (cx, cy) in cells]
@@ -0,0 +1,125 @@
+'''Checkpoints of the state of a world in a versioned binary file.
+
+A checkpoint file starts with a header of HEADER_SIZE bytes: the magic
+bytes MAGIC, the format version and the number of disks n (unsigned
+32 and 64 bit integers), and the simulation time (a double), all
+little-endian. It's followed by the arrays of the disk state as
+little-endian doubles, one after the other: the n x 2 arrays of the
+centers, velocities, accelerations and forces, and the n masses and
+radii.
+
+Loading a checkpoint maps the arrays into memory instead of reading
+them, so it takes about the same time for any number of disks. Only the
+disk state and the time are saved: the disks of a restored world are
+all awake, and their time step levels start over.
+
+'''
+
+import os
+import struct
+import numpy
+
+MAGIC = b'DWCK'
+VERSION = 1
+
+HEADER = struct.Struct('<4sIQd')
+HEADER_SIZE = 64
+
+# The arrays in a checkpoint, in the order they are stored, and the
+# number of columns of each.
+ARRAYS = [('centers', 2), ('velocities', 2), ('accelerations', 2),
+          ('forces', 2), ('masses', 1), ('radii', 1)]
+
+def worldArrays(world):
+    '''Returns the arrays of the state of the disks of a world, in the order
+of ARRAYS.
+
+    '''
+
+    if hasattr(world, 'centers'):
+        return [getattr(world, name) for name, columns in ARRAYS]
+
+    disks = world.disks
+    return [[(d.center.x, d.center.y) for d in disks],
+            [(d.velocity.x, d.velocity.y) for d in disks],
+            [(d.acceleration.x, d.acceleration.y) for d in disks],
+            [(d.force.x, d.force.y) for d in disks],
+            [d.mass for d in disks],
+            [d.radius for d in disks]]
+
+def saveCheckpoint(path, world):
+    '''Writes a checkpoint of the world to `path`. The checkpoint is first
+written to a temporary file next to it, which then replaces the old
+checkpoint, so a crash while writing leaves the old one intact.
+
+    '''
+
+    n = len(world.disks)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n, world.time).ljust(HEADER_SIZE, b'\0'))
+        for (name, columns), array in zip(ARRAYS, worldArrays(world)):
+            array = numpy.ascontiguousarray(array, dtype='<f8')
+            if array.size != n * columns:
+                raise ValueError('The {} of the disks are missing.'.format(name))
+            array.tofile(f)
+
+        # The data has to be on disk before the rename, or a crash can
+        # leave a renamed but empty or partial file.
+        f.flush()
+        os.fsync(f.fileno())
+
+    if os.name == 'nt' and os.path.exists(path):
+        # Renaming doesn't replace existing files on Windows.
+        os.remove(path)
+    os.rename(temporary, path)
+
+def loadCheckpoint(path):
+    '''Returns the time and the arrays of a checkpoint, in the order of the
+arguments of World.setArrays. The arrays are mapped copy-on-write from
+the file: changing them doesn't change the file.
+
+    '''
+
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError('Not a checkpoint file: {}'.format(path))
+    magic, version, n, time = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError('Not a checkpoint file: {}'.format(path))
+    if version != VERSION:
+        raise ValueError('Unsupported checkpoint version {} in {}'.format(version, path))
+
+    expected = HEADER_SIZE + 8 * n * sum(columns for name, columns in ARRAYS)
+    if os.path.getsize(path) != expected:
+        raise ValueError('Truncated checkpoint file: {}'.format(path))
+
+    arrays = {}
+    offset = HEADER_SIZE
+    for name, columns in ARRAYS:
+        shape = (n, 2) if columns == 2 else (n,)
+        if n == 0:
+            # Empty regions can't be mapped.
+            arrays[name] = numpy.zeros(shape)
+        else:
+            arrays[name] = numpy.memmap(path, dtype='<f8', mode='c',
+                                        offset=offset, shape=shape)
+        offset += 8 * n * columns
+
+    return time, (arrays['centers'], arrays['radii'], arrays['masses'],
+                  arrays['velocities'], arrays['accelerations'], arrays['forces'])
+
+def restoreCheckpoint(path, world):
+    '''Replaces the disks and the time of the world with those of the
+checkpoint at `path`. An ArrayWorld adopts the mapped arrays, so it
+keeps the file mapped: saving a new checkpoint to the same path
+replaces the file, but the world keeps the old one (and its disk space)
+until its arrays are replaced, e.g. by restoring again. A World copies
+the arrays into its disks.
+
+    '''
+
+    time, arrays = loadCheckpoint(path)
+    world.setArrays(*arrays)
+    world.time = time
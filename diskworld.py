@@ -5,9 +5,10 @@ from pygame.locals import *
 from disk import Disk
 from vector import Vector
 from point import Point
-from world import World
+from world import World, DIAGNOSTICS
 from camera import Camera
 from renderer import Renderer, Guide, Trail
+from timestep import FixedTimestep
 
 class FilterIntegration(logging.Filter):
     def filter(self, record):
@@ -22,17 +23,17 @@ console_handler.addFilter(FilterIntegration())
 logger.addHandler(console_handler)
 logger.setLevel(logging.DEBUG)
 
-from handlers import IntegrationHandler
-ih = IntegrationHandler()
+# Keep the integration diagnostics of the last few seconds around; they
+# are dumped to the console by pressing 'd'.
+from handlers import IntegrationBuffer
+ih = IntegrationBuffer(capacity=100)
 logger.addHandler(ih)
+logging.getLogger('diskworld.world').setLevel(DIAGNOSTICS)
 
 def get_disk_from_surface_point(point, world, renderer):
-    ret = None
-    for d in world.disks:
-        p = renderer.surfaceToWorldCoord(point)
-        if abs(p - d.center) < d.radius:
-            ret = d
-    return ret
+    # The topmost disk under the point, if any.
+    disks = world.disksAt(renderer.surfaceToWorldCoord(point))
+    return disks[0] if disks else None
 
 pygame.init()
 fps_clock = pygame.time.Clock()
@@ -59,18 +60,35 @@ d1.visuals.trail = Trail(1, 100)
 d2 = Disk(Point(10, 10), 5, 5.97219e+14, Vector(0, 0))
 d2.visuals.color = white
 
-world = World()
+world = World(allowSleep=True)
 world.disks = [d1, d2]
 camera = Camera(bottomleft=Point(0, 0), topright=Point(39, 29))
-renderer = Renderer(world, camera, window_surface)
+# Only the regions of the window that change are redrawn and updated.
+renderer = Renderer(world, camera, window_surface, background=blue, dirty=True)
 
+# Physics and rendering run at independent rates: the world is stepped
+# every `timestep` milliseconds of wall-clock time, at most
+# `max_steps` times per frame, and frames are drawn `framerate` times
+# per second with the disks interpolated between physics steps.
 timestep = 33
+max_steps = 5
+framerate = 60
+loop = FixedTimestep(world, timestep / 1000.0, max_steps, renderer)
 dt = 0
 
+# The timing and counters of the last physics step are drawn in the
+# top-left corner when toggled with 's'.
+show_stats = False
+stats_font = pygame.font.Font(None, 18)
+
 while True:
-    window_surface.fill(blue)
+    rects = renderer.update(dt / 1000.0, 1.0 if paused else loop.alpha)
 
-    renderer.update(dt / 1000.0)
+    if show_stats:
+        for i, line in enumerate(world.stats.summary()):
+            r = window_surface.blit(stats_font.render(line, True, white), (5, 5 + 14 * i))
+            rects.append(r)
+            renderer.invalidate(r)
 
     for event in pygame.event.get():
         if event.type == QUIT:
@@ -91,6 +109,8 @@ while True:
                     if d1.visuals is not None and d1.visuals.trail is not None:
                         d1.visuals.trail.clear()
                     d1.velocity = Vector(0, 0)
+                    world.invalidateIndex()
+                    renderer.invalidateSmallDisks()
             elif event.button == 1: # left button
                 dragging_disk = get_disk_from_surface_point(event.pos, world, renderer)
                 if dragging_disk is not None:
@@ -114,6 +134,8 @@ while True:
             elif dragging_disk is not None:
                 p = renderer.surfaceToWorldCoord(event.pos)
                 dragging_disk.center = p - dragging_offset
+                world.invalidateIndex()
+                renderer.invalidateSmallDisks()
             elif panning:
                 new_pos = event.pos
                 p1 = renderer.surfaceToWorldCoord(panning_start)
@@ -131,17 +153,24 @@ while True:
                     p2 = renderer.surfaceToWorldCoord(event.pos)
                     throwing_disk.velocity = p2 - p1
                     throwing_disk.visuals.guide = None
+                    if paused:
+                        loop.reset()
                     paused = False
                 throwing = False
                 throwing_disk = None
         elif event.type == KEYDOWN:
             if event.key == K_n:
-                world.update(timestep / 1000.0)
+                loop.step()
             if event.key == K_p:
                 paused = not paused
+                loop.reset()
                 logger.info("Simulation paused." if paused else "Simulation un-paused.")
             if event.key == K_q:
                 pygame.event.post(pygame.event.Event(QUIT))
+            if event.key == K_d:
+                ih.dump(sys.stdout)
+            if event.key == K_s:
+                show_stats = not show_stats
             if event.key == K_ESCAPE:
                 throwing = False
                 if throwing_disk is not None \
@@ -149,8 +178,7 @@ while True:
                     throwing_disk.visuals.guide = None
                 throwing_disk = None
 
-    pygame.display.update()
-    dt = fps_clock.tick(timestep)
+    pygame.display.update(rects)
+    dt = fps_clock.tick(framerate)
     if not paused:
-        # fixed time-step for physics
-        world.update(timestep / 1000.0)
+        loop.advance(dt / 1000.0)
@@ -0,0 +1,225 @@
+import itertools
+from math import sqrt
+from vector import Vector
+
+G = 6.674e-11 # gravitational constant
+
+# Quadtree nodes deeper than this are not subdivided any further, so
+# that disks at (almost) the same position end up in the same leaf
+# instead of causing endless subdivision.
+MAX_DEPTH = 32
+
+class ExactGravity(object):
+    '''Calculates the gravitational forces between all pairs of disks
+exactly. This is O(n^2) in the number of disks.
+
+    '''
+
+    def forces(self, disks):
+        '''Returns a list containing the total gravitational force exerted on
+each disk by the other disks.
+
+        '''
+
+        forces = [Vector(0, 0) for d in disks]
+        for (i, d1), (j, d2) in itertools.combinations(enumerate(disks), 2):
+            dx = d2.center.x - d1.center.x
+            dy = d2.center.y - d1.center.y
+            dist2 = dx ** 2 + dy ** 2
+            if dist2 == 0:
+                continue
+            dist = sqrt(dist2)
+            fg = (G * d1.mass * d2.mass) / dist2 / dist
+            forces[i].x += dx * fg
+            forces[i].y += dy * fg
+            forces[j].x -= dx * fg
+            forces[j].y -= dy * fg
+
+        return forces
+
+    def forcesOn(self, targets, disks):
+        '''Returns a list containing the total gravitational force exerted by
+all the disks on each of the disks in `targets`, given as indices into
+`disks`. This is O(n) per target.
+
+        '''
+
+        forces = []
+        for i in targets:
+            d1 = disks[i]
+            x, y, m = d1.center.x, d1.center.y, d1.mass
+            fx = fy = 0.0
+            for d2 in disks:
+                dx = d2.center.x - x
+                dy = d2.center.y - y
+                dist2 = dx ** 2 + dy ** 2
+                if dist2 == 0:
+                    continue
+                fg = (G * m * d2.mass) / dist2 / sqrt(dist2)
+                fx += dx * fg
+                fy += dy * fg
+            forces.append(Vector(fx, fy))
+
+        return forces
+
+class QuadTree(object):
+    '''A node of the quadtree used by the Barnes-Hut algorithm. Each node
+covers a square with the given center and half-size and keeps the
+total mass and center of mass of the disks inside it.
+
+    '''
+
+    def __init__(self, x, y, size, depth=0):
+        self.x = x
+        self.y = y
+        self.size = size
+        self.depth = depth
+
+        self.mass = 0.0
+        self.comx = 0.0 # center of mass
+        self.comy = 0.0
+        self.disks = []
+        self.children = None
+
+    def insert(self, disk):
+        # Update the total mass and center of mass of this node.
+        m = self.mass + disk.mass
+        self.comx = (self.comx * self.mass + disk.center.x * disk.mass) / m
+        self.comy = (self.comy * self.mass + disk.center.y * disk.mass) / m
+        self.mass = m
+
+        if self.children is not None:
+            self.child(disk).insert(disk)
+        elif len(self.disks) == 0 or self.depth >= MAX_DEPTH:
+            self.disks.append(disk)
+        else:
+            # Subdivide this node and move its disks to its children.
+            s = self.size / 2.0
+            self.children = [QuadTree(self.x - s, self.y - s, s, self.depth + 1),
+                             QuadTree(self.x + s, self.y - s, s, self.depth + 1),
+                             QuadTree(self.x - s, self.y + s, s, self.depth + 1),
+                             QuadTree(self.x + s, self.y + s, s, self.depth + 1)]
+            for d in self.disks + [disk]:
+                self.child(d).insert(d)
+            self.disks = []
+
+    def child(self, disk):
+        i = 0 if disk.center.x < self.x else 1
+        j = 0 if disk.center.y < self.y else 2
+        return self.children[i + j]
+
+    def contains(self, p):
+        return abs(p.x - self.x) <= self.size and abs(p.y - self.y) <= self.size
+
+def buildQuadTree(disks):
+    '''Builds a quadtree containing all the given disks and returns its
+root node.
+
+    '''
+
+    xs = [d.center.x for d in disks]
+    ys = [d.center.y for d in disks]
+    size = max(max(xs) - min(xs), max(ys) - min(ys)) / 2.0
+    root = QuadTree((max(xs) + min(xs)) / 2.0,
+                    (max(ys) + min(ys)) / 2.0,
+                    size * (1 + 1e-9) + 1e-9)
+    for d in disks:
+        root.insert(d)
+
+    return root
+
+class BarnesHutGravity(object):
+    '''Approximates the gravitational forces on the disks using the
+Barnes-Hut algorithm, in O(n log n). A quadtree node that appears
+smaller than theta (that is, whose width divided by its distance from a
+disk is less than theta) is treated as a single body at its center of
+mass. A theta of zero gives the exact forces; larger values are faster
+and less accurate.
+
+    '''
+
+    def __init__(self, theta=0.5):
+        if theta < 0:
+            raise ValueError('Barnes-Hut opening angle cannot be negative.')
+
+        self.theta = theta
+
+    def forces(self, disks):
+        '''Returns a list containing the total gravitational force exerted on
+each disk by the other disks.
+
+        '''
+
+        if len(disks) == 0:
+            return []
+
+        root = buildQuadTree(disks)
+        return [self.force(d, root) for d in disks]
+
+    def forcesOn(self, targets, disks):
+        '''Returns a list containing the total gravitational force exerted by
+all the disks on each of the disks in `targets`, given as indices into
+`disks`.
+
+        '''
+
+        if len(targets) == 0:
+            return []
+
+        root = buildQuadTree(disks)
+        return [self.force(disks[i], root) for i in targets]
+
+    def force(self, disk, root):
+        fx = fy = 0.0
+        x, y, m = disk.center.x, disk.center.y, disk.mass
+
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                for other in node.disks:
+                    if other is disk:
+                        continue
+                    dx = other.center.x - x
+                    dy = other.center.y - y
+                    dist2 = dx ** 2 + dy ** 2
+                    if dist2 == 0:
+                        continue
+                    fg = (G * m * other.mass) / dist2 / sqrt(dist2)
+                    fx += dx * fg
+                    fy += dy * fg
+                continue
+
+            dx = node.comx - x
+            dy = node.comy - y
+            dist2 = dx ** 2 + dy ** 2
+
+            # Nodes containing the disk itself are always opened.
+            if (2 * node.size) ** 2 < self.theta ** 2 * dist2 and \
+               not node.contains(disk.center):
+                fg = (G * m * node.mass) / dist2 / sqrt(dist2)
+                fx += dx * fg
+                fy += dy * fg
+            else:
+                stack.extend(c for c in node.children if c.mass > 0)
+
+        return Vector(fx, fy)
+
+def gravityError(disks, solver):
+    '''Compares the forces calculated by the given gravity solver with the
+exact pairwise forces, and returns the maximum and the root mean square
+of the relative error of the force on each disk. Useful for choosing
+the opening angle of a BarnesHutGravity solver for a scene.
+
+    '''
+
+    exact = ExactGravity().forces(disks)
+    approx = solver.forces(disks)
+
+    errors = [abs(fa - fe) / abs(fe)
+              for fe, fa in zip(exact, approx)
+              if abs(fe) > 0]
+    if len(errors) == 0:
+        return 0.0, 0.0
+
+    return max(errors), sqrt(sum(e ** 2 for e in errors) / len(errors))
@@ -1,29 +1,68 @@
+import sys
 import logging
+from collections import deque
+
+# The fields of an integration record, in the order they're collected
+# during a time step.
+INTEGRATION_FIELDS = ['f0', 'f1', 'f2', 'a0', 'a1', 'v0', 'v1',
+                      'c0', 'c1', 'v2', 'x0', 'x1',
+                      'collision_without_contact', 'too_close']
+
+class IntegrationBuffer(logging.Handler):
+    '''A logging handler that keeps the integration diagnostics of the
+last `capacity` time steps in a ring buffer. Each entry is a dictionary
+with the fields in INTEGRATION_FIELDS that were present in the record,
+plus the time the record was created. Nothing is formatted until the
+buffer is dumped, so the handler is cheap enough to be left on.
+
+    '''
+
+    def __init__(self, capacity=100, level=logging.NOTSET):
+        logging.Handler.__init__(self, level)
+        self.records = deque(maxlen=capacity)
 
-class IntegrationHandler(logging.StreamHandler):
     def emit(self, record):
-        try:
-            # if this is an integration record
-            if hasattr(record, 'f0'):
-                l1 = '+-- Integration {}-------------------------------------+'
-                l2 = '| non-contact forces: {}'
-                l3 = '| contact forces: {}'
-                l4 = '| new velocities: {}'
-                l5 = '| new positions: {}'
-                l6 = '+----------------------------------------------------------------+'
-
-                l1 = l1.format('[collision] '
-                               if len(record.c1) > 0 and any(len(r) > 0 for r in record.c1)
-                               else '------------')
-                l2 = l2.format(record.f1)
-                l3 = l3.format([f2 - f1 for f1, f2 in zip(record.f1, record.f2)])
-                l4 = l4.format(record.v2)
-                l5 = l5.format(record.x1)
-
-                msg = '\n'.join([l1, l2, l3, l4, l5, l6]) + '\n'
-                self.stream.write(msg)
-                self.flush()
-        except KeyboardInterrupt, SystemExit:
-            raise
-        except:
-            self.handleError(record)
+        # if this is an integration record
+        if hasattr(record, 'f0'):
+            entry = dict((k, getattr(record, k))
+                         for k in INTEGRATION_FIELDS
+                         if hasattr(record, k))
+            entry['created'] = record.created
+            self.records.append(entry)
+
+    def clear(self):
+        self.records.clear()
+
+    def dump(self, stream=None, count=None):
+        '''Writes the last `count` (or all) buffered records to the given
+stream (by default, stderr) in a human-readable form.
+
+        '''
+
+        if stream is None:
+            stream = sys.stderr
+
+        records = list(self.records)
+        if count is not None:
+            records = records[-count:]
+
+        for r in records:
+            l1 = '+-- Integration {}-------------------------------------+'
+            l2 = '| non-contact forces: {}'
+            l3 = '| contact forces: {}'
+            l4 = '| new velocities: {}'
+            l5 = '| new positions: {}'
+            l6 = '+----------------------------------------------------------------+'
+
+            l1 = l1.format('[collision] '
+                           if any(len(c) > 0 for c in r.get('c1', []))
+                           else '------------')
+            l2 = l2.format(r['f1'])
+            l3 = l3.format([(x2 - x1, y2 - y1)
+                            for (x1, y1), (x2, y2) in zip(r['f1'], r['f2'])])
+            l4 = l4.format(r['v2'])
+            l5 = l5.format(r['x1'])
+
+            stream.write('\n'.join([l1, l2, l3, l4, l5, l6]) + '\n')
+
+        stream.flush()
@@ -0,0 +1,134 @@
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+import numpy
+from vector import Vector
+from gravity import G
+
+# The shared arrays, as seen by a worker process. Set by initWorker.
+shared = {}
+
+def initWorker(centers, masses, forces):
+    shared['centers'] = numpy.frombuffer(centers, dtype=float).reshape(-1, 2)
+    shared['masses'] = numpy.frombuffer(masses, dtype=float)
+    shared['forces'] = numpy.frombuffer(forces, dtype=float).reshape(-1, 2)
+
+def stripeForces(stripe):
+    '''Calculates the gravitational forces exerted by all n disks on the
+disks start to stop-1, reading the positions and masses from the shared
+arrays, and writes them into the shared forces array. Each stripe
+writes to its own rows, so no locking is needed.
+
+    '''
+
+    start, stop, n, blockSize = stripe
+    centers = shared['centers'][:n]
+    masses = shared['masses'][:n]
+    forces = shared['forces']
+
+    for i0 in range(start, stop, blockSize):
+        i1 = min(i0 + blockSize, stop)
+        rows = numpy.arange(i0, i1)
+
+        # dr[a, j] is the vector from disk i0+a to disk j
+        dr = centers[numpy.newaxis, :, :] - centers[i0:i1, numpy.newaxis, :]
+        dist2 = (dr ** 2).sum(axis=2)
+        dist2[rows - i0, rows] = numpy.inf
+        dist2[dist2 == 0] = numpy.inf
+        fg = G * masses[i0:i1, numpy.newaxis] * masses[numpy.newaxis, :] / \
+             (dist2 * numpy.sqrt(dist2))
+        forces[i0:i1] = (fg[:, :, numpy.newaxis] * dr).sum(axis=1)
+
+class ParallelGravity(object):
+    '''Calculates the gravitational forces between all pairs of disks
+exactly, like ExactGravity, but splits the pair matrix into stripes of
+rows that are calculated by a pool of worker processes.
+
+The positions and masses of the disks are copied into arrays in shared
+memory once per call, and the workers write the forces on the disks of
+their stripe into another shared array. Only the bounds of the stripes
+are sent to the workers, so nothing is pickled per disk.
+
+The pool is started on first use, and restarted when the number of
+disks outgrows the shared arrays. Call close() to stop it.
+
+    '''
+
+    def __init__(self, processes=None, stripes=None, blockSize=256):
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if processes < 1:
+            raise ValueError('At least one process is needed.')
+
+        self.processes = processes
+        # A few stripes per process, so that the load is balanced even
+        # if some processes are slower.
+        self.stripes = stripes if stripes is not None else 4 * processes
+        self.blockSize = blockSize
+        self.capacity = 0
+        self.pool = None
+
+    def start(self, capacity):
+        '''(Re-)allocates the shared arrays for `capacity` disks and starts
+the worker processes.
+
+        '''
+
+        self.close()
+        self.capacity = capacity
+        self.sharedCenters = RawArray('d', 2 * capacity)
+        self.sharedMasses = RawArray('d', capacity)
+        self.sharedForces = RawArray('d', 2 * capacity)
+        self.centers = numpy.frombuffer(self.sharedCenters, dtype=float).reshape(-1, 2)
+        self.masses = numpy.frombuffer(self.sharedMasses, dtype=float)
+        self.forceArray = numpy.frombuffer(self.sharedForces, dtype=float).reshape(-1, 2)
+        self.pool = multiprocessing.Pool(self.processes, initWorker,
+                                         (self.sharedCenters,
+                                          self.sharedMasses,
+                                          self.sharedForces))
+
+    def close(self):
+        '''Stops the worker processes.'''
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def compute(self, n):
+        '''Calculates the forces on the first n disks in the shared arrays,
+and returns them as an n x 2 array (a view of the shared array).
+
+        '''
+
+        size = -(-n // self.stripes)
+        stripes = [(start, min(start + size, n), n, self.blockSize)
+                   for start in range(0, n, size)]
+        self.pool.map(stripeForces, stripes, chunksize=1)
+        return self.forceArray[:n]
+
+    def arrayForces(self, centers, masses):
+        '''Returns the gravitational forces on the disks with the given
+centers (an n x 2 array) and masses as a new n x 2 array.
+
+        '''
+
+        n = len(masses)
+        if n == 0:
+            return numpy.zeros((0, 2))
+        if n > self.capacity or self.pool is None:
+            self.start(n)
+
+        self.centers[:n] = centers
+        self.masses[:n] = masses
+        return self.compute(n).copy()
+
+    def forces(self, disks):
+        '''Returns a list containing the total gravitational force exerted on
+each disk by the other disks.
+
+        '''
+
+        centers = numpy.array([(d.center.x, d.center.y) for d in disks], dtype=float)
+        masses = numpy.array([d.mass for d in disks], dtype=float)
+        return [Vector(fx, fy) for fx, fy in
+                self.arrayForces(centers.reshape(-1, 2), masses).tolist()]
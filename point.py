@@ -2,10 +2,43 @@ from vector import Vector
 from helpers import float_eq
 
 class Point(object):
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
 
+    def iadd(self, v):
+        '''Moves this point by the given vector in place, and returns this
+point.
+
+        '''
+
+        self.x += v.x
+        self.y += v.y
+        return self
+
+    def isub(self, v):
+        '''Moves this point by the negative of the given vector in place, and
+returns this point.
+
+        '''
+
+        self.x -= v.x
+        self.y -= v.y
+        return self
+
+    def iaddScaled(self, v, scalar):
+        '''Moves this point by the given vector multiplied by the given scalar
+in place, and returns this point. The same as `self += v * scalar`,
+but without creating any temporary vectors.
+
+        '''
+
+        self.x += v.x * scalar
+        self.y += v.y * scalar
+        return self
+
     def __getitem__(self, index):
         if index == 0:
             return self.x
@@ -1,37 +1,317 @@
 import pygame
+import pygame.gfxdraw
+import pygame.surfarray
+import numpy
 from point import Point
-from world import calculateCollision
 from disk import Disk
-from vector import Vector
 
 red = pygame.Color(255, 0, 0)
 black = pygame.Color(0, 0, 0)
 
+# Disks larger than this (in pixels) are drawn directly instead of
+# being cached as sprites, so that zooming in doesn't create huge
+# surfaces.
+MAX_SPRITE_RADIUS = 128
+
 class Guide(object):
     def __init__(self):
         self.start = None
         self.end = None
 
 class Trail(object):
-    def __init__(self, time=0, size=0):
+    '''The trail of previous locations of a disk, covering the last `time`
+seconds and drawn with `size` points. The locations are kept in a ring
+buffer with room for `capacity` entries, so adding a new location and
+dropping the old ones are O(1). When the buffer is full, the oldest
+location is dropped.
+
+    '''
+
+    def __init__(self, time=0, size=0, capacity=1024):
         self.time = time
         self.size = size
-        self.prev = []
+        self.capacity = capacity
+
+        self.times = [0.0] * capacity
+        self.xs = [0.0] * capacity
+        self.ys = [0.0] * capacity
+        self.start = 0 # index of the oldest entry
+        self.count = 0
+
+    def __len__(self):
+        return self.count
 
     def clear(self):
-        self.prev = []
+        self.start = 0
+        self.count = 0
+
+    def append(self, x, y, time):
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+
+        i = (self.start + self.count) % self.capacity
+        self.times[i] = time
+        self.xs[i] = x
+        self.ys[i] = y
+        self.count += 1
+
+    def evict(self, before):
+        '''Drops the locations older than the given time.'''
+
+        while self.count > 0 and self.times[self.start] < before:
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+
+    def timeAt(self, k):
+        '''Returns the time of the k-th oldest location.'''
+
+        return self.times[(self.start + k) % self.capacity]
+
+    def pointAt(self, k):
+        '''Returns the k-th oldest location as an (x, y) tuple.'''
+
+        i = (self.start + k) % self.capacity
+        return self.xs[i], self.ys[i]
+
+    def search(self, time):
+        '''Returns the index (0 being the oldest) of the first location at or
+after the given time, or the number of locations if there is none.
+This is a binary search, since the locations are sorted by time.
+
+        '''
+
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timeAt(mid) < time:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def points(self):
+        '''Returns up to `size` locations, as evenly timed as possible, to
+draw the trail with.
+
+        '''
+
+        if self.size >= self.count:
+            # Not enough previous locations available. Draw what we
+            # have.
+            return [self.pointAt(k) for k in range(self.count)]
+
+        # Always use the first previous location
+        k = 0
+        points = [self.pointAt(k)]
+
+        # From the rest we choose enough, as evenly timed as possible,
+        # to create a trail.
+        step = float(self.time) / self.size
+        while len(points) < self.size:
+            time = self.timeAt(k) + step
+
+            # Find the first location after `time`, and choose either
+            # it or the one before it, whichever is closer to the time
+            # we want.
+            j = min(self.search(time), self.count - 1)
+            if j > 0 and abs(time - self.timeAt(j - 1)) <= abs(time - self.timeAt(j)):
+                j -= 1
+            points.append(self.pointAt(j))
+
+            # Continue from this point
+            k = j
+
+        return points
+
+class SpriteCache(object):
+    '''A cache of pre-rendered antialiased disks, keyed by their radius in
+pixels and their RGBA color. Each sprite is a surface with per-pixel
+alpha, with the disk centered in it.
+
+The cache holds up to `capacity` sprites. Each sprite is stamped with
+the frame it was last used in (see nextFrame), and when the cache is
+full, the least recently used quarter of the sprites is dropped.
+
+    '''
+
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self.sprites = {}
+        self.frame = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def clear(self):
+        self.sprites.clear()
+
+    def nextFrame(self):
+        self.frame += 1
+
+    def get(self, r, color):
+        '''Returns the sprite of a disk with radius r and the given color.'''
+
+        key = (r, color.r, color.g, color.b, color.a)
+        entry = self.sprites.get(key)
+        if entry is not None:
+            self.hits += 1
+            entry[1] = self.frame
+            return entry[0]
+
+        self.misses += 1
+        if len(self.sprites) >= self.capacity:
+            self.evict()
+
+        # The antialiased outline is drawn first; drawn over the filled
+        # circle, it would blend into the transparent background and
+        # punch holes in it.
+        sprite = pygame.Surface((2 * r + 1, 2 * r + 1), pygame.SRCALPHA)
+        pygame.gfxdraw.aacircle(sprite, r, r, r, color)
+        pygame.gfxdraw.filled_circle(sprite, r, r, r, color)
+        if pygame.display.get_init() and pygame.display.get_surface() is not None:
+            # Blitting is faster in the pixel format of the display.
+            sprite = sprite.convert_alpha()
+        self.sprites[key] = [sprite, self.frame]
+        return sprite
+
+    def evict(self):
+        '''Drops the least recently used quarter of the sprites.'''
+
+        keys = sorted(self.sprites, key=lambda k: self.sprites[k][1])
+        for key in keys[:max(1, len(keys) // 4)]:
+            del self.sprites[key]
 
 class Renderer(object):
-    def __init__(self, world, camera, surface):
+    '''Draws the disks of a world, as seen by a camera, on a surface.
+
+By default each call to update draws a whole frame over whatever is on
+the surface. If `dirty` is True, the renderer keeps track of what it
+drew in the last frame: update clears (with the `background` color)
+and redraws only the regions that changed, and returns the list of
+those regions, to be passed to pygame.display.update. Frames in which
+nothing moves draw nothing.
+
+Disks smaller than detailRadius pixels are not drawn one by one, but
+together as a single image, computed with NumPy, of single pixels and
+of the density of the crowded regions (see addSmallDisks). This keeps
+zoomed-out views of large worlds fast.
+
+    '''
+
+    # In dirty mode, when more regions than this changed, the whole
+    # frame is redrawn instead.
+    maxDirtyRects = 64
+
+    # Disks with a radius of fewer pixels than this are not drawn in
+    # detail, but as pixels or as part of a density image (see
+    # addSmallDisks). 0 draws all disks in detail.
+    detailRadius = 2
+
+    # The size in pixels of the cells of the density image, and how
+    # many small disks make a cell dense.
+    densityCell = 4
+    densityThreshold = 4
+
+    def __init__(self, world, camera, surface, background=None, dirty=False):
+        if dirty and background is None:
+            raise ValueError('Dirty rendering needs a background color.')
+
         self.world = world
         self.camera = camera
         self.surface = surface
+        self.background = background
+        self.dirty = dirty
         self.currentTime = 0.0
 
+        # What was drawn in the last frame in dirty mode: the keys and
+        # surface regions of the sprites, the regions of the guides,
+        # and other regions that need to be redrawn (see invalidate).
+        self.drawnBatch = []
+        self.drawnKeys = None
+        self.drawnRects = []
+        self.guideRects = []
+        self.invalidRects = []
+
+        # The world-to-surface transform of the current frame.
+        self.transform = None
+
+        # The centers of the disks before the last physics step, and how
+        # far (from 0 to 1) the frame is between them and the current
+        # centers. See saveState.
+        self.previousCenters = None
+        self.alpha = 1.0
+
+        # Disks and trail points are drawn by blitting sprites. The
+        # sprites are dropped when the zoom level (the scale of the
+        # transform) changes, since the old sizes are unlikely to be
+        # needed again.
+        self.sprites = SpriteCache()
+        self.spriteScale = None
+
+        # The image of the small disks drawn in the last frame and its
+        # position, and the state of the world and the view it was made
+        # for. See addSmallDisks.
+        self.smallSprite = None
+        self.smallKey = None
+
     def drawFilledCircle(self, x, y, r, color):
         pygame.gfxdraw.filled_circle(self.surface, x, y, r, color)
         pygame.gfxdraw.aacircle(self.surface, x, y, r, color)
 
+    def addFilledCircle(self, batch, x, y, r, color, memo=None):
+        '''Adds a filled circle to the batch of sprites to blit (see
+drawBatch). Circles too large for a sprite are added as (None, (x, y,
+r, color)). `memo` is a dictionary for looking up the sprites already
+used by the caller, by radius and color object, without going through
+the cache.
+
+        '''
+
+        if r > MAX_SPRITE_RADIUS:
+            batch.append((None, (x, y, r, (color.r, color.g, color.b, color.a))))
+            return
+
+        if memo is None:
+            sprite = self.sprites.get(r, color)
+        else:
+            key = (r, id(color))
+            sprite = memo.get(key)
+            if sprite is None:
+                sprite = memo[key] = self.sprites.get(r, color)
+        batch.append((sprite, (x - r, y - r)))
+
+    def drawBatch(self, batch):
+        '''Draws a batch of sprites and large circles, in order. The sprites
+between the circles are blitted with one call.
+
+        '''
+
+        run = []
+        for item in batch:
+            if item[0] is None:
+                if run:
+                    self.surface.blits(run, doreturn=False)
+                    run = []
+                x, y, r, color = item[1]
+                self.drawFilledCircle(x, y, r, color)
+            else:
+                run.append(item)
+
+        if run:
+            self.surface.blits(run, doreturn=False)
+
+    def batchRect(self, item):
+        '''Returns the region of the surface covered by an item of a batch.'''
+
+        sprite, position = item
+        if sprite is None:
+            x, y, r, color = position
+            return pygame.Rect(x - r, y - r, 2 * r + 1, 2 * r + 1)
+        return sprite.get_rect(topleft=position)
+
     def calcDiskSurfaceMetrics(self, center, radius):
         scrw, scrh = self.surface.get_size()
         ratio = float(scrw) / self.camera.width
@@ -50,6 +330,7 @@ class Renderer(object):
 
         pygame.gfxdraw.aacircle(self.surface, x, y, r-1, color)
         pygame.gfxdraw.aacircle(self.surface, x, y, r, color)
+        return pygame.Rect(x - r, y - r, 2 * r + 1, 2 * r + 1)
 
     def surfaceToWorldCoord(self, x, y=None):
         '''Converts the given coordinate in the graphics surface to a point in
@@ -66,6 +347,201 @@ can be passed.
         return Point(self.camera.bottomleft.x + (float(x) / w) * self.camera.width,
                      self.camera.bottomleft.y + (float(y) / h) * self.camera.height)
 
+    def surfaceTransform(self):
+        '''Returns the affine transform from world coordinates to surface
+coordinates as a 4-tuple (sx, sy, ox, oy). A point (x, y) in the world
+is at (x * sx + ox, y * sy + oy) on the surface.
+
+        '''
+
+        w, h = self.surface.get_size()
+        bottomleft = self.camera.bottomleft
+        topright = self.camera.topright
+        sx = float(w) / (topright.x - bottomleft.x)
+        sy = -float(h) / (topright.y - bottomleft.y)
+        return sx, sy, -bottomleft.x * sx, h - bottomleft.y * sy
+
+    def worldArrays(self):
+        '''Returns the centers and radii of the disks in the world as NumPy
+arrays. Array-backed worlds provide these directly.
+
+        '''
+
+        if hasattr(self.world, 'centers'):
+            return self.world.centers, self.world.radii
+
+        disks = self.world.disks
+        centers = numpy.array([(d.center.x, d.center.y) for d in disks], dtype=float)
+        radii = numpy.array([d.radius for d in disks], dtype=float)
+        return centers.reshape(len(disks), 2), radii
+
+    def diskArrays(self):
+        '''Returns the centers and radii of the disks as they are drawn in
+this frame: the centers are interpolated between the state saved by
+saveState and the current state of the world, according to alpha.
+
+        '''
+
+        centers, radii = self.worldArrays()
+        previous = self.previousCenters
+        if previous is not None and self.alpha < 1.0 and \
+           previous.shape == centers.shape:
+            centers = previous + (centers - previous) * self.alpha
+        return centers, radii
+
+    def saveState(self):
+        '''Saves the centers of the disks, so that the frames drawn after the
+next physics step can be interpolated between them and the new ones.
+Call this right before stepping the world.
+
+        '''
+
+        self.previousCenters = numpy.array(self.worldArrays()[0], dtype=float)
+
+    def visibleDisks(self, transform, arrays=None, asArrays=False):
+        '''Culls and transforms all the disks at once. Returns the indices of
+the disks that are in view, and their surface coordinates and radii
+as lists of integers (or NumPy arrays if `asArrays` is True). The
+centers and radii can be passed in as `arrays`, otherwise they are
+taken from diskArrays.
+
+        '''
+
+        centers, radii = self.diskArrays() if arrays is None else arrays
+        sx, sy, ox, oy = transform
+
+        # The same test as Camera.isInView, for all disks at once.
+        hw = (self.camera.topright.x - self.camera.bottomleft.x) / 2.0
+        hh = (self.camera.topright.y - self.camera.bottomleft.y) / 2.0
+        dx = numpy.abs(centers[:, 0] - (self.camera.bottomleft.x + hw))
+        dy = numpy.abs(centers[:, 1] - (self.camera.bottomleft.y + hh))
+        visible = (dx <= hw + radii) & (dy <= hh + radii) & \
+                  ((dx <= hw) | (dy <= hh) |
+                   ((dx - hw) ** 2 + (dy - hh) ** 2 <= radii ** 2))
+
+        indices = numpy.nonzero(visible)[0]
+        xs = (centers[indices, 0] * sx + ox).astype(int)
+        ys = (centers[indices, 1] * sy + oy).astype(int)
+        rs = (radii[indices] * sx).astype(int)
+        if asArrays:
+            return indices, xs, ys, rs
+        return indices.tolist(), xs.tolist(), ys.tolist(), rs.tolist()
+
+    def drawDisks(self, arrays=None, batch=None):
+        '''Draws the disks in view. If a batch is given, the sprites of the
+disks are added to it to be blitted later.
+
+        '''
+
+        blit = batch is None
+        if blit:
+            batch = []
+
+        indices, xs, ys, rs = self.visibleDisks(self.transform, arrays, asArrays=True)
+        if self.detailRadius > 0:
+            small = rs < self.detailRadius
+            if small.any():
+                self.addSmallDisks(batch, indices[small], xs[small], ys[small])
+                large = ~small
+                indices, xs, ys, rs = indices[large], xs[large], ys[large], rs[large]
+
+        disks = self.world.disks
+        memo = {}
+        for i, x, y, r in zip(indices.tolist(), xs.tolist(), ys.tolist(), rs.tolist()):
+            self.addFilledCircle(batch, x, y, r, disks[i].visuals.color, memo)
+
+        if blit:
+            self.drawBatch(batch)
+
+    def addSmallDisks(self, batch, indices, xs, ys):
+        '''Adds the disks with the given indices and surface coordinates (as
+NumPy arrays), too small to be drawn in detail, to the batch as a
+single image. Each disk is a single pixel of its color, except in the
+cells of densityCell x densityCell pixels holding at least
+densityThreshold disks, which are filled with the average color of
+their disks and an opacity proportional to their number.
+
+        '''
+
+        w, h = self.surface.get_size()
+        inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        if not inside.all():
+            indices, xs, ys = indices[inside], xs[inside], ys[inside]
+        if len(indices) == 0:
+            return
+
+        # The image of the last frame is reused as long as the world
+        # hasn't been stepped and the view hasn't changed, so that
+        # dirty mode sees the same sprite. Disks moved from the outside
+        # need a call to invalidateSmallDisks.
+        key = (self.world.time, self.alpha, self.transform,
+               len(self.world.disks), len(indices))
+        if key == self.smallKey:
+            batch.append(self.smallSprite)
+            return
+
+        # The colors of the disks, as indices into a palette of the
+        # distinct color objects.
+        disks = self.world.disks
+        colors = [disks[i].visuals.color for i in indices.tolist()]
+        ids = numpy.array([id(c) for c in colors], dtype=numpy.int64)
+        first, which = numpy.unique(ids, return_index=True, return_inverse=True)[1:]
+        palette = numpy.array([tuple(colors[k]) for k in first.tolist()], dtype=float)
+        palette = palette.reshape(-1, 4)
+
+        # The image covers the cells the disks are in. Like a pixel
+        # array of a surface, it's indexed by x first.
+        cell = self.densityCell
+        cxs = xs // cell
+        cys = ys // cell
+        cx0, cy0 = cxs.min(), cys.min()
+        cols = cxs.max() - cx0 + 1
+        rows = cys.max() - cy0 + 1
+        x0, y0 = cx0 * cell, cy0 * cell
+        cellIds = (cxs - cx0) * rows + (cys - cy0)
+
+        # The pixels are packed in the format of a surface with
+        # per-pixel alpha.
+        shifts = pygame.Surface((1, 1), pygame.SRCALPHA).get_shifts()
+        def pack(rgba):
+            rgba = rgba.astype(numpy.uint32)
+            return (rgba[:, 0] << shifts[0]) | (rgba[:, 1] << shifts[1]) | \
+                   (rgba[:, 2] << shifts[2]) | (rgba[:, 3] << shifts[3])
+
+        counts = numpy.bincount(cellIds, minlength=rows * cols)
+        dense = counts >= self.densityThreshold
+        pixels = numpy.zeros((cols * cell, rows * cell), dtype=numpy.uint32)
+        if dense.any():
+            cells = numpy.zeros((rows * cols, 4))
+            n = numpy.maximum(counts, 1)
+            for c in range(3):
+                cells[:, c] = numpy.bincount(cellIds, palette[which, c],
+                                             minlength=rows * cols) / n
+            cells[:, 3] = numpy.minimum(255.0, 255.0 * counts / (cell * cell))
+            cells[~dense] = 0
+            cells = pack(cells).reshape(cols, rows)
+            pixels[:] = cells.repeat(cell, axis=0).repeat(cell, axis=1)
+
+        # The disks in sparse cells are splatted; later disks are drawn
+        # over earlier ones.
+        sparse = ~dense[cellIds]
+        pixels[xs[sparse] - x0, ys[sparse] - y0] = pack(palette)[which[sparse]]
+
+        image = pygame.Surface(pixels.shape, pygame.SRCALPHA)
+        pygame.surfarray.pixels2d(image)[:] = pixels
+        self.smallSprite = (image, (x0, y0))
+        self.smallKey = key
+        batch.append(self.smallSprite)
+
+    def invalidateSmallDisks(self):
+        '''Makes the image of the small disks be drawn again in the next
+frame. Call it after moving or recoloring disks without stepping the
+world.
+
+        '''
+
+        self.smallKey = None
+
     def worldToSurfaceCoord(self, p):
         '''Converts the given point from world coordinates into surface
 coordinates and returns the results as a 2-tuple.'''
@@ -76,91 +552,55 @@ coordinates and returns the results as a 2-tuple.'''
         return int(x), int(h - y)
 
     def drawGuides(self):
+        '''Draws the guides of the disks, and returns the list of regions of
+the surface drawn on.
+
+        '''
+
+        rects = []
         for d in self.world.disks:
             if d.visuals.guide is not None:
                 g = d.visuals.guide
                 start = self.worldToSurfaceCoord(g.start)
                 end = self.worldToSurfaceCoord(g.end)
-                pygame.draw.aaline(self.surface, red, start, end, True)
+                rects.append(pygame.draw.aaline(self.surface, red, start, end, True))
                 self.drawFilledCircle(end[0], end[1], 5, red)
+                rects.append(pygame.Rect(end[0] - 5, end[1] - 5, 11, 11))
 
+                # Where the disk would stop at the first disk it hits
+                # if thrown along the guide.
                 v = g.end - g.start
-                original_v = d.velocity
-                d.velocity = v
-
-                collisions = []
-                for d2 in self.world.disks:
-                    if d2 != d:
-                        v_before = d2.velocity
-                        d2.velocity = Vector(0, 0)
-                        c1, c2 = calculateCollision(d, d2, 1.0)
-                        d2.velocity = v_before
-                        if c1 is not None:
-                            collisions.append(c1)
-
-                if len(collisions) > 1:
-                    collisions.sort(key=lambda c: c.toi)
-
-                    # Bypass the collisions with the same time of
-                    # impact (toi).
-                    first = collisions[0]
-                    i = 1
-                    while collisions[i].toi - first.toi < 0.000001:
-                        i += 1
-                    collisions = collisions[:i]
-
-                dr = v * collisions[0].toi if len(collisions) > 0 else v
-                self.drawGhost(d.center + dr, d.radius, black)
-
-                d.velocity = original_v
-
-    def drawTrails(self):
-        for d in self.world.disks:
+                hit, toi = self.world.castCircle(d.center, d.radius, v, ignore=d)
+                dr = v * toi if hit is not None else v
+                rects.append(self.drawGhost(d.center + dr, d.radius, black))
+
+        return rects
+
+    def drawTrails(self, centers, batch=None):
+        '''Draws the trails of the disks, and adds the current centers to
+them. If a batch is given, the sprites of the trail points are added to
+it to be blitted later.
+
+        '''
+
+        blit = batch is None
+        if blit:
+            batch = []
+
+        for d, center in zip(self.world.disks, centers):
             trail = d.visuals.trail
             if trail is not None and \
                trail.time > 0 and \
                trail.size > 0:
-                # Find all the points in the desired time window
-                trail.prev = [(pos, time)
-                              for pos, time in trail.prev
-                              if time >= self.currentTime - trail.time]
-
-                if trail.size >= len(trail.prev):
-                    # Not enough previous locations available. Draw
-                    # what we have.
-                    points = [pos for pos, prev in trail.prev]
-                else:
-                    # Choose `size` points in the time window.
-
-                    # Always use the first previous location
-                    points = [trail.prev[0][0]]
-
-                    # From the rest we choose enough, as evenly timed
-                    # as possible, to create a trail.
-                    time = trail.prev[0][1]
-                    step = float(trail.time) / trail.size
-                    while len(points) < trail.size:
-                        time += step
-
-                        # Go forward among previous locations until we
-                        # reach one after `time`.
-                        span = []
-                        for pos, t in trail.prev[0:]:
-                            span.append((pos, t))
-                            if t >= time:
-                                break
-
-                        # Choose the point as close to the time we want as possible
-                        p = min(span, key=lambda r: abs(time - r[1]))
-                        points.append(p[0])
-
-                        # Continue from this point
-                        time = p[1]
+                # Drop the points outside the desired time window, and
+                # choose the ones to draw.
+                trail.evict(self.currentTime - trail.time)
+                points = trail.points()
 
                 # Now draw the points in the trail. Start with a
                 # smaller radius (r) and alpha channel (a).
-                r = 2.0
-                _, _, r = self.calcDiskSurfaceMetrics(d.center, d.radius)
+                sx, sy, ox, oy = self.transform
+                r = int(d.radius * sx)
                 start_r = float(r) / 10
                 end_r = float(r) / 2
                 r = start_r
@@ -168,23 +608,98 @@ coordinates and returns the results as a 2-tuple.'''
                 if len(points) > 0:
                     dr = (end_r - start_r) / len(points)
                     da = (255 - a) / len(points)
-                for p in points:
-                    x, y = self.worldToSurfaceCoord(p)
+                for px, py in points:
+                    x, y = int(px * sx + ox), int(py * sy + oy)
                     color = pygame.Color(255, 0, 0, int(a))
-                    self.drawFilledCircle(x, y, int(r), color)
+                    self.addFilledCircle(batch, x, y, int(r), color)
                     r += dr
                     a += da
 
                 # Add this location to the list of previous locations.
-                trail.prev.append((d.center, self.currentTime))
+                trail.append(float(center[0]), float(center[1]), self.currentTime)
 
-    def update(self, dt):
-        self.currentTime += dt
+        if blit:
+            self.drawBatch(batch)
 
-        self.drawTrails()
+    def invalidate(self, rect):
+        '''Marks a region of the surface, drawn over by someone else, to be
+redrawn in the next frame in dirty mode.
 
-        for d in self.world.disks:
-            if self.camera.isInView(d):
-                self.drawDisk(d.center, d.radius, d.visuals.color)
+        '''
 
+        self.invalidRects.append(pygame.Rect(rect))
+
+    def update(self, dt, alpha=1.0):
+        '''Draws a frame, `dt` seconds after the previous one. The disks are
+drawn `alpha` of the way between the state saved by saveState and the
+current state of the world. In dirty mode, returns the list of regions
+of the surface that changed.
+
+        '''
+
+        self.currentTime += dt
+        self.alpha = alpha
+        self.transform = self.surfaceTransform()
+        if self.transform[0] != self.spriteScale:
+            self.sprites.clear()
+            self.spriteScale = self.transform[0]
+        self.sprites.nextFrame()
+
+        # The trails and disks are blitted in one batch, trails first.
+        arrays = self.diskArrays()
+        batch = []
+        self.drawTrails(arrays[0], batch)
+        self.drawDisks(arrays, batch)
+
+        if self.dirty:
+            return self.drawDirty(batch)
+
+        self.drawBatch(batch)
         self.drawGuides()
+
+    def drawDirty(self, batch):
+        '''Draws the parts of the batch (and the guides) that changed since
+the last frame, and returns the regions of the surface that changed.
+
+        '''
+
+        # The sprites of the last frame are kept referenced in
+        # drawnBatch, so the ids of the sprites identify them.
+        keys = [(id(sprite), position) for sprite, position in batch]
+        guided = any(d.visuals.guide is not None for d in self.world.disks)
+        if keys == self.drawnKeys and not guided and \
+           not self.guideRects and not self.invalidRects:
+            return []
+
+        rects = [self.batchRect(item) for item in batch]
+        first = self.drawnKeys is None
+        if not first:
+            current = set(keys)
+            previous = set(self.drawnKeys)
+            changed = [r for k, r in zip(self.drawnKeys, self.drawnRects)
+                       if k not in current]
+            changed.extend(r for k, r in zip(keys, rects) if k not in previous)
+            changed.extend(self.guideRects)
+            changed.extend(self.invalidRects)
+
+        self.drawnKeys = keys
+        self.drawnRects = rects
+        self.drawnBatch = batch
+        self.invalidRects = []
+
+        if first or len(changed) > self.maxDirtyRects:
+            # Too much changed; redraw everything.
+            self.surface.fill(self.background)
+            self.drawBatch(batch)
+            self.guideRects = self.drawGuides()
+            return [self.surface.get_rect()]
+
+        # Each changed region is cleared and the sprites in it redrawn,
+        # clipped to it, so that no pixel is blended twice.
+        for c in changed:
+            self.surface.set_clip(c)
+            self.surface.fill(self.background, c)
+            self.drawBatch([batch[i] for i in c.collidelistall(rects)])
+        self.surface.set_clip(None)
+        self.guideRects = self.drawGuides()
+        return changed + self.guideRects
@@ -0,0 +1,223 @@
+'''Runs the physics of a world headless, as fast as possible.
+
+Loads a scene, steps it for a number of steps or for a simulated
+duration, and writes out the final state of the disks and timing
+statistics as JSON. Nothing here depends on pygame. Example:
+
+    python runner.py orbit --steps 1000 --dt 0.033 --output state.json
+
+The scene is either the name of a built-in scene or a scene file (see
+scenes.saveSceneFile). Long runs can write checkpoints, and be resumed
+from them with --restore:
+
+    python runner.py gas -n 10000 --steps 100000 --checkpoint gas.ckpt \\
+        --checkpoint-every 1000
+    python runner.py --restore gas.ckpt --steps 50000 --checkpoint gas.ckpt
+
+'''
+
+import sys
+import os
+import json
+import argparse
+import timeit
+from world import World, INTEGRATORS
+from stepstats import StepStats
+from gravity import ExactGravity, BarnesHutGravity
+from broadphase import AllPairs, SpatialHash, SweepAndPrune
+from scenes import SCENES, GENERATORS, FILE_FORMATS, loadScene, loadSceneFile, \
+     sceneState
+
+BROADPHASES = {
+    'allpairs': AllPairs,
+    'hash': SpatialHash,
+    'sap': SweepAndPrune,
+}
+
+def makeWorld(disks, array=False, theta=None, broadphase='allpairs',
+              eventDriven=False, processes=None, integrator='euler',
+              allowSleep=False):
+    '''Creates a world containing the given disks: a list of disks, or the
+tuple of the centers, radii, masses and velocities of the disks as
+returned by loadSceneFile. If `array` is True, an array-backed world
+is created. If `theta` is given, gravity is
+calculated with the Barnes-Hut algorithm using it as the opening angle.
+Otherwise, if `processes` is given, exact gravity is calculated by that
+many worker processes.
+
+    '''
+
+    if theta is not None:
+        gravity = BarnesHutGravity(theta)
+    elif processes is not None:
+        from parallelgravity import ParallelGravity
+        gravity = ParallelGravity(processes)
+    else:
+        gravity = ExactGravity()
+    if array:
+        # Only imported when needed, so that NumPy is not required
+        # otherwise.
+        from arrayworld import ArrayWorld
+        world = ArrayWorld(gravity=gravity)
+    else:
+        world = World(gravity=gravity,
+                      broadphase=BROADPHASES[broadphase](),
+                      eventDriven=eventDriven,
+                      integrator=integrator,
+                      allowSleep=allowSleep)
+
+    if isinstance(disks, tuple):
+        world.setArrays(*disks)
+    else:
+        world.disks = disks
+    return world
+
+def run(world, dt, steps=None, duration=None, checkpoint=None, checkpointEvery=None):
+    '''Steps the world with the time step `dt`, for the given number of
+steps or until it has been simulated for the given duration, whichever
+comes first. Returns a dictionary of timing statistics, including the
+per-phase times and counters of the world summed over all steps.
+
+If a `checkpoint` path is given, a checkpoint of the world is written
+to it every `checkpointEvery` steps (if given) and at the end.
+
+    '''
+
+    if steps is None and duration is None:
+        raise ValueError('Either the number of steps or the duration must be given.')
+
+    if checkpoint is not None:
+        # Only imported when needed, so that NumPy is not required
+        # otherwise.
+        from checkpoint import saveCheckpoint
+
+    start_time = world.time
+    step_times = []
+    totals = StepStats()
+    start = timeit.default_timer()
+    while (steps is None or len(step_times) < steps) and \
+          (duration is None or world.time - start_time < duration):
+        t = timeit.default_timer()
+        world.update(dt)
+        step_times.append(timeit.default_timer() - t)
+        totals.add(world.stats)
+        if checkpoint is not None and checkpointEvery and \
+           len(step_times) % checkpointEvery == 0:
+            saveCheckpoint(checkpoint, world)
+    elapsed = timeit.default_timer() - start
+
+    n = len(step_times)
+    if checkpoint is not None and (not checkpointEvery or n % checkpointEvery != 0):
+        saveCheckpoint(checkpoint, world)
+
+    return {
+        'disks': len(world.disks),
+        'steps': n,
+        'dt': dt,
+        'simulated_time': world.time - start_time,
+        'wall_time': elapsed,
+        'steps_per_second': n / elapsed if elapsed > 0 else None,
+        'mean_step_time': sum(step_times) / n if n > 0 else None,
+        'max_step_time': max(step_times) if n > 0 else None,
+        'world': totals.asDict(),
+    }
+
+def worldState(world):
+    '''Returns the state of the world as a JSON-serializable dictionary.'''
+
+    return sceneState(world)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Runs a diskworld scene headless.')
+    parser.add_argument('scene', nargs='?',
+                        help='the scene to run: one of {}, or a scene file ({})'.format(
+                            ', '.join(sorted(list(SCENES) + list(GENERATORS))),
+                            ', '.join(FILE_FORMATS)))
+    parser.add_argument('-n', type=int, default=100,
+                        help='number of disks in generated scenes (default: 100)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed for generated scenes (default: 0)')
+    parser.add_argument('--steps', type=int,
+                        help='number of time steps to run')
+    parser.add_argument('--duration', type=float,
+                        help='simulated time to run, in seconds')
+    parser.add_argument('--dt', type=float, default=0.033,
+                        help='time step, in seconds (default: 0.033)')
+    parser.add_argument('--array', action='store_true',
+                        help='use the array-backed world')
+    parser.add_argument('--theta', type=float,
+                        help='use Barnes-Hut gravity with this opening angle')
+    parser.add_argument('--processes', type=int,
+                        help='calculate exact gravity with this many processes')
+    parser.add_argument('--broadphase', choices=sorted(BROADPHASES),
+                        default='allpairs',
+                        help='broad phase for contacts and collisions')
+    parser.add_argument('--event-driven', action='store_true',
+                        help='resolve all collisions in order of time of impact')
+    parser.add_argument('--integrator', choices=INTEGRATORS, default='euler',
+                        help='integration method (default: euler)')
+    parser.add_argument('--sleep', action='store_true',
+                        help='put disks that stay at rest to sleep')
+    parser.add_argument('--checkpoint',
+                        help='write checkpoints of the world to this file')
+    parser.add_argument('--checkpoint-every', type=int,
+                        help='write a checkpoint every this many steps '
+                             '(default: only at the end)')
+    parser.add_argument('--restore',
+                        help='start from this checkpoint instead of a scene')
+    parser.add_argument('--output',
+                        help='write the final state and statistics to this file')
+    options = parser.parse_args(args)
+
+    if options.steps is None and options.duration is None:
+        parser.error('either --steps or --duration is required')
+    if options.array and options.event_driven:
+        parser.error('--event-driven is not supported with --array')
+    if options.array and options.integrator != 'euler':
+        parser.error('--integrator is not supported with --array')
+    if options.array and options.sleep:
+        parser.error('--sleep is not supported with --array')
+
+    if options.checkpoint_every is not None and options.checkpoint is None:
+        parser.error('--checkpoint-every needs --checkpoint')
+    if (options.scene is None) == (options.restore is None):
+        parser.error('either a scene or --restore is required')
+
+    start_time = 0.0
+    if options.restore is not None:
+        from checkpoint import loadCheckpoint
+        start_time, scene = loadCheckpoint(options.restore)
+    elif os.path.splitext(options.scene)[1].lower() in FILE_FORMATS:
+        scene = loadSceneFile(options.scene)
+    elif options.scene in SCENES or options.scene in GENERATORS:
+        scene = loadScene(options.scene, options.n, options.seed)
+    else:
+        parser.error('unknown scene: {}'.format(options.scene))
+
+    world = makeWorld(scene,
+                      array=options.array,
+                      theta=options.theta,
+                      broadphase=options.broadphase,
+                      eventDriven=options.event_driven,
+                      processes=options.processes,
+                      integrator=options.integrator,
+                      allowSleep=options.sleep)
+    world.time = start_time
+    try:
+        stats = run(world, options.dt, steps=options.steps, duration=options.duration,
+                    checkpoint=options.checkpoint,
+                    checkpointEvery=options.checkpoint_every)
+    finally:
+        if hasattr(world.gravity, 'close'):
+            world.gravity.close()
+
+    result = {'stats': stats, 'state': worldState(world)}
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    json.dump(stats, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
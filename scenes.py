@@ -0,0 +1,191 @@
+import random
+import json
+import os
+from math import sqrt, ceil, pi, sin, cos
+from point import Point
+from vector import Vector
+from disk import Disk
+from gravity import G
+from world import tolist
+
+def orbit():
+    '''A small disk next to a very massive one, which it orbits once
+thrown. This is the scene diskworld.py starts with.
+
+    '''
+
+    d1 = Disk(Point(20, 20), 2, 1, Vector(0, 0))
+    d2 = Disk(Point(10, 10), 5, 5.97219e+14, Vector(0, 0))
+    return [d1, d2]
+
+def uniformGas(n, seed=0):
+    '''n light disks spread uniformly over a square, moving in random
+directions. Each disk is placed randomly inside its own cell of a
+grid, so they don't overlap.
+
+    '''
+
+    rnd = random.Random(seed)
+    side = int(ceil(sqrt(n)))
+    disks = []
+    for i in range(n):
+        x = (i % side) * 10 + rnd.uniform(-3, 3)
+        y = (i // side) * 10 + rnd.uniform(-3, 3)
+        v = Vector(rnd.uniform(-5, 5), rnd.uniform(-5, 5))
+        disks.append(Disk(Point(x, y), 1, 1, v))
+    return disks
+
+def denseCluster(n, seed=0):
+    '''n heavy disks packed closely (with gaps of about a tenth of their
+radius) in a roughly circular cluster, moving slowly.
+
+    '''
+
+    rnd = random.Random(seed)
+    side = int(ceil(sqrt(4 * n / pi))) + 1
+    disks = []
+    i = 0
+    while len(disks) < n:
+        x = (i % side) - side / 2.0
+        y = (i // side) - side / 2.0
+        i += 1
+        if x ** 2 + y ** 2 > (side / 2.0) ** 2 and i < side ** 2:
+            continue
+        v = Vector(rnd.uniform(-0.5, 0.5), rnd.uniform(-0.5, 0.5))
+        disks.append(Disk(Point(x * 2.2, y * 2.2), 1, 1e10, v))
+    return disks
+
+def centralMass(n, seed=0):
+    '''A very massive disk (the big disk of the orbit scene) with n-1
+small disks in circular orbits around it.
+
+    '''
+
+    rnd = random.Random(seed)
+    M = 5.97219e+14
+    disks = [Disk(Point(0, 0), 5, M, Vector(0, 0))]
+    for i in range(n - 1):
+        r = rnd.uniform(10, 10 + 5 * sqrt(n))
+        angle = rnd.uniform(0, 2 * pi)
+        speed = sqrt(G * M / r)
+        disks.append(Disk(Point(r * cos(angle), r * sin(angle)), 0.5, 1,
+                          Vector(-speed * sin(angle), speed * cos(angle))))
+    return disks
+
+def lattice(n, seed=0):
+    '''n disks at rest on a square lattice, each touching its neighbors.'''
+
+    side = int(ceil(sqrt(n)))
+    return [Disk(Point((i % side) * 2.0, (i // side) * 2.0), 1, 1e6)
+            for i in range(n)]
+
+# The fixed scenes that can be loaded by name.
+SCENES = {
+    'orbit': orbit,
+}
+
+# The scene generators, which create scenes with any number of disks.
+GENERATORS = {
+    'gas': uniformGas,
+    'cluster': denseCluster,
+    'central': centralMass,
+    'lattice': lattice,
+}
+
+def loadScene(name, n=100, seed=0):
+    '''Returns the disks of the scene with the given name. For generated
+scenes, `n` is the number of disks and `seed` the random seed.
+
+    '''
+
+    if name in SCENES:
+        return SCENES[name]()
+    elif name in GENERATORS:
+        return GENERATORS[name](n, seed)
+    else:
+        raise ValueError('Unknown scene: {}'.format(name))
+
+# The formats of scene files, by extension.
+FILE_FORMATS = ['.npz', '.json']
+
+def sceneArrays(world):
+    '''Returns the centers, radii, masses and velocities of the disks of a
+world, as NumPy arrays for array-backed worlds and as lists otherwise.
+
+    '''
+
+    if hasattr(world, 'centers'):
+        return world.centers, world.radii, world.masses, world.velocities
+
+    disks = world.disks
+    return ([[d.center.x, d.center.y] for d in disks],
+            [d.radius for d in disks],
+            [d.mass for d in disks],
+            [[d.velocity.x, d.velocity.y] for d in disks])
+
+def sceneState(world):
+    '''Returns the time of a world and the state of its disks as a
+JSON-serializable dictionary.
+
+    '''
+
+    centers, radii, masses, velocities = [tolist(a) for a in sceneArrays(world)]
+    return {
+        'time': world.time,
+        'disks': [{'center': [float(c[0]), float(c[1])],
+                   'velocity': [float(v[0]), float(v[1])],
+                   'radius': float(r),
+                   'mass': float(m)}
+                  for c, v, r, m in zip(centers, velocities, radii, masses)],
+    }
+
+def fileFormat(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FILE_FORMATS:
+        raise ValueError('Unknown scene file format: {}'.format(path))
+    return ext
+
+def saveSceneFile(path, world):
+    '''Saves the disks of a world to a scene file. The format is chosen by
+the extension of the path: '.npz' for a NumPy archive of the arrays
+(see sceneArrays), or '.json' for the state format of the runner.
+
+    '''
+
+    centers, radii, masses, velocities = sceneArrays(world)
+    if fileFormat(path) == '.npz':
+        import numpy
+        numpy.savez(path, centers=numpy.asarray(centers, dtype=float).reshape(-1, 2),
+                    radii=radii, masses=masses,
+                    velocities=numpy.asarray(velocities, dtype=float).reshape(-1, 2))
+        return
+
+    state = sceneState(world)
+    with open(path, 'w') as f:
+        json.dump(state, f)
+
+def loadSceneFile(path):
+    '''Loads a scene file saved by saveSceneFile (or, for JSON, written by
+the runner), and returns the centers, radii, masses and velocities of
+its disks, to be passed to World.fromArrays. They are NumPy arrays for
+'.npz' files and lists for '.json' files.
+
+    '''
+
+    if fileFormat(path) == '.npz':
+        import numpy
+        with numpy.load(path) as data:
+            return (data['centers'], data['radii'], data['masses'],
+                    data['velocities'])
+
+    with open(path) as f:
+        state = json.load(f)
+    if 'state' in state:
+        # The output of the runner.
+        state = state['state']
+    disks = state['disks']
+    return ([d['center'] for d in disks],
+            [d['radius'] for d in disks],
+            [d['mass'] for d in disks],
+            [d['velocity'] for d in disks])
+
@@ -0,0 +1,86 @@
+from timeit import default_timer
+
+# The phases of a time step, in the order they run.
+PHASES = ['gravity', 'broadphase', 'contact', 'integrate',
+          'collision', 'prune', 'move']
+
+# The counters kept for a time step.
+COUNTERS = ['pairs', 'contacts', 'collisions', 'pruned', 'asleep']
+
+class StepStats(object):
+    '''Timing and counters of a time step of a world.
+
+`times` maps each phase in PHASES to the wall-clock time spent in it,
+in seconds, and `total` is the time of the whole step. The counters
+are the number of candidate pairs tested for contact and collision
+(`pairs`), how many of them were in contact (`contacts`) or collided
+(`collisions`), the number of collisions removed by pruning
+(`pruned`), and the number of disks asleep after the step (`asleep`).
+
+The timer runs from one call to `lap` to the next, so timing a phase
+costs a single clock read. Stats of several steps can be summed with
+`add`.
+
+    '''
+
+    def __init__(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.total = 0.0
+        self.steps = 0
+        self.pairs = 0
+        self.contacts = 0
+        self.collisions = 0
+        self.pruned = 0
+        self.asleep = 0
+        self.first = self.last = None
+
+    def start(self):
+        '''Starts timing a step.'''
+
+        self.last = self.first = default_timer()
+
+    def lap(self, phase):
+        '''Adds the time since the previous lap (or the start) to `phase`.'''
+
+        now = default_timer()
+        self.times[phase] += now - self.last
+        self.last = now
+
+    def stop(self):
+        '''Stops timing the step.'''
+
+        self.total += default_timer() - self.first
+        self.steps += 1
+
+    def add(self, other):
+        '''Adds the times and counters of `other` to these.'''
+
+        for phase in PHASES:
+            self.times[phase] += other.times[phase]
+        self.total += other.total
+        self.steps += other.steps
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def asDict(self):
+        '''Returns the stats as a JSON-serializable dictionary.'''
+
+        d = dict((name, getattr(self, name)) for name in COUNTERS)
+        d['times'] = dict(self.times)
+        d['total'] = self.total
+        d['steps'] = self.steps
+        return d
+
+    def summary(self):
+        '''Returns the stats as a list of short lines of text, e.g. for an
+on-screen overlay. Times are shown in milliseconds per step.
+
+        '''
+
+        steps = max(self.steps, 1)
+        lines = ['step {:7.2f} ms'.format(1000.0 * self.total / steps)]
+        lines.extend('{:10} {:7.2f} ms'.format(phase, 1000.0 * self.times[phase] / steps)
+                     for phase in PHASES)
+        lines.extend('{:10} {:7}'.format(name, getattr(self, name) // steps)
+                     for name in COUNTERS)
+        return lines
@@ -0,0 +1,156 @@
+import unittest
+import itertools
+import numpy
+from point import Point
+from vector import Vector
+from disk import Disk
+from world import World, calculateCollision
+from arrayworld import ArrayWorld, collisionImpulses, firstCollisions
+from scenes import loadScene
+
+def orbit():
+    return [Disk(Point(20, 20), 2, 1, Vector(0, 0)),
+            Disk(Point(10, 10), 5, 5.97219e+14, Vector(0, 0))]
+
+def headOn():
+    return [Disk(Point(0, 0), 1, 1, Vector(10, 0)),
+            Disk(Point(2.5, 0), 1, 1, Vector(0, 0))]
+
+class TestArrayWorld(unittest.TestCase):
+    def assertSameState(self, world, array_world):
+        for d1, d2 in zip(world.disks, array_world.disks):
+            self.assertAlmostEqual(d1.center.x, d2.center.x)
+            self.assertAlmostEqual(d1.center.y, d2.center.y)
+            self.assertAlmostEqual(d1.velocity.x, d2.velocity.x)
+            self.assertAlmostEqual(d1.velocity.y, d2.velocity.y)
+
+    def run_both(self, scene, steps, dt):
+        world = World()
+        world.disks = scene()
+        array_world = ArrayWorld()
+        array_world.disks = scene()
+        for i in range(steps):
+            world.update(dt)
+            array_world.update(dt)
+            self.assertSameState(world, array_world)
+
+    def test_views(self):
+        world = ArrayWorld()
+        world.disks = orbit()
+        d = world.disks[0]
+        self.assertTrue(isinstance(d.center, Point))
+        self.assertEqual(d.center, Point(20, 20))
+        self.assertEqual(d.mass, 1)
+
+        d.center = Point(3, 4)
+        self.assertEqual(tuple(world.centers[0]), (3, 4))
+
+        d.velocity.x = 7
+        self.assertEqual(world.velocities[0, 0], 7)
+
+        world.radii[1] = 6
+        self.assertEqual(world.disks[1].radius, 6)
+
+    def test_visuals_are_kept(self):
+        disks = orbit()
+        disks[0].visuals.color = 'white'
+        world = ArrayWorld()
+        world.disks = disks
+        self.assertEqual(world.disks[0].visuals.color, 'white')
+
+    def test_gravity_matches_world(self):
+        self.run_both(orbit, 20, 0.033)
+
+    def test_collision_matches_world(self):
+        self.run_both(headOn, 10, 0.033)
+
+    def test_unsupported_options(self):
+        self.assertRaises(ValueError, ArrayWorld, integrator='verlet')
+        self.assertRaises(ValueError, ArrayWorld, integrator='block')
+        self.assertRaises(ValueError, ArrayWorld, eventDriven=True)
+        self.assertRaises(ValueError, ArrayWorld, allowSleep=True)
+
+    def test_empty_world(self):
+        world = ArrayWorld()
+        world.update(0.033)
+        self.assertEqual(world.disks, [])
+
+    def test_gas_matches_world(self):
+        self.run_both(lambda: loadScene('gas', 30), 10, 0.033)
+
+    def test_many_contacts_match_world(self):
+        self.run_both(lambda: loadScene('lattice', 49), 10, 0.033)
+        self.run_both(lambda: loadScene('cluster', 100), 20, 0.033)
+        self.run_both(lambda: loadScene('central', 150), 15, 0.033)
+
+    def test_from_arrays(self):
+        centers = numpy.array([[20.0, 20.0], [10.0, 10.0]])
+        radii = numpy.array([2.0, 5.0])
+        masses = numpy.array([1, 5.97219e+14])
+        world = ArrayWorld.fromArrays(centers, radii, masses)
+        self.assertTrue(world.centers is centers)
+        self.assertTrue(world.radii is radii)
+        self.assertEqual(world.masses.dtype, float)
+        self.assertEqual(world.velocities.shape, (2, 2))
+        self.assertEqual(world.disks[1].center, Point(10, 10))
+
+        other = ArrayWorld()
+        other.disks = orbit()
+        for i in range(10):
+            world.update(0.033)
+            other.update(0.033)
+        self.assertSameState(other, world)
+
+    def test_from_arrays_checks_shapes(self):
+        with self.assertRaises(ValueError):
+            ArrayWorld.fromArrays(numpy.zeros((2, 2)), numpy.ones(3), numpy.ones(3))
+
+    def test_from_no_arrays(self):
+        world = ArrayWorld.fromArrays([], [], [])
+        world.update(0.033)
+        self.assertEqual(world.disks, [])
+
+class TestCollisionImpulses(unittest.TestCase):
+    def test_matches_calculate_collision(self):
+        disks = loadScene('gas', 40, seed=1) + loadScene('lattice', 9)
+        for d in disks:
+            d.velocity.x *= 20
+            d.velocity.y *= 20
+        world = ArrayWorld()
+        world.disks = disks
+        pairs = list(itertools.combinations(range(len(disks)), 2))
+        i = numpy.array([p[0] for p in pairs])
+        j = numpy.array([p[1] for p in pairs])
+        ci, cj, toi, dv1, dv2 = collisionImpulses(
+            world.centers, world.velocities, world.masses, world.radii, i, j, 0.1)
+
+        expected = {}
+        for a, b in pairs:
+            c1, c2 = calculateCollision(world.disks[a], world.disks[b], 0.1)
+            if c1 is not None:
+                expected[a, b] = c1, c2
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(sorted(expected), sorted(zip(ci.tolist(), cj.tolist())))
+        for k, (a, b) in enumerate(zip(ci.tolist(), cj.tolist())):
+            c1, c2 = expected[a, b]
+            self.assertAlmostEqual(toi[k], c1.toi)
+            self.assertAlmostEqual(dv1[k, 0], c1.dv.x)
+            self.assertAlmostEqual(dv1[k, 1], c1.dv.y)
+            self.assertAlmostEqual(dv2[k, 0], c2.dv.x)
+            self.assertAlmostEqual(dv2[k, 1], c2.dv.y)
+
+    def test_first_collisions(self):
+        i = numpy.array([0, 0, 1, 2])
+        j = numpy.array([1, 2, 3, 3])
+        toi = numpy.array([0.5, 0.2, 0.5, 0.2])
+        keep = firstCollisions(i, j, toi)
+        self.assertEqual(keep.tolist(), [False, True, False, True])
+
+    def test_pruned_collisions_dont_count(self):
+        # Disk 0 hits disk 1 first, so its collision with disk 2 is
+        # dropped, and disk 2 is then free to hit disk 3.
+        i = numpy.array([0, 0, 2])
+        j = numpy.array([1, 2, 3])
+        toi = numpy.array([0.010, 0.0126, 0.028])
+        keep = firstCollisions(i, j, toi)
+        self.assertEqual(keep.tolist(), [True, False, True])
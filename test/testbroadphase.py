@@ -0,0 +1,73 @@
+import unittest
+import random
+import itertools
+from point import Point
+from vector import Vector
+from disk import Disk
+from world import World
+from broadphase import AllPairs, SpatialHash, SweepAndPrune, insertionSort
+
+def gas(n, seed=0):
+    rnd = random.Random(seed)
+    return [Disk(Point(rnd.uniform(0, 100), rnd.uniform(0, 100)),
+                 rnd.uniform(0.5, 2), 1,
+                 Vector(rnd.uniform(-20, 20), rnd.uniform(-20, 20)))
+            for i in range(n)]
+
+class TestBroadPhase(unittest.TestCase):
+    def test_spatial_hash_pairs(self):
+        disks = gas(200)
+        reach = [d.radius + abs(d.velocity) * 0.1 for d in disks]
+        expected = [(d1, d2)
+                    for (i, d1), (j, d2) in itertools.combinations(enumerate(disks), 2)
+                    if abs(d2.center - d1.center) <= reach[i] + reach[j]]
+        self.assertEqual(SpatialHash().pairs(disks, reach), expected)
+
+    def test_spatial_hash_few_disks(self):
+        self.assertEqual(SpatialHash().pairs([], []), [])
+        self.assertEqual(SpatialHash().pairs(gas(1), [1]), [])
+
+    def test_spatial_hash_negative_coordinates(self):
+        d1 = Disk(Point(-0.5, -0.5), 1, 1)
+        d2 = Disk(Point(0.5, 0.5), 1, 1)
+        self.assertEqual(SpatialHash().pairs([d1, d2], [1, 1]), [(d1, d2)])
+
+    def test_sweep_and_prune_pairs(self):
+        disks = gas(200)
+        reach = [d.radius + abs(d.velocity) * 0.1 for d in disks]
+        sap = SweepAndPrune()
+        self.assertEqual(sap.pairs(disks, reach), SpatialHash().pairs(disks, reach))
+
+        # Move the disks a bit and query again, re-using the sorted
+        # end points.
+        for d in disks:
+            d.updatePosition(0.1)
+        self.assertEqual(sap.pairs(disks, reach), SpatialHash().pairs(disks, reach))
+
+        # Change the disks.
+        disks = disks[10:]
+        reach = reach[10:]
+        self.assertEqual(sap.pairs(disks, reach), SpatialHash().pairs(disks, reach))
+
+    def test_insertion_sort(self):
+        items = [5, 1, 4, 1, 3, 9, 2]
+        insertionSort(items)
+        self.assertEqual(items, [1, 1, 2, 3, 4, 5, 9])
+
+    def check_world(self, broadphase):
+        w1 = World(broadphase=AllPairs())
+        w1.disks = gas(60, seed=1)
+        w2 = World(broadphase=broadphase)
+        w2.disks = gas(60, seed=1)
+        for i in range(10):
+            w1.update(0.05)
+            w2.update(0.05)
+        for d1, d2 in zip(w1.disks, w2.disks):
+            self.assertEqual((d1.center.x, d1.center.y), (d2.center.x, d2.center.y))
+            self.assertEqual((d1.velocity.x, d1.velocity.y), (d2.velocity.x, d2.velocity.y))
+
+    def test_world_with_spatial_hash(self):
+        self.check_world(SpatialHash())
+
+    def test_world_with_sweep_and_prune(self):
+        self.check_world(SweepAndPrune())
@@ -0,0 +1,97 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy
+from world import World
+from arrayworld import ArrayWorld
+from scenes import loadScene
+from checkpoint import saveCheckpoint, loadCheckpoint, restoreCheckpoint, \
+     HEADER_SIZE
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'world.ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def state(self, world):
+        return [(d.center.x, d.center.y, d.velocity.x, d.velocity.y,
+                 d.acceleration.x, d.acceleration.y, d.force.x, d.force.y,
+                 d.mass, d.radius) for d in world.disks]
+
+    def test_round_trip(self):
+        world = World()
+        world.disks = loadScene('central', 20)
+        world.update(0.033)
+        saveCheckpoint(self.path, world)
+
+        restored = World()
+        restoreCheckpoint(self.path, restored)
+        self.assertEqual(restored.time, world.time)
+        self.assertEqual(self.state(restored), self.state(world))
+
+    def test_arrays_are_mapped(self):
+        world = ArrayWorld()
+        world.disks = loadScene('gas', 20)
+        world.update(0.033)
+        saveCheckpoint(self.path, world)
+
+        time, arrays = loadCheckpoint(self.path)
+        self.assertEqual(time, world.time)
+        self.assertTrue(all(isinstance(a, numpy.memmap) for a in arrays))
+
+        restored = ArrayWorld()
+        restoreCheckpoint(self.path, restored)
+        self.assertEqual(self.state(restored), self.state(world))
+
+        # Stepping the restored world doesn't change the checkpoint.
+        restored.update(0.033)
+        time, arrays = loadCheckpoint(self.path)
+        self.assertEqual(arrays[0].tolist(), world.centers.tolist())
+
+    def test_resume(self):
+        # A run resumed from a checkpoint ends up in the same state as
+        # an uninterrupted run.
+        world = World(integrator='verlet')
+        world.disks = loadScene('central', 20)
+        for i in range(10):
+            world.update(0.033)
+        saveCheckpoint(self.path, world)
+        for i in range(10):
+            world.update(0.033)
+
+        restored = World(integrator='verlet')
+        restoreCheckpoint(self.path, restored)
+        for i in range(10):
+            restored.update(0.033)
+        self.assertEqual(self.state(restored), self.state(world))
+
+    def test_empty_world(self):
+        saveCheckpoint(self.path, World())
+        restored = World()
+        restoreCheckpoint(self.path, restored)
+        self.assertEqual(restored.disks, [])
+
+    def test_bad_files(self):
+        world = World()
+        world.disks = loadScene('orbit')
+        saveCheckpoint(self.path, world)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        for bad in ['XXXX' + data[4:], data[:4] + '\x02' + data[5:],
+                    data[:-8], data[:10]]:
+            with open(self.path, 'wb') as f:
+                f.write(bad)
+            with self.assertRaises(ValueError):
+                loadCheckpoint(self.path)
+
+    def test_size(self):
+        world = World()
+        world.disks = loadScene('gas', 7)
+        saveCheckpoint(self.path, world)
+        self.assertEqual(os.path.getsize(self.path), HEADER_SIZE + 7 * 10 * 8)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
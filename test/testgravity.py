@@ -0,0 +1,63 @@
+import unittest
+import random
+from point import Point
+from vector import Vector
+from disk import Disk
+from world import World
+from gravity import G, ExactGravity, BarnesHutGravity, gravityError
+
+def randomDisks(n, seed=0):
+    rnd = random.Random(seed)
+    return [Disk(Point(rnd.uniform(0, 1000), rnd.uniform(0, 1000)),
+                 1, rnd.uniform(1e6, 1e9))
+            for i in range(n)]
+
+class TestGravity(unittest.TestCase):
+    def test_exact_two_disks(self):
+        d1 = Disk(Point(0, 0), 1, 10)
+        d2 = Disk(Point(3, 4), 1, 20)
+        f1, f2 = ExactGravity().forces([d1, d2])
+        fg = G * 10 * 20 / 25.0
+        self.assertEqual(f1, Vector(fg * 3 / 5.0, fg * 4 / 5.0))
+        self.assertEqual(f2, Vector(-fg * 3 / 5.0, -fg * 4 / 5.0))
+
+    def test_barnes_hut_with_zero_theta_is_exact(self):
+        disks = randomDisks(50)
+        max_error, rms_error = gravityError(disks, BarnesHutGravity(theta=0))
+        self.assertAlmostEqual(max_error, 0)
+        self.assertAlmostEqual(rms_error, 0)
+
+    def test_barnes_hut_error(self):
+        disks = randomDisks(200)
+        _, small = gravityError(disks, BarnesHutGravity(theta=0.3))
+        _, large = gravityError(disks, BarnesHutGravity(theta=1.0))
+        self.assertTrue(small < 0.01)
+        self.assertTrue(small < large)
+
+    def test_coincident_disks(self):
+        disks = [Disk(Point(1, 1), 1, 1) for i in range(3)]
+        forces = BarnesHutGravity().forces(disks)
+        self.assertEqual(forces, [Vector(0, 0)] * 3)
+
+    def test_invalid_theta(self):
+        with self.assertRaises(ValueError):
+            BarnesHutGravity(theta=-1)
+
+    def test_world_option(self):
+        world = World(gravity=BarnesHutGravity(theta=0))
+        world.disks = randomDisks(10)
+        expected = ExactGravity().forces(world.disks)
+        world.update(0.033)
+        for d, f in zip(world.disks, expected):
+            self.assertAlmostEqual(d.force.x, f.x)
+            self.assertAlmostEqual(d.force.y, f.y)
+
+class TestForcesOn(unittest.TestCase):
+    def test_matches_forces(self):
+        disks = randomDisks(30)
+        targets = [0, 7, 29]
+        for solver in [ExactGravity(), BarnesHutGravity(0.5)]:
+            forces = solver.forces(disks)
+            for i, f in zip(targets, solver.forcesOn(targets, disks)):
+                self.assertAlmostEqual(f.x, forces[i].x, delta=abs(forces[i]) * 1e-9)
+                self.assertAlmostEqual(f.y, forces[i].y, delta=abs(forces[i]) * 1e-9)
@@ -0,0 +1,53 @@
+import unittest
+import logging
+from StringIO import StringIO
+from point import Point
+from vector import Vector
+from disk import Disk
+from world import World, DIAGNOSTICS
+from handlers import IntegrationBuffer
+
+class TestIntegrationBuffer(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('diskworld.world')
+        self.buffer = IntegrationBuffer(capacity=3)
+        self.logger.addHandler(self.buffer)
+
+        self.world = World()
+        self.world.disks = [Disk(Point(0, 0), 1, 1, Vector(10, 0)),
+                            Disk(Point(2.5, 0), 1, 1, Vector(0, 0))]
+
+    def tearDown(self):
+        self.logger.removeHandler(self.buffer)
+        self.logger.setLevel(logging.NOTSET)
+
+    def test_not_collected_when_disabled(self):
+        self.logger.setLevel(logging.DEBUG)
+        self.world.update(0.033)
+        self.assertEqual(len(self.buffer.records), 0)
+
+    def test_ring_buffer(self):
+        self.logger.setLevel(DIAGNOSTICS)
+        for i in range(5):
+            self.world.update(0.033)
+        self.assertEqual(len(self.buffer.records), 3)
+
+        r = self.buffer.records[-1]
+        self.assertEqual(len(r['x1']), 2)
+        self.assertEqual(r['c1'], [[], []])
+
+    def test_snapshots(self):
+        self.logger.setLevel(DIAGNOSTICS)
+        self.world.update(0.1)
+        r = self.buffer.records[-1]
+        (other, toi), = r['c1'][0]
+        self.assertEqual(other, 1)
+        self.assertAlmostEqual(toi, 0.05)
+        self.assertEqual(r['v0'], [(10, 0), (0, 0)])
+
+    def test_dump(self):
+        self.logger.setLevel(DIAGNOSTICS)
+        self.world.update(0.1)
+        stream = StringIO()
+        self.buffer.dump(stream)
+        self.assertTrue('[collision]' in stream.getvalue())
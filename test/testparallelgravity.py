@@ -0,0 +1,58 @@
+import unittest
+import random
+from point import Point
+from disk import Disk
+from gravity import ExactGravity
+from arrayworld import ArrayWorld
+from parallelgravity import ParallelGravity
+
+def randomDisks(n, seed=0):
+    rnd = random.Random(seed)
+    return [Disk(Point(rnd.uniform(0, 1000), rnd.uniform(0, 1000)),
+                 1, rnd.uniform(1e6, 1e9))
+            for i in range(n)]
+
+class TestParallelGravity(unittest.TestCase):
+    def setUp(self):
+        self.gravity = ParallelGravity(processes=2, blockSize=16)
+
+    def tearDown(self):
+        self.gravity.close()
+
+    def assertForcesEqual(self, forces, expected):
+        self.assertEqual(len(forces), len(expected))
+        for f, e in zip(forces, expected):
+            self.assertAlmostEqual(f.x, e.x, delta=abs(e) * 1e-9)
+            self.assertAlmostEqual(f.y, e.y, delta=abs(e) * 1e-9)
+
+    def test_matches_exact(self):
+        disks = randomDisks(100)
+        self.assertForcesEqual(self.gravity.forces(disks),
+                               ExactGravity().forces(disks))
+
+    def test_growing_and_shrinking(self):
+        for n in [10, 50, 3, 0, 120]:
+            disks = randomDisks(n, seed=n)
+            self.assertForcesEqual(self.gravity.forces(disks),
+                                   ExactGravity().forces(disks))
+        self.assertEqual(self.gravity.capacity, 120)
+
+    def test_coincident_disks(self):
+        disks = [Disk(Point(1, 1), 1, 1) for i in range(3)]
+        for f in self.gravity.forces(disks):
+            self.assertEqual((f.x, f.y), (0, 0))
+
+    def test_array_world(self):
+        w1 = ArrayWorld()
+        w1.disks = randomDisks(60)
+        w2 = ArrayWorld(gravity=self.gravity)
+        w2.disks = randomDisks(60)
+        for i in range(3):
+            w1.update(0.033)
+            w2.update(0.033)
+        for d1, d2 in zip(w1.disks, w2.disks):
+            self.assertAlmostEqual(d1.center.x, d2.center.x)
+            self.assertAlmostEqual(d1.center.y, d2.center.y)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, ParallelGravity, 0)
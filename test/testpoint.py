@@ -48,3 +48,21 @@ class TestPoint(unittest.TestCase):
         v = Vector(2, 3.4)
         self.assertTrue(isinstance(p - v, Point))
         self.assertEqual(p - v, Point(3.5, 2.6))
+
+    def test_in_place_addition(self):
+        p = Point(1, 2)
+        r = p.iadd(Vector(3, 4))
+        self.assertTrue(r is p)
+        self.assertEqual((p.x, p.y), (4, 6))
+
+    def test_in_place_subtraction(self):
+        p = Point(1, 2)
+        r = p.isub(Vector(3, 5))
+        self.assertTrue(r is p)
+        self.assertEqual((p.x, p.y), (-2, -3))
+
+    def test_in_place_scaled_addition(self):
+        p = Point(1, 2)
+        r = p.iaddScaled(Vector(3, 4), 2)
+        self.assertTrue(r is p)
+        self.assertEqual((p.x, p.y), (7, 10))
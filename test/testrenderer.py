@@ -0,0 +1,298 @@
+import unittest
+import pygame
+from point import Point
+from vector import Vector
+from disk import Disk
+from world import World
+from camera import Camera
+from renderer import Renderer, Guide, Trail, SpriteCache
+
+WHITE = pygame.Color(255, 255, 255)
+BLUE = pygame.Color(0, 0, 255)
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self.world = World()
+        self.world.disks = [Disk(Point(x, y), 1.5, 1)
+                            for x in range(-10, 50, 3)
+                            for y in range(-10, 40, 3)]
+        for d in self.world.disks:
+            d.visuals.color = WHITE
+        self.camera = Camera(bottomleft=Point(0, 0), topright=Point(39, 29))
+        self.surface = pygame.Surface((640, 480))
+        self.renderer = Renderer(self.world, self.camera, self.surface)
+
+    def test_transform(self):
+        transform = self.renderer.surfaceTransform()
+        sx, sy, ox, oy = transform
+        for p in [Point(0, 0), Point(39, 29), Point(12.3, 4.5), Point(-3, 40)]:
+            x, y = self.renderer.worldToSurfaceCoord(p)
+            self.assertAlmostEqual(p.x * sx + ox, x, delta=1)
+            self.assertAlmostEqual(p.y * sy + oy, y, delta=1)
+
+    def test_culling(self):
+        self.camera.zoom(0.3)
+        self.camera.pan(Vector(4, -2))
+        indices, xs, ys, rs = self.renderer.visibleDisks(self.renderer.surfaceTransform())
+        expected = [i for i, d in enumerate(self.world.disks) if self.camera.isInView(d)]
+        self.assertEqual(indices, expected)
+        for i, x, y in zip(indices, xs, ys):
+            ex, ey = self.renderer.worldToSurfaceCoord(self.world.disks[i].center)
+            self.assertAlmostEqual(x, ex, delta=1)
+            self.assertAlmostEqual(y, ey, delta=1)
+
+    def test_empty_world(self):
+        self.world.disks = []
+        self.renderer.update(0.033)
+
+    def test_update(self):
+        self.renderer.update(0.033)
+        self.assertEqual(self.surface.get_at((320, 240)), WHITE)
+
+    def test_trails(self):
+        d = self.world.disks[0]
+        d.visuals.trail = Trail(0.1, 3)
+        for i in range(10):
+            d.center.x += 0.1
+            self.renderer.update(0.033)
+        self.assertEqual(len(d.visuals.trail), 4)
+
+    def test_interpolation(self):
+        self.world.disks = self.world.disks[:2]
+        self.renderer.saveState()
+        for d in self.world.disks:
+            d.center.x += 1.0
+        centers, radii = self.renderer.diskArrays()
+        self.assertEqual(centers[0, 0], self.world.disks[0].center.x)
+
+        self.renderer.update(0.033, 0.25)
+        centers, radii = self.renderer.diskArrays()
+        self.assertAlmostEqual(centers[0, 0], self.world.disks[0].center.x - 0.75)
+        self.assertAlmostEqual(centers[1, 1], self.world.disks[1].center.y)
+
+        # the disks changed; nothing to interpolate from
+        self.world.disks = self.world.disks[:1]
+        centers, radii = self.renderer.diskArrays()
+        self.assertEqual(centers[0, 0], self.world.disks[0].center.x)
+
+    def test_sprites(self):
+        self.renderer.update(0.033)
+        self.assertEqual(len(self.renderer.sprites), 1)
+        self.renderer.update(0.033)
+        self.assertEqual(self.renderer.sprites.misses, 1)
+
+        # zooming drops the sprites of the old size
+        self.camera.zoom(0.1)
+        self.renderer.update(0.033)
+        self.assertEqual(len(self.renderer.sprites), 1)
+        self.assertEqual(self.renderer.sprites.misses, 2)
+        self.assertEqual(self.surface.get_at((320, 240)), WHITE)
+
+    def test_large_disks_are_not_cached(self):
+        self.world.disks = self.world.disks[:1]
+        self.world.disks[0].center = Point(19.5, 14.5)
+        self.world.disks[0].radius = 20
+        self.renderer.update(0.033)
+        self.assertEqual(len(self.renderer.sprites), 0)
+        self.assertEqual(self.surface.get_at((320, 240)), WHITE)
+
+    def test_guides_leave_velocities_alone(self):
+        d = self.world.disks[0]
+        d.velocity = Vector(1, 2)
+        d.visuals.guide = Guide()
+        d.visuals.guide.start = d.center
+        d.visuals.guide.end = d.center + Vector(20, 20)
+        self.renderer.update(0.033)
+        self.assertEqual(d.velocity, Vector(1, 2))
+        self.assertTrue(all(d2.velocity == Vector(0, 0) for d2 in self.world.disks[1:]))
+
+class TestLevelOfDetail(unittest.TestCase):
+    def setUp(self):
+        # 640 pixels for 640 units, so disks with a radius below 1 are
+        # smaller than a pixel.
+        self.world = World()
+        self.camera = Camera(bottomleft=Point(0, 0), topright=Point(640, 480))
+        self.surface = pygame.Surface((640, 480))
+        self.surface.fill(BLUE)
+        self.renderer = Renderer(self.world, self.camera, self.surface)
+
+    def addDisks(self, points, radius=0.2):
+        for x, y in points:
+            d = Disk(Point(x, y), radius, 1)
+            d.visuals.color = WHITE
+            self.world.disks.append(d)
+
+    def test_small_disks_are_single_pixels(self):
+        self.addDisks([(100.5, 100.5), (300.5, 200.5)])
+        self.renderer.update(0)
+        self.assertEqual(self.surface.get_at((100, 379)), WHITE)
+        self.assertEqual(self.surface.get_at((300, 279)), WHITE)
+        self.assertEqual(self.surface.get_at((101, 379)), BLUE)
+
+    def test_dense_cells(self):
+        # Eight disks in one cell of 4 x 4 pixels cover half of it.
+        self.addDisks([(100.5, 100.5)] * 8)
+        self.renderer.update(0)
+        for x in range(100, 104):
+            for y in range(376, 380):
+                c = self.surface.get_at((x, y))
+                self.assertTrue(100 < c.r < 155)
+                self.assertEqual(c.b, 255)
+
+    def test_large_disks_are_detailed(self):
+        self.addDisks([(100.5, 100.5)], radius=5)
+        self.addDisks([(300.5, 200.5)])
+        batch = []
+        self.renderer.transform = self.renderer.surfaceTransform()
+        self.renderer.drawDisks(batch=batch)
+        self.assertEqual(len(batch), 2)
+        # The image of the small disk covers a single cell.
+        self.assertEqual(batch[0][0].get_size(), (4, 4))
+        self.assertEqual(batch[1][0].get_size(), (11, 11))
+
+    def test_detail_everywhere(self):
+        self.addDisks([(100.5, 100.5)] * 8)
+        self.renderer.detailRadius = 0
+        batch = []
+        self.renderer.transform = self.renderer.surfaceTransform()
+        self.renderer.drawDisks(batch=batch)
+        self.assertEqual(len(batch), 8)
+
+    def test_dirty_mode_reuses_the_image(self):
+        self.addDisks((x + 0.5, 100.5) for x in range(0, 600, 3))
+        renderer = Renderer(self.world, self.camera, self.surface,
+                            background=BLUE, dirty=True)
+        renderer.update(0)
+        self.assertEqual(renderer.update(0), [])
+
+    def test_moved_small_disks(self):
+        self.addDisks([(100.5, 100.5)])
+        self.renderer.update(0)
+        d = self.world.disks[0]
+        d.center = Point(300.5, 200.5)
+        self.surface.fill(BLUE)
+
+        # Without a step, the old image is kept until it's invalidated.
+        self.renderer.update(0)
+        self.assertEqual(self.surface.get_at((100, 379)), WHITE)
+        self.surface.fill(BLUE)
+        self.renderer.invalidateSmallDisks()
+        self.renderer.update(0)
+        self.assertEqual(self.surface.get_at((300, 279)), WHITE)
+
+        # Stepping the world draws it again.
+        d.center = Point(400.5, 200.5)
+        self.world.update(0.01)
+        self.surface.fill(BLUE)
+        self.renderer.update(0)
+        self.assertEqual(self.surface.get_at((400, 279)), WHITE)
+
+class TestDirtyRenderer(unittest.TestCase):
+    def setUp(self):
+        self.world = World()
+        self.world.disks = [Disk(Point(x, y), 1.5, 1)
+                            for x in range(2, 39, 5)
+                            for y in range(2, 29, 5)]
+        for d in self.world.disks:
+            d.visuals.color = WHITE
+        self.camera = Camera(bottomleft=Point(0, 0), topright=Point(39, 29))
+        self.surface = pygame.Surface((640, 480))
+        self.renderer = Renderer(self.world, self.camera, self.surface,
+                                 background=BLUE, dirty=True)
+
+    def assertSameAsFullFrame(self):
+        surface = pygame.Surface((640, 480))
+        surface.fill(BLUE)
+        Renderer(self.world, self.camera, surface).update(0)
+        self.assertEqual(pygame.image.tostring(surface, 'RGB'),
+                         pygame.image.tostring(self.surface, 'RGB'))
+
+    def test_nothing_moves(self):
+        self.assertEqual(self.renderer.update(0.033), [self.surface.get_rect()])
+        self.assertEqual(self.renderer.update(0.033), [])
+        self.assertEqual(self.renderer.update(0.033), [])
+
+    def test_one_disk_moves(self):
+        self.renderer.update(0.033)
+        d = self.world.disks[10]
+        d.center = Point(d.center.x + 1.2, d.center.y + 0.9)
+        rects = self.renderer.update(0.033)
+        self.assertEqual(len(rects), 2)
+        self.assertTrue(all(r.width < 100 and r.height < 100 for r in rects))
+        self.assertSameAsFullFrame()
+
+    def test_overlapping_disks(self):
+        self.renderer.update(0.033)
+        d = self.world.disks[10]
+        d.center = Point(d.center.x + 2.0, d.center.y)
+        self.renderer.update(0.033)
+        self.assertSameAsFullFrame()
+        d.center = Point(d.center.x + 2.0, d.center.y)
+        self.renderer.update(0.033)
+        self.assertSameAsFullFrame()
+
+    def test_invalidate(self):
+        self.renderer.update(0.033)
+        self.surface.fill(WHITE, pygame.Rect(0, 0, 100, 100))
+        self.renderer.invalidate(pygame.Rect(0, 0, 100, 100))
+        self.assertEqual(self.renderer.update(0.033), [pygame.Rect(0, 0, 100, 100)])
+        self.assertSameAsFullFrame()
+
+    def test_needs_background(self):
+        self.assertRaises(ValueError, Renderer, self.world, self.camera,
+                          self.surface, dirty=True)
+
+class TestSpriteCache(unittest.TestCase):
+    def test_sprite(self):
+        sprite = SpriteCache().get(5, WHITE)
+        self.assertEqual(sprite.get_size(), (11, 11))
+        self.assertEqual(sprite.get_at((5, 5)), WHITE)
+        self.assertEqual(sprite.get_at((0, 0)).a, 0)
+
+    def test_least_recently_used_are_evicted(self):
+        cache = SpriteCache(capacity=4)
+        for r in range(4):
+            cache.get(r, WHITE)
+            cache.nextFrame()
+        cache.get(0, WHITE)
+        cache.get(4, WHITE)
+        self.assertEqual(len(cache), 4)
+        self.assertEqual(sorted(k[0] for k in cache.sprites), [0, 2, 3, 4])
+        self.assertEqual((cache.hits, cache.misses), (1, 5))
+
+class TestTrail(unittest.TestCase):
+    def test_append_and_evict(self):
+        trail = Trail(1, 10, capacity=4)
+        for i in range(6):
+            trail.append(i, -i, i * 0.5)
+        self.assertEqual(len(trail), 4)
+        self.assertEqual(trail.pointAt(0), (2, -2))
+
+        trail.evict(2.0)
+        self.assertEqual(len(trail), 2)
+        self.assertEqual(trail.pointAt(0), (4, -4))
+
+        trail.clear()
+        self.assertEqual(len(trail), 0)
+        self.assertEqual(trail.points(), [])
+
+    def test_search(self):
+        trail = Trail(1, 10, capacity=8)
+        for i in range(12):
+            trail.append(i, i, float(i))
+        self.assertEqual(trail.search(0), 0)
+        self.assertEqual(trail.search(5.5), 2)
+        self.assertEqual(trail.search(6), 2)
+        self.assertEqual(trail.search(100), 8)
+
+    def test_few_points(self):
+        trail = Trail(1, 10)
+        for i in range(5):
+            trail.append(i, i, i * 0.1)
+        self.assertEqual(trail.points(), [(i, i) for i in range(5)])
+
+    def test_evenly_timed_points(self):
+        trail = Trail(1, 4)
+        for i in range(100):
+            trail.append(i, 0, i * 0.01)
+        self.assertEqual(trail.points(), [(0, 0), (25, 0), (50, 0), (75, 0)])
@@ -0,0 +1,95 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from StringIO import StringIO
+from scenes import loadScene, saveSceneFile
+from runner import makeWorld, run, worldState, main
+from checkpoint import loadCheckpoint
+
+class TestRunner(unittest.TestCase):
+    def test_run_steps(self):
+        world = makeWorld(loadScene('orbit'))
+        stats = run(world, 0.01, steps=10)
+        self.assertEqual(stats['steps'], 10)
+        self.assertAlmostEqual(world.time, 0.1)
+        self.assertAlmostEqual(stats['simulated_time'], 0.1)
+
+    def test_run_duration(self):
+        world = makeWorld(loadScene('orbit'), array=True)
+        stats = run(world, 0.1, duration=0.95)
+        self.assertEqual(stats['steps'], 10)
+
+    def test_run_needs_limit(self):
+        with self.assertRaises(ValueError):
+            run(makeWorld(loadScene('orbit')), 0.1)
+
+    def test_unknown_scene(self):
+        with self.assertRaises(ValueError):
+            loadScene('nothing')
+
+    def test_state(self):
+        world = makeWorld(loadScene('orbit'), theta=0.5, broadphase='sap')
+        run(world, 0.1, steps=2)
+        state = worldState(world)
+        self.assertAlmostEqual(state['time'], 0.2)
+        self.assertEqual(len(state['disks']), 2)
+        self.assertEqual(state['disks'][1]['radius'], 5)
+
+    def test_main(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        import sys
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            main(['orbit', '--steps', '5', '--output', path])
+        finally:
+            sys.stdout = stdout
+        with open(path) as f:
+            result = json.load(f)
+        os.remove(path)
+        self.assertEqual(result['stats']['steps'], 5)
+        self.assertEqual(len(result['state']['disks']), 2)
+
+    def test_main_scene_file(self):
+        directory = tempfile.mkdtemp()
+        scene = os.path.join(directory, 'gas.npz')
+        output = os.path.join(directory, 'state.json')
+        world = makeWorld(loadScene('gas', 10))
+        saveSceneFile(scene, world)
+        import sys
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            main([scene, '--steps', '2', '--array', '--output', output])
+            # The output of a run can be run again.
+            main([output, '--steps', '2'])
+        finally:
+            sys.stdout = stdout
+        with open(output) as f:
+            result = json.load(f)
+        shutil.rmtree(directory)
+        self.assertEqual(len(result['state']['disks']), 10)
+
+    def test_checkpoints(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'gas.ckpt')
+        import sys
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            main(['gas', '-n', '10', '--steps', '5', '--dt', '0.1',
+                  '--checkpoint', path, '--checkpoint-every', '2'])
+            time, arrays = loadCheckpoint(path)
+            self.assertAlmostEqual(time, 0.5)
+            main(['--restore', path, '--steps', '3', '--dt', '0.1',
+                  '--checkpoint', path])
+        finally:
+            sys.stdout = stdout
+        time, arrays = loadCheckpoint(path)
+        del arrays
+        shutil.rmtree(directory)
+        self.assertAlmostEqual(time, 0.8)
+
@@ -0,0 +1,75 @@
+import unittest
+import itertools
+import os
+import shutil
+import tempfile
+from world import World
+from arrayworld import ArrayWorld
+from scenes import GENERATORS, loadScene, loadSceneFile, saveSceneFile
+
+def overlapping(disks):
+    return [(d1, d2) for d1, d2 in itertools.combinations(disks, 2)
+            if abs(d2.center - d1.center) < d1.radius + d2.radius - 1e-9]
+
+class TestScenes(unittest.TestCase):
+    def test_sizes(self):
+        for name in GENERATORS:
+            for n in (1, 10, 37):
+                self.assertEqual(len(loadScene(name, n)), n)
+
+    def test_reproducible(self):
+        for name in GENERATORS:
+            s1 = loadScene(name, 20, seed=3)
+            s2 = loadScene(name, 20, seed=3)
+            self.assertEqual([(d.center.x, d.center.y) for d in s1],
+                             [(d.center.x, d.center.y) for d in s2])
+
+    def test_no_overlaps(self):
+        for name in GENERATORS:
+            self.assertEqual(overlapping(loadScene(name, 60)), [])
+
+    def test_lattice_in_contact(self):
+        disks = loadScene('lattice', 9)
+        contacts = [(d1, d2) for d1, d2 in itertools.combinations(disks, 2)
+                    if d1.isInContact(d2)]
+        self.assertEqual(len(contacts), 12)
+
+    def test_orbit(self):
+        self.assertEqual(len(loadScene('orbit')), 2)
+
+class TestSceneFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def roundTrip(self, world, name):
+        path = os.path.join(self.directory, name)
+        saveSceneFile(path, world)
+        loaded = World.fromArrays(*loadSceneFile(path))
+        self.assertEqual(len(loaded.disks), len(world.disks))
+        for d1, d2 in zip(world.disks, loaded.disks):
+            self.assertEqual(d1.center, d2.center)
+            self.assertEqual(d1.velocity, d2.velocity)
+            self.assertEqual((d1.radius, d1.mass), (d2.radius, d2.mass))
+
+    def test_npz(self):
+        world = World()
+        world.disks = loadScene('gas', 30)
+        self.roundTrip(world, 'gas.npz')
+
+    def test_json(self):
+        world = World()
+        world.disks = loadScene('central', 30)
+        self.roundTrip(world, 'central.json')
+
+    def test_array_world(self):
+        world = ArrayWorld()
+        world.disks = loadScene('gas', 30)
+        self.roundTrip(world, 'gas.npz')
+        self.roundTrip(world, 'gas.json')
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            loadSceneFile(os.path.join(self.directory, 'scene.txt'))
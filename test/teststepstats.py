@@ -0,0 +1,30 @@
+import unittest
+from stepstats import StepStats, PHASES, COUNTERS
+
+class TestStepStats(unittest.TestCase):
+    def test_laps(self):
+        stats = StepStats()
+        stats.start()
+        for phase in PHASES:
+            stats.lap(phase)
+        stats.stop()
+        self.assertEqual(stats.steps, 1)
+        self.assertTrue(all(t >= 0 for t in stats.times.values()))
+        self.assertTrue(stats.total >= sum(stats.times.values()))
+
+    def test_add(self):
+        s1 = StepStats()
+        s1.pairs, s1.collisions, s1.steps = 10, 2, 1
+        s1.times['gravity'] = 1.0
+        s2 = StepStats()
+        s2.pairs, s2.pruned, s2.steps = 5, 1, 1
+        s2.times['gravity'] = 0.5
+        s1.add(s2)
+        d = s1.asDict()
+        self.assertEqual((d['pairs'], d['collisions'], d['pruned'], d['steps']),
+                         (15, 2, 1, 2))
+        self.assertEqual(d['times']['gravity'], 1.5)
+
+    def test_summary(self):
+        lines = StepStats().summary()
+        self.assertEqual(len(lines), 1 + len(PHASES) + len(COUNTERS))
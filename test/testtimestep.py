@@ -0,0 +1,45 @@
+import unittest
+from timestep import FixedTimestep
+
+class CountingWorld(object):
+    def __init__(self):
+        self.time = 0.0
+        self.steps = 0
+
+    def update(self, dt):
+        self.time += dt
+        self.steps += 1
+
+class TestFixedTimestep(unittest.TestCase):
+    def setUp(self):
+        self.world = CountingWorld()
+        self.loop = FixedTimestep(self.world, 0.01, maxSteps=5)
+
+    def test_accumulates(self):
+        self.assertEqual(self.loop.advance(0.004), 0)
+        self.assertEqual(self.loop.advance(0.004), 0)
+        self.assertEqual(self.loop.advance(0.004), 1)
+        self.assertAlmostEqual(self.loop.alpha, 0.2)
+        self.assertEqual(self.loop.advance(0.025), 2)
+        self.assertAlmostEqual(self.loop.alpha, 0.7)
+        self.assertEqual(self.world.steps, 3)
+
+    def test_matches_wall_clock(self):
+        for i in range(100):
+            self.loop.advance(0.0167)
+        self.assertAlmostEqual(self.world.time + self.loop.accumulator, 1.67)
+
+    def test_max_steps(self):
+        self.assertEqual(self.loop.advance(0.1234), 5)
+        self.assertAlmostEqual(self.loop.dropped, 0.07)
+        self.assertAlmostEqual(self.loop.alpha, 0.34)
+        self.assertEqual(self.loop.advance(0.0), 0)
+
+    def test_reset(self):
+        self.loop.advance(0.005)
+        self.loop.reset()
+        self.assertEqual(self.loop.alpha, 0.0)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, FixedTimestep, self.world, 0)
+        self.assertRaises(ValueError, FixedTimestep, self.world, 0.01, 0)
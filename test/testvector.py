@@ -110,3 +110,30 @@ class TestVector(unittest.TestCase):
         #result = 9 / 5 * Vector(3, 4)
         result = Vector(33.0 / 25, 44.0 / 25)
         self.assertEqual(v1.project(v2), result)
+
+    def test_in_place_addition(self):
+        v = Vector(1, 2)
+        r = v.iadd(Vector(3, 4))
+        self.assertTrue(r is v)
+        self.assertEqual((v.x, v.y), (4, 6))
+
+    def test_in_place_subtraction(self):
+        v = Vector(1, 2)
+        r = v.isub(Vector(3, 5))
+        self.assertTrue(r is v)
+        self.assertEqual((v.x, v.y), (-2, -3))
+
+    def test_in_place_scaled_addition(self):
+        v = Vector(1, 2)
+        r = v.iaddScaled(Vector(3, 4), 0.5)
+        self.assertTrue(r is v)
+        self.assertEqual((v.x, v.y), (2.5, 4))
+
+    def test_invalid_multiplication(self):
+        with self.assertRaises(TypeError):
+            Vector(1, 2) * 'a'
+
+    def test_no_extra_attributes(self):
+        v = Vector(1, 2)
+        with self.assertRaises(AttributeError):
+            v.z = 3
@@ -0,0 +1,591 @@
+import unittest
+import random
+from math import sqrt
+from point import Point
+from vector import Vector
+from disk import Disk
+from world import World, calculateCollision
+from gravity import G, ExactGravity
+from broadphase import AllPairs, SpatialHash, SweepAndPrune
+from scenes import loadScene
+
+class TestEventDriven(unittest.TestCase):
+    def test_chain_of_collisions(self):
+        # Three disks in a row; the first one hits the second, which
+        # in turn hits the third within the same time step.
+        world = World(eventDriven=True)
+        d1 = Disk(Point(0, 0), 1, 1, Vector(10, 0))
+        d2 = Disk(Point(2.5, 0), 1, 1, Vector(0, 0))
+        d3 = Disk(Point(5, 0), 1, 1, Vector(0, 0))
+        world.disks = [d1, d2, d3]
+        world.update(1.0)
+
+        self.assertAlmostEqual(d1.velocity.x, 0)
+        self.assertAlmostEqual(d2.velocity.x, 0)
+        self.assertAlmostEqual(d3.velocity.x, 10)
+        self.assertAlmostEqual(d1.center.x, 0.5)
+        self.assertAlmostEqual(d2.center.x, 3.0)
+        self.assertAlmostEqual(d3.center.x, 14.0)
+        self.assertEqual(len(d2.collisions), 2)
+
+    def test_full_time_step_after_collision(self):
+        world = World(eventDriven=True)
+        d1 = Disk(Point(0, 0), 1, 1, Vector(10, 0))
+        d2 = Disk(Point(2.5, 0), 1, 1, Vector(0, 0))
+        world.disks = [d1, d2]
+        world.update(0.1)
+
+        # The collision happens at t=0.05, and the second disk moves
+        # for the rest of the time step.
+        self.assertAlmostEqual(d1.center.x, 0.5)
+        self.assertAlmostEqual(d2.center.x, 3.0)
+        self.assertAlmostEqual(d2.velocity.x, 10)
+
+    def test_no_collisions(self):
+        world = World(eventDriven=True)
+        d1 = Disk(Point(0, 0), 1, 1, Vector(1, 0))
+        d2 = Disk(Point(0, 10), 1, 1, Vector(-1, 0))
+        world.disks = [d1, d2]
+        world.update(0.5)
+
+        self.assertAlmostEqual(d1.center.x, 0.5)
+        self.assertAlmostEqual(d2.center.x, -0.5)
+
+    def test_broadphase_neighbors(self):
+        # Predicting the events against the neighbors found by the
+        # broad phase gives the same result as checking all pairs.
+        worlds = [World(eventDriven=True),
+                  World(eventDriven=True, broadphase=SpatialHash())]
+        for world in worlds:
+            world.disks = loadScene('cluster', 60)
+            collisions = 0
+            for i in range(20):
+                world.update(0.033)
+                collisions += world.stats.collisions
+            self.assertTrue(collisions > 0)
+
+        for d1, d2 in zip(worlds[0].disks, worlds[1].disks):
+            self.assertAlmostEqual(d1.center.x, d2.center.x)
+            self.assertAlmostEqual(d1.center.y, d2.center.y)
+            self.assertAlmostEqual(d1.velocity.x, d2.velocity.x)
+            self.assertAlmostEqual(d1.velocity.y, d2.velocity.y)
+
+    def test_knocked_out_of_reach(self):
+        # The second disk is at rest, so the broad phase doesn't pair it
+        # with the third one, which it hits once it's been hit.
+        for broadphase in [None, SpatialHash(), SweepAndPrune()]:
+            world = World(eventDriven=True, broadphase=broadphase)
+            world.disks = [Disk(Point(0, 0), 1, 1, Vector(10, 0)),
+                           Disk(Point(2.1, 0), 1, 1),
+                           Disk(Point(4.5, 0), 1, 1)]
+            world.update(0.1)
+            self.assertAlmostEqual(world.disks[1].center.x, 2.5)
+            self.assertAlmostEqual(world.disks[2].center.x, 5.0)
+            self.assertAlmostEqual(world.disks[2].velocity.x, 10)
+
+    def test_sleeping_row(self):
+        # The pairs of sleeping disks are left out by the broad phase.
+        world = World(eventDriven=True, allowSleep=True)
+        world.disks = [Disk(Point(x, 0), 1, 1) for x in (0, 2.05, 4.1)]
+        for i in range(20):
+            world.update(0.033)
+        self.assertEqual(len(world.asleep), 3)
+
+        world.disks.append(Disk(Point(-3, 0), 1, 1, Vector(30, 0)))
+        for i in range(3):
+            world.update(0.033)
+        for d1, d2 in zip(world.disks, world.disks[1:3]):
+            self.assertTrue(d2.center.x - d1.center.x > 2 - 1e-9)
+        self.assertAlmostEqual(world.disks[2].velocity.x, 30)
+
+class TestStats(unittest.TestCase):
+    def test_counters(self):
+        world = World()
+        d1 = Disk(Point(0, 0), 1, 1, Vector(10, 0))
+        d2 = Disk(Point(2.5, 0), 1, 1, Vector(0, 0))
+        d3 = Disk(Point(-2, 0), 1, 1, Vector(0, 0))
+        world.disks = [d1, d2, d3]
+        world.update(0.1)
+
+        stats = world.stats
+        self.assertEqual(stats.steps, 1)
+        self.assertEqual(stats.pairs, 3)
+        self.assertEqual(stats.contacts, 1)
+        self.assertEqual(stats.collisions, 1)
+        self.assertEqual(stats.pruned, 0)
+        self.assertTrue(stats.total >= sum(stats.times.values()))
+
+    def test_pruned(self):
+        # The first disk hits the second before it can reach the third.
+        world = World()
+        d1 = Disk(Point(0, 0), 1, 1, Vector(10, 0))
+        d2 = Disk(Point(2.5, 0), 1, 1, Vector(0, 0))
+        d3 = Disk(Point(1.0, 1.98), 1, 1, Vector(0, 0))
+        world.disks = [d1, d2, d3]
+        world.update(0.1)
+        self.assertEqual(world.stats.collisions, 2)
+        self.assertEqual(world.stats.pruned, 1)
+
+    def test_event_driven(self):
+        world = World(eventDriven=True)
+        world.disks = [Disk(Point(0, 0), 1, 1, Vector(10, 0)),
+                       Disk(Point(2.5, 0), 1, 1, Vector(0, 0)),
+                       Disk(Point(5, 0), 1, 1, Vector(0, 0))]
+        world.update(1.0)
+        self.assertEqual(world.stats.collisions, 2)
+
+class CountingGravity(ExactGravity):
+    def __init__(self):
+        self.calls = 0
+
+    def forces(self, disks):
+        self.calls += 1
+        return ExactGravity.forces(self, disks)
+
+def circularOrbit():
+    # A light disk in a circular orbit around a heavy one.
+    M = 1e15
+    r = 20.0
+    v = sqrt(G * M / r)
+    return [Disk(Point(0, 0), 5, M), Disk(Point(r, 0), 1, 1, Vector(0, v))]
+
+class TestVerlet(unittest.TestCase):
+    def orbitDrift(self, integrator, steps=250, dt=0.02):
+        world = World(integrator=integrator)
+        world.disks = circularOrbit()
+        center, planet = world.disks
+        radii = []
+        for i in range(steps):
+            world.update(dt)
+            radii.append(abs(planet.center - center.center))
+        return max(abs(r - 20.0) for r in radii)
+
+    def test_orbit_drifts_less(self):
+        euler = self.orbitDrift('euler')
+        verlet = self.orbitDrift('verlet')
+        self.assertTrue(verlet < 0.05)
+        self.assertTrue(verlet * 10 < euler)
+
+    def test_one_gravity_pass_per_step(self):
+        gravity = CountingGravity()
+        world = World(gravity=gravity, integrator='verlet')
+        world.disks = circularOrbit()
+        for i in range(10):
+            world.update(0.1)
+        self.assertEqual(gravity.calls, 11)
+
+        # changing the disks invalidates the saved accelerations
+        world.disks = world.disks[:1]
+        world.update(0.1)
+        self.assertEqual(gravity.calls, 13)
+
+    def test_moved_disk_gets_new_acceleration(self):
+        gravity = CountingGravity()
+        world = World(gravity=gravity, integrator='verlet')
+        world.disks = circularOrbit()
+        center, planet = world.disks
+        world.update(0.1)
+        calls = gravity.calls
+
+        # Moving the planet to the other side of the center (as when
+        # dragging it) reverses the pull on it.
+        planet.center = Point(2 * center.center.x - planet.center.x,
+                              2 * center.center.y - planet.center.y)
+        planet.velocity = Vector(0, 0)
+        world.update(0.1)
+        self.assertEqual(gravity.calls, calls + 2)
+        kick = G * center.mass / 20.0 ** 2 * 0.1
+        self.assertAlmostEqual(planet.velocity.x, kick, delta=0.15 * kick)
+
+    def test_collision(self):
+        world = World(integrator='verlet')
+        d1 = Disk(Point(0, 0), 1, 1, Vector(10, 0))
+        d2 = Disk(Point(2.5, 0), 1, 1, Vector(0, 0))
+        world.disks = [d1, d2]
+        world.update(0.1)
+        self.assertAlmostEqual(d1.velocity.x, 0)
+        self.assertAlmostEqual(d2.velocity.x, 10)
+
+    def test_unknown_integrator(self):
+        self.assertRaises(ValueError, World, integrator='rk4')
+
+class CountingForces(ExactGravity):
+    def __init__(self):
+        self.evaluations = 0
+
+    def forces(self, disks):
+        self.evaluations += len(disks)
+        return ExactGravity.forces(self, disks)
+
+    def forcesOn(self, targets, disks):
+        self.evaluations += len(targets)
+        return ExactGravity.forcesOn(self, targets, disks)
+
+class CountingPairs(AllPairs):
+    # Counts the disks passed to the broad phase in the last call.
+    def pairs(self, disks, reach):
+        self.disks = len(disks)
+        return AllPairs.pairs(self, disks, reach)
+
+class TestBlockTimesteps(unittest.TestCase):
+    def scene(self):
+        # A fast orbit, and disks far away moving slowly.
+        disks = circularOrbit()
+        for i in range(20):
+            disks.append(Disk(Point(1000 + 10 * i, 1000), 1, 1, Vector(0, 0.1)))
+        return disks
+
+    def run_scene(self, integrator, dt, steps):
+        gravity = CountingForces()
+        world = World(gravity=gravity, broadphase=SpatialHash(),
+                      integrator=integrator)
+        world.maxLevel = 5
+        world.disks = self.scene()
+        center, planet = world.disks[:2]
+        drift = 0
+        for i in range(steps):
+            world.update(dt)
+            drift = max(drift, abs(abs(planet.center - center.center) - 20.0))
+        return world, gravity.evaluations, drift
+
+    def test_fewer_force_evaluations(self):
+        verlet, verlet_evaluations, verlet_drift = self.run_scene('verlet', 0.02, 128)
+        block, block_evaluations, block_drift = self.run_scene('block', 0.64, 4)
+        self.assertAlmostEqual(verlet.time, block.time)
+        self.assertTrue(block_drift < 2 * verlet_drift)
+        self.assertTrue(block_evaluations * 5 < verlet_evaluations)
+
+        # the orbiting disk takes the smallest steps, the distant ones
+        # the largest
+        self.assertEqual(block.levels[1], 5)
+        self.assertTrue(max(block.levels[2:]) < 5)
+
+    def test_collision(self):
+        world = World(integrator='block')
+        d1 = Disk(Point(0, 0), 1, 1, Vector(10, 0))
+        d2 = Disk(Point(2.5, 0), 1, 1, Vector(0, 0))
+        world.disks = [d1, d2]
+        world.update(0.1)
+        self.assertAlmostEqual(d1.velocity.x, 0)
+        self.assertAlmostEqual(d2.velocity.x, 10)
+        self.assertAlmostEqual(d1.center.x + d2.center.x, 3.5)
+
+    def test_forces_on_match_forces(self):
+        # The forces on some disks in a block of disks in contact, pulled
+        # by a heavy disk, are the same as when calculated for all.
+        def scene():
+            disks = loadScene('lattice', 16)
+            disks.append(Disk(Point(20, 3), 1, 1e13))
+            return disks
+
+        world = World(integrator='block')
+        world.disks = scene()
+        world.stats.start()
+        world.calculateForces(0.1)
+        expected = [(d.acceleration.x, d.acceleration.y) for d in world.disks]
+        self.assertNotEqual(expected[3], (0, 0))
+
+        world = World(integrator='block')
+        world.disks = scene()
+        world.stats.start()
+        speeds, pairs = world.findPairs(0.1)
+        world.calculateForcesOn([3, 5, 16], pairs)
+        for i in [3, 5, 16]:
+            self.assertAlmostEqual(world.disks[i].acceleration.x, expected[i][0])
+            self.assertAlmostEqual(world.disks[i].acceleration.y, expected[i][1])
+        self.assertEqual(world.disks[1].acceleration, Vector(0, 0))
+
+    def test_event_driven(self):
+        # The chain of collisions of TestEventDriven, within one sub step.
+        world = World(integrator='block', eventDriven=True)
+        d1 = Disk(Point(0, 0), 1, 1, Vector(10, 0))
+        d2 = Disk(Point(2.5, 0), 1, 1, Vector(0, 0))
+        d3 = Disk(Point(5, 0), 1, 1, Vector(0, 0))
+        world.disks = [d1, d2, d3]
+        world.maxLevel = 0
+        world.update(1.0)
+
+        self.assertAlmostEqual(d1.velocity.x, 0)
+        self.assertAlmostEqual(d3.velocity.x, 10)
+        self.assertAlmostEqual(d3.center.x, 14.0)
+        self.assertEqual(len(d2.collisions), 2)
+
+    def test_one_broad_phase_per_step(self):
+        world = World(integrator='block')
+        world.disks = loadScene('cluster', 30)
+        world.update(0.033)
+        calls = []
+        findPairs = world.findPairs
+        def countingFindPairs(dt):
+            calls.append(dt)
+            return findPairs(dt)
+        world.findPairs = countingFindPairs
+        for i in range(3):
+            world.update(0.033)
+        self.assertEqual(len(calls), 3)
+
+    def test_empty_world(self):
+        world = World(integrator='block')
+        world.update(0.1)
+        self.assertEqual(world.levels, [])
+
+class TestSleep(unittest.TestCase):
+    def setUp(self):
+        # A resting pile of three disks in contact, and a single disk
+        # at rest further away.
+        self.world = World(gravity=CountingForces(), allowSleep=True)
+        self.pile = [Disk(Point(0, 0), 1, 1), Disk(Point(2, 0), 1, 1),
+                     Disk(Point(1, sqrt(3)), 1, 1)]
+        self.single = Disk(Point(20, 0), 1, 1)
+        self.world.disks = self.pile + [self.single]
+
+    def settle(self):
+        for i in range(20):
+            self.world.update(0.033)
+
+    def test_falls_asleep(self):
+        self.world.update(0.033)
+        self.assertEqual(len(self.world.asleep), 0)
+        self.settle()
+        self.assertEqual(len(self.world.asleep), 4)
+        self.assertEqual(self.world.stats.asleep, 4)
+
+        # asleep, nothing is calculated for them
+        self.world.gravity.evaluations = 0
+        self.world.update(0.033)
+        self.assertEqual(self.world.gravity.evaluations, 0)
+        self.assertEqual(self.world.stats.pairs, 0)
+
+    def test_wakes_island_when_thrown(self):
+        self.settle()
+        self.pile[0].velocity = Vector(-1, 0)
+        self.world.update(0.033)
+        for d in self.pile:
+            self.assertFalse(d in self.world.asleep)
+        self.assertTrue(self.single in self.world.asleep)
+        self.assertTrue(self.pile[0].center.x < 0)
+
+    def test_wakes_when_dragged(self):
+        self.settle()
+        self.single.center = Point(30, 0)
+        self.world.update(0.033)
+        self.assertFalse(self.single in self.world.asleep)
+        self.assertTrue(self.pile[0] in self.world.asleep)
+
+    def test_wakes_when_hit(self):
+        self.settle()
+        bullet = Disk(Point(25, 0), 1, 1, Vector(-100, 0))
+        self.world.disks.append(bullet)
+        for i in range(3):
+            self.world.update(0.033)
+        self.assertFalse(self.single in self.world.asleep)
+        self.assertTrue(self.single.velocity.x < 0)
+        self.assertTrue(self.pile[0] in self.world.asleep)
+
+    def test_moving_disks_stay_awake(self):
+        self.world.disks.append(Disk(Point(50, 50), 1, 1, Vector(1, 0)))
+        self.settle()
+        self.assertFalse(self.world.disks[-1] in self.world.asleep)
+
+    def test_wakes_when_pulled(self):
+        # A disk pulled too weakly to stay awake falls asleep, but
+        # wakes up once gravity would have given it enough speed.
+        world = World(allowSleep=True)
+        pulled = Disk(Point(100, 0), 1, 1)
+        world.disks = [Disk(Point(0, 0), 10, 0.005 * 100 ** 2 / G), pulled]
+        self.settleWorld(world, 20)
+        self.assertTrue(pulled in world.asleep)
+        self.settleWorld(world, 130)
+        self.assertFalse(pulled in world.asleep)
+        self.assertTrue(pulled.velocity.x < -0.01)
+
+    def test_island_at_rest_on_a_mass_stays_asleep(self):
+        # The forces between the disks of an island cancel out.
+        world = World(allowSleep=True)
+        world.disks = [Disk(Point(0, 0), 10, 0.005 * 100 ** 2 / G),
+                       Disk(Point(11, 0), 1, 1)]
+        self.settleWorld(world, 150)
+        self.assertEqual(len(world.asleep), 2)
+
+    def test_wakes_large_island_when_pulled(self):
+        # Two disks in contact, most of the disks of the world, pulled
+        # by the third.
+        world = World(allowSleep=True)
+        pulled = [Disk(Point(100, 0), 1, 1), Disk(Point(102, 0), 1, 1)]
+        world.disks = [Disk(Point(0, 0), 10, 0.005 * 100 ** 2 / G)] + pulled
+        self.settleWorld(world, 20)
+        self.assertTrue(pulled[0] in world.asleep)
+        self.settleWorld(world, 130)
+        self.assertFalse(pulled[0] in world.asleep)
+        self.assertTrue(pulled[1].velocity.x < -0.01)
+
+    def test_broad_phase_skips_sleeping_disks(self):
+        self.world.broadphase = broadphase = CountingPairs()
+        self.settle()
+        self.assertEqual(len(self.world.asleep), 4)
+        self.world.update(0.033)
+        self.assertEqual(broadphase.disks, 0)
+
+        # Only the sleeping disks it can reach are passed along with an
+        # awake disk.
+        self.world.disks.append(Disk(Point(20, 2.2), 1, 1, Vector(0, -10)))
+        self.world.update(0.033)
+        self.assertEqual(broadphase.disks, 2)
+        self.assertEqual(self.world.stats.pairs, 1)
+
+    def settleWorld(self, world, steps):
+        for i in range(steps):
+            world.update(0.033)
+
+class TestCastCircle(unittest.TestCase):
+    def bruteForce(self, world, start, radius, v, ignore):
+        # The first hit, as found with calculateCollision.
+        mover = Disk(Point(start.x, start.y), radius, 1, Vector(v.x, v.y))
+        best = None, None
+        for d in world.disks:
+            if d is ignore:
+                continue
+            c1, c2 = calculateCollision(mover, Disk(d.center, d.radius, 1), 1.0)
+            if c1 is not None and (best[1] is None or c1.toi < best[1]):
+                best = d, c1.toi
+        return best
+
+    def test_matches_brute_force(self):
+        world = World()
+        world.disks = loadScene('gas', 200, seed=3)
+        random.seed(4)
+        for k in range(50):
+            d = random.choice(world.disks)
+            v = Vector(random.uniform(-60, 60), random.uniform(-60, 60))
+            hit, toi = world.castCircle(d.center, d.radius, v, ignore=d)
+            expected, expectedToi = self.bruteForce(world, d.center, d.radius, v, d)
+            self.assertTrue(hit is expected)
+            if hit is not None:
+                self.assertAlmostEqual(toi, expectedToi)
+
+    def test_long_casts(self):
+        # Casts much longer than the world is wide, over small disks,
+        # don't visit the cells along the whole path.
+        world = World()
+        random.seed(5)
+        world.disks = [Disk(Point(random.uniform(0, 100), random.uniform(0, 100)),
+                            0.05, 1) for i in range(1000)]
+        index = world.spatialIndex()
+        cellRange = index.cellRange
+        calls = []
+        def countingCellRange(*box):
+            calls.append(box)
+            return cellRange(*box)
+        index.cellRange = countingCellRange
+
+        for start, v in [(Point(50, -10), Vector(0.3, 5000)),
+                         (Point(-10, 50), Vector(5000, -0.3)),
+                         (Point(-10, -10), Vector(3000, 2500)),
+                         (Point(-1000, 50), Vector(0, 5000))]:
+            del calls[:]
+            hit, toi = world.castCircle(start, 0.05, v)
+            expected, expectedToi = self.bruteForce(world, start, 0.05, v, None)
+            self.assertTrue(hit is expected)
+            if hit is not None:
+                self.assertAlmostEqual(toi, expectedToi)
+            self.assertTrue(len(calls) <= len(index.cells))
+
+    def test_first_hit(self):
+        world = World()
+        d1 = Disk(Point(5, 0), 1, 1)
+        d2 = Disk(Point(10, 0), 1, 1)
+        world.disks = [d2, d1]
+        hit, toi = world.castCircle(Point(0, 0), 1, Vector(20, 0))
+        self.assertTrue(hit is d1)
+        self.assertAlmostEqual(toi, 3.0 / 20)
+
+        hit, toi = world.castCircle(Point(0, 0), 1, Vector(2, 0))
+        self.assertEqual((hit, toi), (None, None))
+        hit, toi = world.castCircle(Point(0, 0), 1, Vector(-20, 0))
+        self.assertEqual((hit, toi), (None, None))
+
+    def test_does_not_change_disks(self):
+        world = World()
+        d1 = Disk(Point(0, 0), 1, 1, Vector(3, 4))
+        d2 = Disk(Point(5, 0), 1, 1, Vector(-1, 0))
+        world.disks = [d1, d2]
+        world.castCircle(d1.center, d1.radius, Vector(20, 0), ignore=d1)
+        self.assertEqual(d1.velocity, Vector(3, 4))
+        self.assertEqual(d2.velocity, Vector(-1, 0))
+
+    def test_index_follows_the_disks(self):
+        world = World()
+        d = Disk(Point(5, 0), 1, 1, Vector(0, 10))
+        world.disks = [d]
+        self.assertTrue(world.castCircle(Point(0, 0), 1, Vector(20, 0))[0] is d)
+        world.update(1.0)
+        self.assertEqual(world.castCircle(Point(0, 0), 1, Vector(20, 0)), (None, None))
+
+        d.center = Point(5, 0)
+        world.invalidateIndex()
+        self.assertTrue(world.castCircle(Point(0, 0), 1, Vector(20, 0))[0] is d)
+
+class TestDisksAt(unittest.TestCase):
+    def test_topmost_first(self):
+        world = World()
+        d1 = Disk(Point(0, 0), 2, 1)
+        d2 = Disk(Point(1, 0), 2, 1)
+        d3 = Disk(Point(10, 0), 1, 1)
+        world.disks = [d1, d2, d3]
+        self.assertEqual(world.disksAt(Point(0.5, 0)), [d2, d1])
+        self.assertEqual(world.disksAt(Point(-1.5, 0)), [d1])
+        self.assertEqual(world.disksAt(Point(10, 0.5)), [d3])
+        self.assertEqual(world.disksAt(Point(5, 0)), [])
+
+    def test_matches_scan(self):
+        world = World()
+        world.disks = loadScene('gas', 300, seed=5)
+        random.seed(6)
+        for k in range(100):
+            c = random.choice(world.disks).center
+            p = Point(c.x + random.uniform(-2, 2), c.y + random.uniform(-2, 2))
+            expected = [d for d in reversed(world.disks)
+                        if abs(p - d.center) < d.radius]
+            self.assertEqual(world.disksAt(p), expected)
+
+    def test_empty_world(self):
+        self.assertEqual(World().disksAt(Point(0, 0)), [])
+
+class TestFromArrays(unittest.TestCase):
+    def test_lists(self):
+        world = World.fromArrays([[1, 2], [3, 4]], [0.5, 1], [2, 3],
+                                 [[5, 6], [7, 8]], integrator='verlet')
+        self.assertEqual(world.integrator, 'verlet')
+        self.assertEqual(len(world.disks), 2)
+        d = world.disks[1]
+        self.assertEqual(d.center, Point(3, 4))
+        self.assertEqual(d.velocity, Vector(7, 8))
+        self.assertEqual((d.radius, d.mass), (1, 3))
+        self.assertTrue(d.visuals is not world.disks[0].visuals)
+
+    def test_numpy_arrays(self):
+        import numpy
+        world = World.fromArrays(numpy.array([[1.0, 2.0]]), numpy.array([1.0]),
+                                 numpy.array([2.0]))
+        d = world.disks[0]
+        self.assertEqual(d.center, Point(1, 2))
+        self.assertEqual(d.velocity, Vector(0, 0))
+        self.assertTrue(type(d.center.x) is float)
+
+    def test_lengths_must_match(self):
+        with self.assertRaises(ValueError):
+            World.fromArrays([[1, 2]], [1, 1], [1, 1])
+
+    def test_steps_like_disks(self):
+        disks = loadScene('gas', 20)
+        world = World()
+        world.disks = loadScene('gas', 20)
+        other = World.fromArrays([[d.center.x, d.center.y] for d in disks],
+                                 [d.radius for d in disks],
+                                 [d.mass for d in disks],
+                                 [[d.velocity.x, d.velocity.y] for d in disks])
+        for i in range(5):
+            world.update(0.033)
+            other.update(0.033)
+        for d1, d2 in zip(world.disks, other.disks):
+            self.assertEqual(d1.center, d2.center)
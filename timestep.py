@@ -0,0 +1,74 @@
+class FixedTimestep(object):
+    '''Steps a world with a fixed time step, independently of the rate at
+which frames are drawn. The wall-clock time between frames is added to
+an accumulator, and the world is stepped as many times as fit in it.
+What is left over is used to interpolate the drawn positions of the
+disks between the last two physics states (see Renderer.saveState).
+
+At most `maxSteps` steps are run per frame. When the physics can't keep
+up with the wall clock, the time that didn't fit is dropped, so that a
+slow frame doesn't cause more steps in the next one, which would make
+it even slower (the "spiral of death"). The simulation then runs slower
+than real time instead.
+
+    '''
+
+    def __init__(self, world, dt, maxSteps=5, renderer=None):
+        if dt <= 0:
+            raise ValueError('The time step must be positive.')
+        if maxSteps < 1:
+            raise ValueError('At least one step per frame must be allowed.')
+
+        self.world = world
+        self.dt = dt
+        self.maxSteps = maxSteps
+        self.renderer = renderer
+        self.accumulator = 0.0
+
+        # The total wall-clock time dropped because the physics couldn't
+        # keep up.
+        self.dropped = 0.0
+
+    @property
+    def alpha(self):
+        '''How far the wall clock is between the last physics state and the
+next one, from 0 to 1.
+
+        '''
+
+        return min(1.0, self.accumulator / self.dt)
+
+    def step(self):
+        '''Runs a single physics step.'''
+
+        if self.renderer is not None:
+            self.renderer.saveState()
+        self.world.update(self.dt)
+
+    def advance(self, elapsed):
+        '''Adds `elapsed` seconds of wall-clock time to the accumulator and
+runs as many physics steps as fit in it, up to maxSteps. Returns the
+number of steps run.
+
+        '''
+
+        self.accumulator += elapsed
+
+        steps = 0
+        while self.accumulator >= self.dt and steps < self.maxSteps:
+            self.step()
+            self.accumulator -= self.dt
+            steps += 1
+
+        if self.accumulator >= self.dt:
+            # Fell behind; keep only the fraction of a step left over.
+            behind = self.accumulator - self.accumulator % self.dt
+            self.dropped += behind
+            self.accumulator -= behind
+
+        return steps
+
+    def reset(self):
+        '''Empties the accumulator, e.g. when un-pausing.'''
+
+        self.accumulator = 0.0
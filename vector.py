@@ -3,6 +3,8 @@ from numbers import Number
 from helpers import float_eq
 
 class Vector(object):
+    __slots__ = ('x', 'y')
+
     def __init__(self, x=None, y=None, magnitude=None, angle=None):
         if x is not None and y is not None:
             self.x = x
@@ -42,6 +44,37 @@ class Vector(object):
         else:
             raise IndexError("Point index can be either 0 or 1.")
 
+    def iadd(self, v):
+        '''Adds the given vector to this vector in place, and returns this
+vector.
+
+        '''
+
+        self.x += v.x
+        self.y += v.y
+        return self
+
+    def isub(self, v):
+        '''Subtracts the given vector from this vector in place, and returns
+this vector.
+
+        '''
+
+        self.x -= v.x
+        self.y -= v.y
+        return self
+
+    def iaddScaled(self, v, scalar):
+        '''Adds the given vector multiplied by the given scalar to this vector
+in place, and returns this vector. The same as `self += v * scalar`,
+but without creating any temporary vectors.
+
+        '''
+
+        self.x += v.x * scalar
+        self.y += v.y * scalar
+        return self
+
     def __sub__(self, v2):
         return Vector(self.x - v2.x, self.y - v2.y)
 
@@ -55,13 +88,16 @@ class Vector(object):
         return float_eq(self.x, v2.x) and float_eq(self.y, v2.y)
 
     def __mul__(self, arg):
-        if not isinstance(arg, (Vector, Number)):
-            raise TypeError("A vector can only be dot-multiplied with another vector or a scalar.")
-
-        if isinstance(arg, Vector):
+        # Check for the common cases first.
+        t = type(arg)
+        if t is float or t is int:
+            return Vector(self.x * arg, self.y * arg)
+        elif isinstance(arg, Vector):
             return self.x * arg.x + self.y * arg.y
-        else:
+        elif isinstance(arg, Number):
             return Vector(self.x * arg, self.y * arg)
+        else:
+            raise TypeError("A vector can only be dot-multiplied with another vector or a scalar.")
 
     def __rmul__(self, arg):
         return Vector(self.x * arg, self.y * arg)
@@ -1,12 +1,44 @@
 import itertools
-import pygame.gfxdraw
-from math import sqrt
+import heapq
+import gc
+from collections import defaultdict
+from math import sqrt, floor
 from vector import Vector
+from disk import Disk
 from helpers import float_eq
+from gravity import ExactGravity
+from broadphase import AllPairs, GridIndex, reachOverlap
+from stepstats import StepStats
 import logging
 
 logger = logging.getLogger('diskworld.world')
 
+# The logging level of the per-step integration diagnostics. It's below
+# DEBUG, so the diagnostics are only collected when asked for
+# explicitly.
+DIAGNOSTICS = 5
+logging.addLevelName(DIAGNOSTICS, 'DIAGNOSTICS')
+
+# In event-driven mode, at most this many collisions per disk are
+# resolved in a single time step.
+MAX_EVENTS_PER_DISK = 10
+
+# The integrators World can use.
+INTEGRATORS = ['euler', 'verlet', 'block']
+
+# The defaults for the block time step integrator: the number of times
+# the time step can be halved, and the accuracy parameter of the time
+# step criteria (smaller is more accurate).
+MAX_LEVEL = 6
+ETA = 0.05
+
+# The defaults for putting disks to sleep: a disk falls asleep once its
+# speed and acceleration have stayed below these for SLEEP_TIME
+# seconds, along with all the disks it's in contact with.
+SLEEP_VELOCITY = 0.01
+SLEEP_ACCELERATION = 0.01
+SLEEP_TIME = 0.5
+
 class Collision(object):
     def __init__(self, disk, otherDisk):
         self.disk = disk
@@ -54,16 +86,19 @@ def velocitiesAfterCollision(disk1, disk2):
 
 def calculateCollision(disk1, disk2, dt):
     # The vector from the center of the other disk to the center of
-    # this disk.
-    centers_vector = disk2.center - disk1.center
-
-    # The ralative velocity of the two disks.
-    vr = disk2.velocity - disk1.velocity
+    # this disk (dr), and the relative velocity of the two disks
+    # (dv). This is called for every pair of disks, so plain floats
+    # are used instead of temporary vectors.
+    drx = disk2.center.x - disk1.center.x
+    dry = disk2.center.y - disk1.center.y
+    dvx = disk2.velocity.x - disk1.velocity.x
+    dvy = disk2.velocity.y - disk1.velocity.y
+    dot = drx * dvx + dry * dvy
 
     # If the relative velocity has a component along the normal vector
-    # of the two disks (centers_vector), it means the two disks are
-    # not moving towards each other.
-    if vr * centers_vector >= 0:
+    # of the two disks (dr), it means the two disks are not moving
+    # towards each other.
+    if dot >= 0:
         #logger.debug('Not moving toward each other. No collision.')
         #logger.debug('Disk 1: position={} velocity={}'.format(
         #    disk1.center, disk1.velocity))
@@ -75,17 +110,17 @@ def calculateCollision(disk1, disk2, dt):
         t1 = t2 = 0.0
     else:
         R = disk1.radius + disk2.radius
-        dv = disk2.velocity - disk1.velocity
-        dr = disk2.center - disk1.center
+        dv2 = dvx ** 2 + dvy ** 2
 
-        delta = R**2 * (dv * dv) - \
-                dr.x**2 * dv.y **2 + \
-                2 * dr.x * dr.y * dv.x * dv.y - \
-                dr.y**2 * dv.x**2
+        delta = R**2 * dv2 - \
+                drx**2 * dvy **2 + \
+                2 * drx * dry * dvx * dvy - \
+                dry**2 * dvx**2
         if delta < 0:
             return None, None
-        t1 = -((dr * dv) + sqrt(delta)) / (dv * dv)
-        t2 = -((dr * dv) + sqrt(delta)) / (dv * dv)
+        # The two roots: when the disks start and stop touching.
+        t1 = -(dot + sqrt(delta)) / dv2
+        t2 = -(dot - sqrt(delta)) / dv2
 
         t1 = t1 if 0 <= t1 <= dt else None
         t2 = t2 if 0 <= t2 <= dt else None
@@ -106,92 +141,388 @@ def calculateCollision(disk1, disk2, dt):
 
     return c1, c2
 
+def sweepCircle(x, y, vx, vy, v2, cx, cy, R):
+    '''Returns the time (from 0 to 1) at which a point moving from (x, y)
+along (vx, vy), with v2 = vx**2 + vy**2 > 0, comes within distance R of
+(cx, cy) while moving toward it, or None if it doesn't.
+
+    '''
+
+    drx = cx - x
+    dry = cy - y
+    dot = drx * vx + dry * vy
+    if dot <= 0:
+        return None
+
+    c = drx * drx + dry * dry - R * R
+    if c <= 0:
+        return 0.0
+
+    delta = dot * dot - v2 * c
+    if delta < 0:
+        return None
+    t = (dot - sqrt(delta)) / v2
+    return t if t <= 1 else None
+
+def pruneCollisions(disks):
+    '''Removes the collisions of each disk that happen after its first
+collision and therefore will never happen. The pruned collisions are
+also removed from the other disk involved in them. Returns the number
+of collisions (pairs of disks) removed.
+
+    '''
+
+    pruned = 0
+    for d in disks:
+        if len(d.collisions) > 1:
+            d.collisions.sort(key=lambda c: c.toi)
+
+            # Bypass the collisions with the same time of impact
+            # (toi).
+            first = d.collisions[0]
+            i = 1
+            while i < len(d.collisions) and \
+                  d.collisions[i].toi - first.toi < 0.000001:
+                i += 1
+            rest = d.collisions[i:]
+            d.collisions = d.collisions[:i]
+            pruned += len(rest)
+            for c in rest:
+                for oc in c.other.collisions:
+                    if oc.other is d:
+                        c.other.collisions.remove(oc)
+                        break
+
+    return pruned
+
+def recordVectors(extra, name, vectors):
+    '''Stores a snapshot of the given vectors (or points) in the
+diagnostics dictionary `extra` as a list of (x, y) tuples. Does nothing
+if diagnostics are not being collected (`extra` is None), in which case
+`vectors` is not even iterated over.
+
+    '''
+
+    if extra is not None:
+        extra[name] = [(v.x, v.y) for v in vectors]
+
+def recordCollisions(extra, name, disks):
+    '''Stores the collisions of each disk in the diagnostics dictionary
+`extra`, as a list of (index of other disk, time of impact) tuples for
+each disk. Does nothing if diagnostics are not being collected.
+
+    '''
+
+    if extra is not None:
+        index = dict((d, i) for i, d in enumerate(disks))
+        extra[name] = [[(index[c.other], c.toi) for c in d.collisions]
+                       for d in disks]
+
+def tolist(array):
+    '''Returns a NumPy array as a (nested) list, and anything else as is.'''
+
+    return array.tolist() if hasattr(array, 'tolist') else array
+
 class World(object):
-    def __init__(self):
+    '''A world of disks.
+
+`gravity` is the solver used for calculating the gravitational forces
+between the disks: ExactGravity (the default) or BarnesHutGravity.
+
+`broadphase` selects the pairs of disks that are checked for contact
+and collision: AllPairs (the default), SpatialHash or SweepAndPrune.
+
+If `eventDriven` is True, all the collisions in a time step are
+resolved in the order they happen, and the disks move for the whole
+time step. Otherwise only the first collision of each disk is resolved
+in each time step.
+
+`integrator` is 'euler' (the default) for semi-implicit Euler, or
+'verlet' for velocity Verlet (kick-drift-kick). Velocity Verlet is
+symplectic, so orbits don't drift the way they do with Euler, and it
+needs no extra force evaluations: the forces at the end of a step are
+reused at the start of the next one. 'block' is velocity Verlet with
+hierarchical (block) time steps; see updateBlock. Integration
+diagnostics are only collected with Euler.
+
+If `allowSleep` is True, disks that stay (almost) at rest are put to
+sleep, together with the disks in contact with them (their island).
+Sleeping disks don't move and are skipped by the gravity, contact and
+collision calculations, except with the disks that are awake. An
+island wakes up when one of its disks is hit by another disk, or is
+given a velocity or moved from the outside, or when gravity would have
+set it in motion. See updateSleep.
+
+After each time step, `stats` holds the timing and counters of the
+step (see StepStats).
+
+    '''
+
+    def __init__(self, gravity=None, broadphase=None, eventDriven=False,
+                 integrator='euler', allowSleep=False):
+        if integrator not in INTEGRATORS:
+            raise ValueError('Unknown integrator: {}'.format(integrator))
+
         self.disks = []
+        self.time = 0.0 # simulation time
+        self.eventDriven = eventDriven
+        self.gravity = gravity if gravity is not None else ExactGravity()
+        self.broadphase = broadphase if broadphase is not None else AllPairs()
+        self.integrator = integrator
+        self.maxLevel = MAX_LEVEL
+        self.eta = ETA
+        self.stats = StepStats()
 
-    def update(self, dt):
-        for d in self.disks:
-            d.force = Vector(0, 0)
-            d.collisions = []
+        # The time step level of each disk at the end of the last block
+        # time step.
+        self.levels = []
+
+        self.allowSleep = allowSleep
+        self.sleepVelocity = SLEEP_VELOCITY
+        self.sleepAcceleration = SLEEP_ACCELERATION
+        self.sleepTime = SLEEP_TIME
+
+        # The sleeping disks, mapped to the (x, y) position they fell
+        # asleep at, the island they belong to and the time the island
+        # fell asleep, and for how long each awake disk has been at
+        # rest.
+        self.asleep = {}
+        self.resting = {}
+
+        # The disks for which the current accelerations were calculated
+        # at the end of the last Verlet step, with their positions then.
+        self.accelerated = None
+
+        # The spatial index used by the queries (see spatialIndex), and
+        # the disks and time it was built for.
+        self.index = None
+        self.indexKey = None
+
+    @classmethod
+    def fromArrays(cls, centers, radii, masses, velocities=None, **options):
+        '''Creates a world (with the given constructor `options`) holding the
+disks described by the arrays: an n x 2 array of centers, n radii, n
+masses and optionally an n x 2 array of velocities (the disks are at
+rest otherwise). The arrays can be NumPy arrays or nested lists. See
+setArrays.
+
+        '''
+
+        world = cls(**options)
+        world.setArrays(centers, radii, masses, velocities)
+        return world
+
+    def setArrays(self, centers, radii, masses, velocities=None,
+                  accelerations=None, forces=None):
+        '''Replaces the disks of the world with the disks described by the
+arrays (see fromArrays), optionally with their accelerations and forces
+as n x 2 arrays. The lengths of the arrays are checked once, but the
+values of the disks aren't checked one by one.
+
+        '''
+
+        centers, radii, masses = tolist(centers), tolist(radii), tolist(masses)
+        n = len(radii)
+        if velocities is None:
+            velocities = [(0.0, 0.0)] * n
+        else:
+            velocities = tolist(velocities)
+        accelerations = tolist(accelerations)
+        forces = tolist(forces)
+        if len(centers) != n or len(masses) != n or len(velocities) != n or \
+           (accelerations is not None and len(accelerations) != n) or \
+           (forces is not None and len(forces) != n):
+            raise ValueError('The arrays of a scene must have the same length.')
+
+        # The cyclic garbage collector would run over and over while
+        # the disks are created.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            fromValues = Disk.fromValues
+            self.disks = [fromValues(c[0], c[1], r, m, v[0], v[1])
+                          for c, r, m, v in zip(centers, radii, masses, velocities)]
+            if accelerations is not None:
+                for d, a in zip(self.disks, accelerations):
+                    d.acceleration = Vector(a[0], a[1])
+            if forces is not None:
+                for d, f in zip(self.disks, forces):
+                    d.force = Vector(f[0], f[1])
+        finally:
+            if enabled:
+                gc.enable()
+
+        # Forget what was kept about the old disks.
+        self.asleep = {}
+        self.resting = {}
+        self.accelerated = None
+
+    def reach(self, dt):
+        '''Returns the speeds assumed for the disks in this time step and,
+for each disk, the radius of the circle around its center it can
+touch during the time step, as used by the broad phase. Since the
+velocities are only updated later in the step, the acceleration of the
+previous step is used to estimate how much faster each disk can move.
+
+        '''
+
+        speeds = [abs(d.velocity) + abs(d.acceleration) * dt for d in self.disks]
+        reach = [d.radius + s * dt for d, s in zip(self.disks, speeds)]
+        return speeds, reach
+
+    def findPairs(self, dt):
+        '''Returns the speeds assumed for the disks (see `reach`), and the
+pairs of disks that might touch in this time step, as found by the
+broad phase.
+
+        '''
+
+        speeds, reach = self.reach(dt)
+        if not self.asleep:
+            return speeds, self.broadphase.pairs(self.disks, reach)
+
+        # Sleeping disks don't interact with each other, so only the
+        # sleeping disks within the reach of an awake one are passed to
+        # the broad phase.
+        asleep = self.asleep
+        disks, reach = self.awakeAndNear(reach)
+        pairs = self.broadphase.pairs(disks, reach)
+        pairs = [(d1, d2) for d1, d2 in pairs
+                 if d1 not in asleep or d2 not in asleep]
+        return speeds, pairs
+
+    def awakeAndNear(self, reach):
+        '''Returns the disks that are awake or within the reach of an awake
+disk, in the order of the disk list, and their reach.
+
+        '''
+
+        disks = self.disks
+        asleep = self.asleep
+        sleeping = [i for i, d in enumerate(disks) if d in asleep]
+        if len(sleeping) == len(disks):
+            return [], []
+
+        index = GridIndex([disks[i] for i in sleeping],
+                          [reach[i] for i in sleeping])
+        near = set()
+        for i, d in enumerate(disks):
+            if d in asleep:
+                continue
+            x, y = d.center.x, d.center.y
+            grow = reach[i] + index.maxRadius
+            for cell in index.cellRange(x - grow, y - grow, x + grow, y + grow):
+                for k in index.cells[cell]:
+                    j = sleeping[k]
+                    if reachOverlap(d, disks[j], reach[i], reach[j]):
+                        near.add(j)
 
-        extra = {}
-        extra['f0'] = [d.force for d in self.disks]
+        keep = [i for i, d in enumerate(disks) if d not in asleep or i in near]
+        return [disks[i] for i in keep], [reach[i] for i in keep]
 
-        # Calculate non-contact forces
-        for d1, d2 in itertools.combinations(self.disks, 2):
-            # gravity
-            G = 6.674e-11
-            fg = (G * d1.mass * d2.mass) / (d2.center - d1.center).magnitude ** 2
-            d1.force += (d2.center - d1.center) / abs(d2.center - d1.center) * fg
-            d2.force += (d1.center - d2.center) / abs(d1.center - d2.center) * fg
+    def gravityOn(self, targets):
+        '''Returns the gravitational forces on the disks in `targets` (a list
+of indices).
 
-        extra['f1'] = [d.force for d in self.disks]
+        '''
 
-        # Calculate contact forces
-        for d1, d2 in itertools.combinations(self.disks, 2):
-            # normal force
+        if hasattr(self.gravity, 'forcesOn'):
+            return self.gravity.forcesOn(targets, self.disks)
+
+        forces = self.gravity.forces(self.disks)
+        return [forces[i] for i in targets]
+
+    def calculateGravity(self):
+        if self.asleep:
+            # Only the disks that are awake are pulled.
+            asleep = self.asleep
+            awake = [i for i, d in enumerate(self.disks) if d not in asleep]
+            for i, f in zip(awake, self.gravityOn(awake)):
+                self.disks[i].force.iadd(f)
+            return
+
+        for d, f in zip(self.disks, self.gravity.forces(self.disks)):
+            d.force.iadd(f)
+
+    def calculateContactForces(self, pairs):
+        '''Applies the normal forces between the disks in contact. Returns
+the number of pairs in contact.
+
+        '''
+
+        contacts = 0
+        asleep = self.asleep
+        for d1, d2 in pairs:
+            # normal force; the projection of the force of the first
+            # disk on the normal vector.
             if d1.isInContact(d2):
-                fy = d1.force.project(d2.center - d1.center)
-                d1.force -= fy
-                d2.force += fy
+                contacts += 1
+                if asleep and (d1 in asleep or d2 in asleep):
+                    self.calculateSleepingContact(d1, d2)
+                    continue
+                nx = d2.center.x - d1.center.x
+                ny = d2.center.y - d1.center.y
+                k = (d1.force.x * nx + d1.force.y * ny) / (nx ** 2 + ny ** 2)
+                d1.force.x -= k * nx
+                d1.force.y -= k * ny
+                d2.force.x += k * nx
+                d2.force.y += k * ny
 
-        extra['f2'] = [d.force for d in self.disks]
-        extra['a0'] = [d.acceleration for d in self.disks]
+        return contacts
 
-        # Calculate accelerations
-        for d in self.disks:
-            d.acceleration = d.force * (1.0 / d.mass)
+    def calculateSleepingContact(self, d1, d2):
+        '''Applies the normal force between two disks in contact, one of
+which is asleep. A sleeping disk doesn't move, so the disk that is
+awake just loses the part of its force along the normal.
+
+        '''
 
-        extra['a1'] = [d.acceleration for d in self.disks]
-        extra['v0'] = [d.velocity for d in self.disks]
+        d, other = (d2, d1) if d1 in self.asleep else (d1, d2)
+        nx = other.center.x - d.center.x
+        ny = other.center.y - d.center.y
+        k = (d.force.x * nx + d.force.y * ny) / (nx ** 2 + ny ** 2)
+        d.force.x -= k * nx
+        d.force.y -= k * ny
 
-        # Calculate velocities
+    def calculateAccelerations(self):
         for d in self.disks:
-            d.velocity += d.acceleration * dt
+            d.acceleration.x = d.force.x / d.mass
+            d.acceleration.y = d.force.y / d.mass
 
-        extra['v1'] = [d.velocity for d in self.disks]
+    def calculateVelocities(self, dt):
+        for d in self.disks:
+            d.velocity.iaddScaled(d.acceleration, dt)
+
+    def calculateCollisions(self, dt, pairs):
+        '''Finds the collisions between the given pairs of disks in this time
+step. Returns the number of pairs that collide.
 
-        # Calculate collisions
-        for d1, d2 in itertools.combinations(self.disks, 2):
+        '''
+
+        collisions = 0
+        for d1, d2 in pairs:
             c1, c2 = calculateCollision(d1, d2, dt)
             if c1 is not None:
                 d1.collisions.append(c1)
                 d2.collisions.append(c2)
+                collisions += 1
 
-        extra['c0'] = [d.collisions for d in self.disks]
+        return collisions
+
+    def moveDisks(self, dt):
+        '''Moves the disks for `dt` seconds, or up to their first collision
+if they have one, in which case the collision impulses are applied.
+
+        '''
 
-        # Prune extra collisions; that is, remove collisions that are
-        # happen after another collision and therefore will never
-        # happen.
-        for d in self.disks:
-            if len(d.collisions) > 1:
-                d.collisions.sort(key=lambda c: c.toi)
-
-                # Bypass the collisions with the same time of impact
-                # (toi).
-                first = d.collisions[0]
-                i = 1
-                while d.collisions[i] - first < 0.000001:
-                    i += 1
-                rest = d.collisions[i:]
-                d.collisions = d.collisions[:i]
-                for c in rest:
-                    c.other.collisions.remove(c)
-
-        extra['c1'] = [d.collisions for d in self.disks]
-        extra['v2'] = [d.velocity for d in self.disks]
-        extra['x0'] = [d.center for d in self.disks]
-
-        # Move the disks
         for d in self.disks:
             if len(d.collisions) > 0:
                 # Move the disk to where the collisions occurs
-                d.center += d.velocity * d.collisions[0].toi
+                d.center.iaddScaled(d.velocity, d.collisions[0].toi)
 
                 # Apply the impulses caused by the collisions
                 for c in d.collisions:
-                    d.velocity += c.dv
+                    d.velocity.iadd(c.dv)
 
                 # We've so far moved the disk for `toi` seconds and
                 # updated its velocity. But what to do with the rest
@@ -209,20 +540,787 @@ class World(object):
                 # the objects might not touch on screen. It seems the
                 # best trade-off is updating the velocity, but not the
                 # position.
-                ndt = dt - d.collisions[0].toi
-                d.velocity += d.acceleration * ndt
+                #
+                # With Verlet, the velocity is kicked at the end of
+                # the time step anyway.
+                if self.integrator == 'euler':
+                    ndt = dt - d.collisions[0].toi
+                    d.velocity.iaddScaled(d.acceleration, ndt)
+            else:
+                d.center.iaddScaled(d.velocity, dt)
+
+    def update(self, dt):
+        if self.allowSleep:
+            self.wakeDisturbed()
+
+        if self.integrator == 'verlet':
+            self.updateVerlet(dt)
+        elif self.integrator == 'block':
+            self.updateBlock(dt)
+        else:
+            self.updateEuler(dt)
+
+        if self.allowSleep:
+            self.updateSleep(dt)
+        self.stats.asleep = len(self.asleep)
+
+    def updateEuler(self, dt):
+        '''Advances the world by `dt` with semi-implicit Euler.'''
+
+        stats = self.stats = StepStats()
+        stats.start()
+
+        for d in self.disks:
+            d.force.x = d.force.y = 0.0
+            d.collisions = []
+
+        # Diagnostics are only collected if they're going to be logged.
+        extra = {} if logger.isEnabledFor(DIAGNOSTICS) else None
+        recordVectors(extra, 'f0', (d.force for d in self.disks))
+
+        # Calculate non-contact forces (gravity)
+        self.calculateGravity()
+        stats.lap('gravity')
+
+        recordVectors(extra, 'f1', (d.force for d in self.disks))
+
+        # Find the pairs of disks that might touch in this time step,
+        # and calculate contact forces.
+        speeds, pairs = self.findPairs(dt)
+        stats.lap('broadphase')
+        stats.contacts = self.calculateContactForces(pairs)
+        stats.lap('contact')
+
+        recordVectors(extra, 'f2', (d.force for d in self.disks))
+        recordVectors(extra, 'a0', (d.acceleration for d in self.disks))
+
+        self.calculateAccelerations()
+
+        recordVectors(extra, 'a1', (d.acceleration for d in self.disks))
+        recordVectors(extra, 'v0', (d.velocity for d in self.disks))
+
+        self.calculateVelocities(dt)
+        stats.lap('integrate')
+
+        recordVectors(extra, 'v1', (d.velocity for d in self.disks))
+
+        # If any of the disks is now moving faster than assumed by the
+        # broad phase, the pairs need to be found again.
+        if any(abs(d.velocity) > s for d, s in zip(self.disks, speeds)):
+            speeds, pairs = self.findPairs(dt)
+            stats.lap('broadphase')
+        stats.pairs = len(pairs)
+
+        if self.eventDriven:
+            self.resolveCollisionEvents(dt, speeds, pairs, extra)
+        else:
+            self.resolveCollisions(dt, pairs, extra)
+
+        recordVectors(extra, 'x1', (d.center for d in self.disks))
+
+        if extra is not None:
+            for d in self.disks:
+                for c in d.collisions:
+                    if not d.isInContact(c.other):
+                        extra['collision_without_contact'] = True
+
+            # Only the candidate pairs of the broad phase can be too
+            # close.
+            for d1, d2 in pairs:
+                if abs(d2.center - d1.center) - (d1.radius + d2.radius) < 0.000001:
+                    extra['too_close'] = True
+
+            logger.log(DIAGNOSTICS, 'Integration', extra=extra)
+
+        self.time += dt
+        stats.stop()
+
+    def calculateForces(self, dt, pairs=None):
+        '''Calculates the forces on the disks and their accelerations at the
+current positions. The contacts are looked for among `pairs`, or among
+the pairs found by the broad phase if it's None.
+
+        '''
+
+        stats = self.stats
+        for d in self.disks:
+            d.force.x = d.force.y = 0.0
+
+        self.calculateGravity()
+        stats.lap('gravity')
+        if pairs is None:
+            speeds, pairs = self.findPairs(dt)
+            stats.lap('broadphase')
+        stats.contacts = self.calculateContactForces(pairs)
+        stats.lap('contact')
+        self.calculateAccelerations()
+        stats.lap('integrate')
+
+        self.accelerated = [(d, d.center.x, d.center.y) for d in self.disks]
+
+    def wakeDisturbed(self):
+        '''Wakes up the islands of the sleeping disks that have been given a
+velocity or moved since they fell asleep: by a collision, or by
+changing their velocity or center directly.
+
+        '''
+
+        for d, (x, y, island, since) in list(self.asleep.items()):
+            if d.center.x != x or d.center.y != y or \
+               d.velocity.x != 0 or d.velocity.y != 0:
+                self.wake(island)
+
+    def wake(self, island):
+        '''Wakes up the given disks.'''
+
+        for d in island:
+            self.asleep.pop(d, None)
+            self.resting[d] = 0.0
+
+        # Their accelerations weren't kept up to date.
+        self.accelerated = None
+
+    def wakeAccelerated(self, dt):
+        '''Wakes up the sleeping islands that gravity would have set in
+motion. Every sleepTime seconds an island sleeps, the net gravitational
+force on it is calculated. The forces between its own disks cancel out,
+and so do the forces between the other disks, so when the island holds
+most of the disks, the net force on it is calculated as minus the net
+force on the others. If the velocity it would have given the island
+since it fell asleep is more than sleepVelocity, the island wakes up
+with that velocity, so that disks pulled too weakly to stay awake still
+fall.
+
+        '''
+
+        period = self.sleepTime
+        islands = {}
+        for d, (x, y, island, since) in self.asleep.items():
+            elapsed = self.time - since
+            if floor(elapsed / period) > floor((elapsed - dt) / period):
+                islands[id(island)] = island, elapsed
+        if not islands:
+            return
+
+        index = dict((d, i) for i, d in enumerate(self.disks))
+        for island, elapsed in islands.values():
+            targets = [index[d] for d in island if d in index]
+            if not targets:
+                continue
+            mass = sum(self.disks[i].mass for i in targets)
+            scale = elapsed / mass
+            if 2 * len(targets) > len(self.disks):
+                inside = set(targets)
+                targets = [i for i in range(len(self.disks)) if i not in inside]
+                scale = -scale
+            if not targets:
+                continue
+            forces = self.gravityOn(targets)
+            vx = sum(f.x for f in forces) * scale
+            vy = sum(f.y for f in forces) * scale
+            if vx * vx + vy * vy > self.sleepVelocity ** 2:
+                self.wake(island)
+                for d in island:
+                    d.velocity = Vector(vx, vy)
+
+    def updateSleep(self, dt):
+        '''Keeps track of how long each awake disk has been at rest, and puts
+to sleep the islands of disks in contact whose disks have all been at
+rest for sleepTime seconds (the disks already asleep in an island
+don't count). Wakes up the islands pulled by gravity first (see
+wakeAccelerated).
+
+        '''
+
+        self.wakeAccelerated(dt)
+
+        asleep = self.asleep
+        resting = self.resting
+        candidates = False
+        for d in self.disks:
+            if d in asleep:
+                continue
+            if abs(d.velocity) < self.sleepVelocity and \
+               abs(d.acceleration) < self.sleepAcceleration:
+                t = resting[d] = resting.get(d, 0.0) + dt
+                if t >= self.sleepTime:
+                    candidates = True
             else:
-                d.center += d.velocity * dt
+                resting[d] = 0.0
+
+        if not candidates:
+            return
+
+        # Find the islands with union-find over the pairs of disks in
+        # contact, and the islands of the disks already asleep. Disks
+        # at rest can drift apart a little, so disks count as in
+        # contact as long as the gap between them is less than how far
+        # a disk at rest can move in sleepTime.
+        parent = dict((d, d) for d in self.disks)
+
+        def find(d):
+            while parent[d] is not d:
+                parent[d] = parent[parent[d]]
+                d = parent[d]
+            return d
+
+        def union(d1, d2):
+            parent[find(d1)] = find(d2)
+
+        margin = 0.5 * self.sleepVelocity * self.sleepTime
+        reach = [d.radius + margin for d in self.disks]
+        for d1, d2 in self.broadphase.pairs(self.disks, reach):
+            if (d1 not in asleep or d2 not in asleep) and \
+               reachOverlap(d1, d2, d1.radius + margin, d2.radius + margin):
+                union(d1, d2)
+        for d, (x, y, island, since) in asleep.items():
+            for other in island:
+                if other in parent:
+                    union(d, other)
+
+        islands = {}
+        for d in self.disks:
+            islands.setdefault(find(d), []).append(d)
 
-        extra['x1'] = [d.center for d in self.disks]
+        for island in islands.values():
+            if all(d in asleep or resting.get(d, 0.0) >= self.sleepTime
+                   for d in island) and \
+               not all(d in asleep for d in island):
+                for d in island:
+                    d.velocity.x = d.velocity.y = 0.0
+                    d.acceleration.x = d.acceleration.y = 0.0
+                    d.force.x = d.force.y = 0.0
+                    asleep[d] = (d.center.x, d.center.y, island, self.time)
+                    resting.pop(d, None)
+
+    def accelerationsValid(self):
+        '''Returns True if the accelerations of the disks are the ones at the
+current positions, as calculated at the end of the last Verlet or block
+time step. They aren't if the disks have changed since, or if any of
+them was moved from the outside (e.g. dragged).
+
+        '''
+
+        accelerated = self.accelerated
+        return accelerated is not None and \
+               len(accelerated) == len(self.disks) and \
+               all(d1 is d2 and d2.center.x == x and d2.center.y == y
+                   for (d1, x, y), d2 in zip(accelerated, self.disks))
+
+    def updateVerlet(self, dt):
+        '''Advances the world by `dt` with velocity Verlet: half a step of
+acceleration is applied to the velocities (kick), the disks move with
+those velocities, colliding on the way (drift), and the other half step
+of acceleration is applied with the forces at the new positions (kick).
+
+        '''
+
+        stats = self.stats = StepStats()
+        stats.start()
 
         for d in self.disks:
-            for c in d.collisions:
-                if not d.isInContact(c.other):
-                    extra['collision_without_contact'] = True
+            d.collisions = []
+
+        if not self.accelerationsValid():
+            self.calculateForces(dt)
+
+        for d in self.disks:
+            d.velocity.iaddScaled(d.acceleration, 0.5 * dt)
+        stats.lap('integrate')
+
+        speeds, pairs = self.findPairs(dt)
+        stats.lap('broadphase')
+        stats.pairs = len(pairs)
+
+        if self.eventDriven:
+            self.resolveCollisionEvents(dt, speeds, pairs, None)
+        else:
+            self.resolveCollisions(dt, pairs, None)
+
+        self.calculateForces(dt)
+        for d in self.disks:
+            d.velocity.iaddScaled(d.acceleration, 0.5 * dt)
+        stats.lap('integrate')
+
+        self.time += dt
+        stats.stop()
+
+    def updateBlock(self, dt):
+        '''Advances the world by `dt` with velocity Verlet, using a separate
+time step for each disk. The time step of a disk is dt / 2**level, for
+a level from 0 to maxLevel, chosen at the start of each of its steps
+from its acceleration and how fast it is closing in on the disks near
+it (see chooseLevel). The steps of all the disks line up at the end of
+`dt`.
+
+Each disk is kicked at the start and the end of its own steps only, so
+the forces are only calculated for the disks whose step ends. All the
+disks drift together between those times, colliding on the way, so the
+forces on a disk are calculated from the drifted (predicted) positions
+of the others. When most disks move smoothly and only a few are in
+close encounters, this takes far fewer force calculations than
+stepping everything with the smallest time step.
+
+The broad phase runs once per call, for the whole of `dt`; each sub
+step only checks the pairs it found that can touch within the sub step
+(see closePairs), and the forces at the end of `dt` use them too. The
+collisions of each sub step are resolved as in the other integrators,
+one by one in order if eventDriven is True.
+
+        '''
+
+        stats = self.stats = StepStats()
+        stats.start()
+
+        disks = self.disks
+        for d in disks:
+            d.collisions = []
+
+        if len(disks) == 0:
+            self.levels = []
+            self.time += dt
+            stats.stop()
+            return
+
+        if not self.accelerationsValid():
+            self.calculateForces(dt)
+
+        # The broad phase runs once, for the whole time step; each sub
+        # step only checks the pairs found that are close enough.
+        speeds, near = self.findPairs(dt)
+        stats.lap('broadphase')
+
+        # Time is counted in ticks of the smallest possible step.
+        ticks = 2 ** self.maxLevel
+        h = dt / ticks
+        levels = self.levels = [0] * len(disks)
+        ends = [0] * len(disks)
+        tick = 0
+        while tick < ticks:
+            # Start the next step of the disks whose last step has
+            # just ended (all of them at the first tick).
+            starting = [i for i, end in enumerate(ends) if end == tick]
+            limits = self.closingTimes(set(disks[i] for i in starting), near)
+            stats.lap('broadphase')
+            for i in starting:
+                levels[i] = self.chooseLevel(i, tick, dt, limits.get(disks[i], dt))
+                ends[i] = tick + 2 ** (self.maxLevel - levels[i])
+                d = disks[i]
+                d.velocity.iaddScaled(d.acceleration, 0.5 * dt / 2 ** levels[i])
+            stats.lap('integrate')
+
+            # Drift everything up to the end of the next step.
+            end = min(ends)
+            for d in disks:
+                d.collisions = []
+            speeds, pairs = self.closePairs(near, (end - tick) * h)
+            stats.lap('broadphase')
+            stats.pairs += len(pairs)
+            if self.eventDriven:
+                self.resolveCollisionEvents((end - tick) * h, speeds, pairs, None)
+            else:
+                self.resolveCollisions((end - tick) * h, pairs, None)
+            tick = end
+
+            # Finish the steps that end here.
+            ending = [i for i, e in enumerate(ends) if e == tick]
+            if len(ending) == len(disks):
+                self.calculateForces(dt, near)
+            else:
+                self.calculateForcesOn(ending, near)
+            for i in ending:
+                d = disks[i]
+                d.velocity.iaddScaled(d.acceleration, 0.5 * dt / 2 ** levels[i])
+            stats.lap('integrate')
+
+        self.time += dt
+        stats.stop()
+
+    def closingTimes(self, disks, pairs):
+        '''Returns a dictionary with, for each of the given disks that is
+moving towards another disk in `pairs`, the time it needs to close the
+gap to the nearest one (plus eta times the smaller radius).
+
+        '''
+
+        times = {}
+        for d1, d2 in pairs:
+            if d1 not in disks and d2 not in disks:
+                continue
+            drx = d2.center.x - d1.center.x
+            dry = d2.center.y - d1.center.y
+            dot = drx * (d2.velocity.x - d1.velocity.x) + \
+                  dry * (d2.velocity.y - d1.velocity.y)
+            if dot < 0:
+                dist = sqrt(drx ** 2 + dry ** 2)
+                gap = max(0.0, dist - d1.radius - d2.radius)
+                t = (gap + self.eta * min(d1.radius, d2.radius)) * dist / -dot
+                for d in (d1, d2):
+                    if d in disks and t < times.get(d, t + 1):
+                        times[d] = t
+
+        return times
+
+    def chooseLevel(self, i, tick, dt, limit):
+        '''Returns the time step level for the step of disk i starting at the
+given tick. The step is at most eta * sqrt(radius / acceleration), and
+at most `limit` (see closingTimes). A disk can only move to a longer
+step when the longer step lines up with the current tick.
+
+        '''
+
+        d = self.disks[i]
+        step = limit
+        a = abs(d.acceleration)
+        if a > 0:
+            step = min(step, self.eta * sqrt(d.radius / a))
+
+        level = 0
+        while level < self.maxLevel and dt / 2 ** level > step:
+            level += 1
+        while tick % 2 ** (self.maxLevel - level) != 0:
+            level += 1
+        return level
+
+    def calculateForcesOn(self, targets, pairs):
+        '''Calculates the forces on the disks in `targets` (a list of indices)
+and their accelerations at the current positions, with the same model
+as calculateForces. The normal force on a disk depends on the forces
+on all the disks it's connected to through contacts, so the forces on
+those are calculated too (but their accelerations are left alone), and
+calculateContactForces is run on the contacts among them, in the order
+of `pairs`.
+
+        '''
+
+        stats = self.stats
+        disks = self.disks
+        asleep = self.asleep
+        if asleep:
+            targets = [i for i in targets if disks[i] not in asleep]
+
+        contacts = [(d1, d2) for d1, d2 in pairs if d1.isInContact(d2)]
+        neighbors = {}
+        for d1, d2 in contacts:
+            neighbors.setdefault(d1, []).append(d2)
+            neighbors.setdefault(d2, []).append(d1)
+
+        # The disks connected to the targets. Sleeping disks don't
+        # pass on contact forces (see calculateSleepingContact).
+        group = set(disks[i] for i in targets)
+        stack = list(group)
+        while stack:
+            d = stack.pop()
+            if d in asleep:
+                continue
+            for other in neighbors.get(d, ()):
+                if other not in group:
+                    group.add(other)
+                    stack.append(other)
+
+        indices = [i for i, d in enumerate(disks) if d in group and d not in asleep]
+        for i, f in zip(indices, self.gravityOn(indices)):
+            disks[i].force.x = f.x
+            disks[i].force.y = f.y
+        stats.lap('gravity')
+
+        stats.contacts += self.calculateContactForces(
+            [(d1, d2) for d1, d2 in contacts if d1 in group and d2 in group])
+        stats.lap('contact')
+
+        for i in targets:
+            d = disks[i]
+            d.acceleration.x = d.force.x / d.mass
+            d.acceleration.y = d.force.y / d.mass
+
+    def closePairs(self, pairs, dt):
+        '''Returns the speeds assumed for the disks within `dt` (see
+`reach`), and the pairs that might touch within `dt`, out of pairs
+found by the broad phase for a longer time step.
+
+        '''
+
+        speeds, reach = self.reach(dt)
+        reach = dict(zip(self.disks, reach))
+        return speeds, [(d1, d2) for d1, d2 in pairs
+                        if reachOverlap(d1, d2, reach[d1], reach[d2])]
+
+    def resolveCollisions(self, dt, pairs, extra):
+        '''Finds the first collisions of each disk in this time step, applies
+them, and moves the disks. Diagnostics are added to `extra` unless it
+is None.
+
+        '''
+
+        stats = self.stats
+        stats.collisions += self.calculateCollisions(dt, pairs)
+        stats.lap('collision')
+
+        recordCollisions(extra, 'c0', self.disks)
+
+        # Prune extra collisions; that is, remove collisions that are
+        # happen after another collision and therefore will never
+        # happen.
+        stats.pruned += pruneCollisions(self.disks)
+        stats.lap('prune')
+
+        recordCollisions(extra, 'c1', self.disks)
+        recordVectors(extra, 'v2', (d.velocity for d in self.disks))
+        recordVectors(extra, 'x0', (d.center for d in self.disks))
+
+        self.moveDisks(dt)
+        stats.lap('move')
+
+    def resolveCollisionEvents(self, dt, speeds, pairs, extra):
+        '''Moves the disks for `dt` seconds, resolving the collisions one by
+one in the order they happen. A heap of predicted collisions (events)
+is kept; at each event the collision is applied, and the events of the
+two disks involved are predicted again. Events predicted for a disk
+before its velocity changed are ignored when they come up. Each disk
+keeps the time its center was last moved to, and is only moved when it
+takes part in an event or a prediction, and at the end of the time
+step. Diagnostics are added to `extra` unless it is None.
+
+`pairs` are the pairs found by the broad phase for the assumed
+`speeds` of the disks. As long as a disk is no faster than assumed, it
+stays within its reach, and its events only have to be predicted
+against its neighbors in `pairs`. A disk sped up by a collision (e.g.
+knocked out of rest) escapes its reach; its events are predicted
+against the disks whose reach its new path crosses, found with a
+GridIndex of the reach circles, and it's checked by all the other disks
+from then on.
+
+        '''
+
+        heap = []
+        counter = itertools.count()
+        versions = dict((d, 0) for d in self.disks)
+        times = dict((d, 0.0) for d in self.disks)
+        assumed = dict(zip(self.disks, speeds))
+        neighbors = defaultdict(list)
+        for d1, d2 in pairs:
+            neighbors[d1].append(d2)
+            neighbors[d2].append(d1)
+        reaches = GridIndex(self.disks, [d.radius + s * dt for d, s
+                                         in zip(self.disks, speeds)])
+        escaped = []
+        now = 0.0
+
+        def advance(d):
+            if times[d] != now:
+                d.center.iaddScaled(d.velocity, now - times[d])
+                times[d] = now
+
+        def predict(d1, d2):
+            advance(d1)
+            advance(d2)
+            c1, c2 = calculateCollision(d1, d2, dt - now)
+            if c1 is not None:
+                heapq.heappush(heap, (now + c1.toi, next(counter), c1, c2,
+                                      versions[d1], versions[d2]))
+
+        recordVectors(extra, 'v2', (d.velocity for d in self.disks))
+        recordVectors(extra, 'x0', (d.center for d in self.disks))
+
+        for d1, d2 in pairs:
+            predict(d1, d2)
+
+        events = 0
+        maxEvents = MAX_EVENTS_PER_DISK * len(self.disks)
+        while heap and events < maxEvents:
+            t, _, c1, c2, v1, v2 = heapq.heappop(heap)
+            d1, d2 = c1.disk, c2.disk
+            if versions[d1] != v1 or versions[d2] != v2:
+                # stale event
+                continue
+
+            # Move the two disks to the time of the event. The new
+            # velocities are calculated from the positions at the time
+            # of impact.
+            now = t
+            advance(d1)
+            advance(d2)
+            nv1, nv2 = velocitiesAfterCollision(d1, d2)
+            c1.dv = nv1 - d1.velocity
+            c2.dv = nv2 - d2.velocity
+            d1.velocity = nv1
+            d2.velocity = nv2
+            d1.collisions.append(c1)
+            d2.collisions.append(c2)
+            events += 1
+
+            versions[d1] += 1
+            versions[d2] += 1
+            for d in (d1, d2):
+                if abs(d.velocity) > assumed[d]:
+                    if d not in escaped:
+                        escaped.append(d)
+                    others = self.reachedBy(reaches, d, dt - now)
+                else:
+                    others = neighbors[d]
+                for other in itertools.chain(others, escaped):
+                    if other is not d1 and other is not d2:
+                        predict(d, other)
+
+        if events >= maxEvents:
+            remaining = sum(1 for e in heap
+                            if versions[e[2].disk] == e[4] and
+                            versions[e[3].disk] == e[5])
+            logger.warning(
+                'Too many collision events in one time step; '
+                'ignoring {} remaining events.'.format(remaining))
+
+        # Move all disks to the end of the time step.
+        now = dt
+        for d in self.disks:
+            advance(d)
+
+        # Moving the disks is part of processing the events, so it is
+        # all counted as collision time.
+        self.stats.collisions += events
+        self.stats.lap('collision')
+
+        # No collisions are pruned, so both lists are the same.
+        recordCollisions(extra, 'c0', self.disks)
+        recordCollisions(extra, 'c1', self.disks)
+
+    def reachedBy(self, reaches, d, dt):
+        '''Returns the disks whose reach circles, as indexed by `reaches`,
+may touch the disk d moving at its current velocity for `dt` seconds.
+
+        '''
+
+        x0, y0 = d.center.x, d.center.y
+        x1, y1 = x0 + d.velocity.x * dt, y0 + d.velocity.y * dt
+        grow = d.radius + reaches.maxRadius
+        disks = reaches.disks
+        return [disks[i]
+                for cell in reaches.cellRange(min(x0, x1) - grow, min(y0, y1) - grow,
+                                              max(x0, x1) + grow, max(y0, y1) + grow)
+                for i in reaches.cells[cell]]
+
+    def spatialIndex(self):
+        '''Returns a GridIndex of the disks at their current positions. The
+index is kept until the world is stepped or the disk list is replaced;
+call invalidateIndex after moving disks from the outside.
+
+        '''
+
+        key = (len(self.disks), self.time)
+        if self.index is None or self.index.disks is not self.disks or \
+           self.indexKey != key:
+            self.index = GridIndex(self.disks)
+            self.indexKey = key
+        return self.index
+
+    def invalidateIndex(self):
+        '''Drops the spatial index, e.g. after moving a disk.'''
+
+        self.index = None
+        self.indexKey = None
+
+    def castCircle(self, start, radius, v, ignore=None):
+        '''Returns the first disk hit by a circle of the given radius moving
+from `start` along `v`, and the time of impact as a fraction of v (from
+0 to 1), or (None, None) if no disk is hit. The disks are taken to be
+at rest, and nothing is changed. A disk the circle already overlaps
+only counts as hit if the circle moves toward it. `ignore` is a disk
+to leave out, e.g. the disk being thrown.
+
+The cells of the spatial index are visited along v in pieces of one
+cell, and the search stops as soon as a hit is found within the pieces
+visited, so only the disks near the start of the path are tested. The
+path is first cut to the box around the disks; if it still crosses
+more cells than there are occupied cells, the disks of all the cells
+are tested instead.
+
+        '''
+
+        index = self.spatialIndex()
+        disks = index.disks
+        if not disks:
+            return None, None
+
+        vx, vy = v.x, v.y
+        v2 = vx * vx + vy * vy
+        if v2 == 0:
+            return None, None
+
+        # Only the part of the path that passes the box around the disks
+        # (grown by the radii) is visited.
+        grow = radius + index.maxRadius
+        bx0, by0, bx1, by1 = index.bounds
+        ta, tb = 0.0, 1.0
+        for p, dp, lo, hi in ((start.x, vx, bx0 - grow, bx1 + grow),
+                              (start.y, vy, by0 - grow, by1 + grow)):
+            if dp == 0:
+                if not lo <= p <= hi:
+                    return None, None
+                continue
+            t0, t1 = (lo - p) / float(dp), (hi - p) / float(dp)
+            ta, tb = max(ta, min(t0, t1)), min(tb, max(t0, t1))
+        if ta > tb:
+            return None, None
+
+        pieces = max(1, int(sqrt(v2) * (tb - ta) / index.size) + 1)
+        everything = pieces > len(index.cells)
+        if everything:
+            # Visiting the path would take longer than testing the disks
+            # of all the cells.
+            pieces = 1
+
+        visited = set()
+        best = bestToi = bestIndex = None
+        for k in range(pieces):
+            t0 = ta + (tb - ta) * k / pieces
+            t1 = ta + (tb - ta) * (k + 1) / pieces
+            xa, xb = start.x + vx * t0, start.x + vx * t1
+            ya, yb = start.y + vy * t0, start.y + vy * t1
+            if everything:
+                cells = list(index.cells)
+            else:
+                cells = index.cellRange(min(xa, xb) - grow, min(ya, yb) - grow,
+                                        max(xa, xb) + grow, max(ya, yb) + grow)
+            for cell in cells:
+                if cell in visited:
+                    continue
+                visited.add(cell)
+                for i in index.cells[cell]:
+                    d = disks[i]
+                    if d is ignore:
+                        continue
+                    toi = sweepCircle(start.x, start.y, vx, vy, v2,
+                                      d.center.x, d.center.y, radius + d.radius)
+                    if toi is not None and \
+                       (bestToi is None or (toi, i) < (bestToi, bestIndex)):
+                        best, bestToi, bestIndex = d, toi, i
+
+            # Disks in cells not visited yet are too far away to be hit
+            # before t1.
+            if bestToi is not None and bestToi <= t1:
+                break
+
+        return best, bestToi
+
+    def disksAt(self, p):
+        '''Returns the disks containing the point p, topmost first. The disks
+are drawn in list order, so the topmost disk is the last one in the
+list.
+
+        '''
+
+        index = self.spatialIndex()
+        disks = index.disks
+        grow = index.maxRadius
+        found = []
+        for cell in index.cellRange(p.x - grow, p.y - grow, p.x + grow, p.y + grow):
+            for i in index.cells[cell]:
+                d = disks[i]
+                dx = p.x - d.center.x
+                dy = p.y - d.center.y
+                if dx * dx + dy * dy < d.radius * d.radius:
+                    found.append(i)
 
-        for d1, d2 in itertools.combinations(self.disks, 2):
-            if abs(d2.center - d1.center) - (d1.radius + d2.radius) < 0.000001:
-                extra['too_close'] = True
+        found.sort(reverse=True)
+        return [disks[i] for i in found]
 
-        logger.debug('Integration', extra=extra)